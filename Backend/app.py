@@ -8,9 +8,17 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 from slowapi.errors import RateLimitExceeded
 from utils import Config, Logger
 from middleware.rate_limit import limiter
-from core.mongodb import MongoDB
+from core.mongodb import MongoDB, MongoConfig, MongoDBTopRatedView, MongoDBChangeFeed, MongoDBIndexManager, MongoDBSearchTokens
+from typing import Optional
+from core.search import RestaurantStore, DensityTileSet
+from handlers.data import DataHandlers
 from core.llm import Models
 
+changeFeed: Optional[MongoDBChangeFeed] = None
+"""The restaurant change feed (cache invalidation), None if disabled."""
+indexManager: Optional[MongoDBIndexManager] = None
+"""The background index verification, None if disabled."""
+
 #* Call when initialize the backend
 async def onInitialize() -> bool:
     #* Pre-initialization
@@ -22,9 +30,66 @@ async def onInitialize() -> bool:
     
     #* Initialize MongoDB.
     
-    if not await MongoDB.initialize():
+    if not await MongoDB.initialize(MongoConfig.model_validate(Config.Get().MongoDB.model_dump(by_alias=True))):
         Logger.LogError("Failed to initialize MongoDB!")
         return False
+    
+    #* Verify (and build the missing) indexes in the background, readiness does not wait for the builds
+    global indexManager
+    indexes_config = Config.Get().Data.Indexes
+    if indexes_config.Verify:
+        indexManager = MongoDBIndexManager(MongoDB.get_database(), run_admin=MongoDB.run_admin)
+        indexManager.Start(indexes_config.BuildMissing)
+    
+    #* Check (and backfill) the restaurants' search tokens in the background, text searches use $text until done
+    MongoDBSearchTokens.Start(MongoDB.get_database(), Config.Get().Data.TextRanking.BackfillTokens)
+    
+    #* Load the in-process restaurant store (optional, searches fall back to MongoDB)
+    store_config = Config.Get().Data.MemoryStore
+    if store_config.Enabled:
+        if not await RestaurantStore.Load(MongoDB.get_database(), store_config.CellSize,
+                                          Config.Get().Data.TextRanking.DistanceWeight):
+            Logger.LogWarning("Failed to load the in-memory restaurant store, using MongoDB search only!")
+    
+    #* Build/restore the density tiles (optional, the tiles endpoint is unavailable without them)
+    tiles_config = Config.Get().Data.DensityTiles
+    if tiles_config.Enabled:
+        if await DensityTileSet.Load(MongoDB.get_database(), tiles_config.Folder, tiles_config.MinZoom,
+                                     tiles_config.MaxZoom, tiles_config.MemoryTiles):
+            if tiles_config.RefreshInterval > 0:
+                DensityTileSet.StartAutoRefresh(MongoDB.get_database(), tiles_config.RefreshInterval)
+        else:
+            Logger.LogWarning("Failed to load the density tiles, the heatmap layer is unavailable!")
+    
+    #* Refresh the materialized top-rated view (optional, top-rated reads fall back to the restaurants collection)
+    top_rated_config = Config.Get().Data.TopRated
+    top_rated_ready = False
+    if top_rated_config.Enabled:
+        try:
+            await MongoDBTopRatedView(MongoDB.get_database(), top_rated_config.Size).Refresh()
+            top_rated_ready = True
+            if top_rated_config.RefreshInterval > 0:
+                MongoDBTopRatedView.StartAutoRefresh(MongoDB.get_database(), top_rated_config.Size,
+                                                     top_rated_config.RefreshInterval)
+        except Exception as e:
+            Logger.LogException(e, "Failed to refresh the top-rated view, reading the restaurants collection instead")
+    DataHandlers.Initialize(top_rated_ready)
+    
+    #* Watch the restaurant changes, so the caches/views above evict precisely (store first, then caches)
+    global changeFeed
+    feed_config = Config.Get().Data.ChangeFeed
+    if feed_config.Enabled:
+        changeFeed = MongoDBChangeFeed(MongoDB.get_database(), feed_config.Mode, feed_config.PollInterval)
+        changeFeed.Subscribe(RestaurantStore.OnRestaurantsChanged)
+        changeFeed.Subscribe(DataHandlers.OnRestaurantsChanged)
+        changeFeed.Subscribe(DensityTileSet.OnRestaurantsChanged)
+        if top_rated_ready:
+            changeFeed.Subscribe(MongoDBTopRatedView(MongoDB.get_database(), top_rated_config.Size).OnRestaurantsChanged)
+        try:
+            await changeFeed.Start()
+        except Exception as e:
+            Logger.LogException(e, "Failed to start the restaurant change feed, caches rely on their TTL only")
+            changeFeed = None
         
     #* Initialize LLM
     if not Models.LoadModels():
@@ -35,6 +100,17 @@ async def onInitialize() -> bool:
 #* Call when deinitialize the backend
 async def onDeinitialize():
     #* Deinitialize MongoDB
+    global changeFeed, indexManager
+    if changeFeed is not None:
+        await changeFeed.Stop()
+        changeFeed = None
+    if indexManager is not None:
+        indexManager.Stop()
+        indexManager = None
+    MongoDBSearchTokens.Stop()
+    RestaurantStore.Unload()
+    DensityTileSet.Unload()
+    MongoDBTopRatedView.StopAutoRefresh()
     await MongoDB.close()
     
     return
@@ -0,0 +1,53 @@
+"""Benchmark: in-process restaurant autocomplete (`RestaurantStore.Autocomplete`) latency.
+
+Builds the store from synthetic documents (no MongoDB needed) and replays the keystrokes
+of a few typical queries ("p", "ph", "pho", ...), with and without a focus point.
+The target is a p99 under one millisecond.
+
+Usage (from the `Backend/` folder):
+    python benchmarks/bench_autocomplete.py [--count 36000] [--rounds 200]
+"""
+
+import sys, time, argparse, statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.search import RestaurantStore
+from benchmarks.synthetic import GenerateRestaurants, RandomFocusPoints
+
+QUERIES = ["phở bò", "bun cha", "cơm tấm", "banh mi sai gon", "lẩu", "mì quảng", "che", "goi cuon ba ba"]
+
+
+def keystrokes(query: str):
+    return [query[:i] for i in range(1, len(query) + 1) if not query[:i].endswith(" ")]
+
+
+def main(count: int, rounds: int):
+    docs = GenerateRestaurants(count)
+    for i, doc in enumerate(docs):
+        doc["_id"] = f"{i:024x}"
+    start = time.perf_counter()
+    store = RestaurantStore(docs)
+    print(f"Built store of {store.Count:,} restaurants in {time.perf_counter() - start:.2f}s\n")
+
+    prefixes = [p for q in QUERIES for p in keystrokes(q)]
+    points = RandomFocusPoints(rounds)
+    for name, focused in (("no focus point", False), ("with focus point", True)):
+        samples = []
+        for lat, lon in points:
+            for prefix in prefixes:
+                start = time.perf_counter()
+                store.Autocomplete(prefix, lat if focused else None, lon if focused else None)
+                samples.append(time.perf_counter() - start)
+        samples.sort()
+        print(f"  {name:<18} median {statistics.median(samples) * 1e3:7.3f} ms   "
+              f"p99 {samples[int(len(samples) * 0.99) - 1] * 1e3:7.3f} ms   max {samples[-1] * 1e3:7.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=36000, help="Number of synthetic restaurants")
+    parser.add_argument("--rounds", type=int, default=200, help="Focus points (each replays every keystroke)")
+    args = parser.parse_args()
+    main(args.count, args.rounds)
@@ -0,0 +1,97 @@
+"""Benchmark: cost of each filter combination with bool column compares vs precomputed bitmaps.
+
+For every combination of `MinRating` / `Category` / `Province` / `District`, measures:
+  - compare: building the filter mask with vectorized column comparisons
+  - bitmap:  AND-ing the precomputed bitsets (what `RestaurantStore` does)
+  - search:  the full `RestaurantStore.Search` (bitmaps + spatial index + ranking)
+
+Usage (from the `Backend/` folder):
+    python benchmarks/bench_filter_bitmaps.py [--count 36000] [--rounds 300]
+"""
+
+import sys, time, argparse, statistics, itertools
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from core.mongodb import MongoDBSearchInputSchema
+from core.search import RestaurantStore, BitmapIndex, RangeBitmapIndex
+from core.search.bitmap import CombineAll
+from benchmarks.synthetic import GenerateRestaurants, RandomFocusPoints
+
+FILTERS = {
+    "MinRating": 4.0,
+    "Category": "Quán phở",
+    "Province": "Hồ Chí Minh",
+    "District": "Quận 1",
+}
+
+
+def median_ms(fn, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e3
+
+
+def main(count: int, rounds: int):
+    docs = GenerateRestaurants(count)
+    for i, doc in enumerate(docs):
+        doc["_id"] = f"{i:024x}"
+    store = RestaurantStore(docs)
+
+    # Raw encoded columns, the same way the store encodes them
+    encoded = {}
+    bitmaps = {}
+    for field in ("category", "province", "district"):
+        values = sorted({d[field] for d in docs})
+        codes = {v: i for i, v in enumerate(values)}
+        column = np.array([codes[d[field]] for d in docs], dtype=np.int32)
+        encoded[field] = (codes, column)
+        bitmaps[field] = BitmapIndex(column, len(values))
+    rating = np.array([d["rating"] for d in docs], dtype=np.float32)
+    rating_bitmaps = RangeBitmapIndex(rating, 0.0, 5.0, 0.1)
+
+    def compare_mask(filters: dict):
+        mask = np.ones(count, dtype=bool)
+        if "MinRating" in filters:
+            mask &= rating >= np.float32(filters["MinRating"])
+        for key in ("Category", "Province", "District"):
+            if key in filters:
+                codes, column = encoded[key.lower()]
+                mask &= column == codes[filters[key]]
+        return mask
+
+    def bitmap_mask(filters: dict):
+        bitsets = [rating_bitmaps.AtLeast(filters["MinRating"])] if "MinRating" in filters else []
+        for key in ("Category", "Province", "District"):
+            if key in filters:
+                codes, _ = encoded[key.lower()]
+                bitsets.append(bitmaps[key.lower()].Equal(codes[filters[key]]))
+        return CombineAll(bitsets)
+
+    lat, lon = RandomFocusPoints(1)[0]
+    print(f"{count:,} restaurants, median of {rounds} rounds (ms)\n")
+    print(f"  {'filters':<44} {'compare':>8} {'bitmap':>8} {'search':>8} {'matches':>8}")
+    for size in range(len(FILTERS) + 1):
+        for keys in itertools.combinations(FILTERS, size):
+            filters = {k: FILTERS[k] for k in keys}
+            inputs = MongoDBSearchInputSchema(Latitude=lat, Longitude=lon, Radius=5000.0, Limit=20, **filters)
+            combined = bitmap_mask(filters)
+            matches = combined.Count() if combined is not None else count
+            print(f"  {' + '.join(keys) or '(none)':<44} "
+                  f"{median_ms(lambda: compare_mask(filters), rounds):8.4f} "
+                  f"{median_ms(lambda: bitmap_mask(filters), rounds):8.4f} "
+                  f"{median_ms(lambda: store.Search(inputs), rounds):8.4f} "
+                  f"{matches:8,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=36000, help="Number of synthetic restaurants")
+    parser.add_argument("--rounds", type=int, default=300, help="Rounds per measurement")
+    args = parser.parse_args()
+    main(args.count, args.rounds)
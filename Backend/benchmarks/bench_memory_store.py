@@ -0,0 +1,61 @@
+"""Benchmark: in-process `RestaurantStore.Search` latency and memory footprint.
+
+Builds the store from synthetic documents (no MongoDB needed) and measures the
+search latency for a few typical filter combinations.
+
+Usage (from the `Backend/` folder):
+    python benchmarks/bench_memory_store.py [--count 36000] [--rounds 500]
+"""
+
+import sys, time, argparse, statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.mongodb import MongoDBSearchInputSchema
+from core.search import RestaurantStore
+from benchmarks.synthetic import GenerateRestaurants, RandomFocusPoints
+
+CASES = {
+    "nearby 5km": {},
+    "nearby 1km": {"Radius": 1000.0},
+    "rating >= 4.0": {"MinRating": 4.0},
+    "category": {"Category": "Quán phở"},
+    "province + district": {"Province": "Hồ Chí Minh", "District": "Quận 1"},
+    "all filters, 20km": {"Radius": 20000.0, "MinRating": 4.0, "Category": "Quán bún",
+                          "Province": "Hồ Chí Minh", "District": "Quận 3"},
+}
+
+
+def main(count: int, rounds: int):
+    docs = GenerateRestaurants(count)
+    for i, doc in enumerate(docs):
+        doc["_id"] = f"{i:024x}"
+
+    start = time.perf_counter()
+    store = RestaurantStore(docs)
+    build = time.perf_counter() - start
+    usage = store.MemoryUsage()
+    print(f"Built store of {store.Count:,} restaurants in {build:.2f}s: "
+          f"columns {usage['columns'] / 2**20:.2f} MiB, bitmaps {usage['bitmaps'] / 2**20:.2f} MiB, payload ~{usage['payload'] / 2**20:.2f} MiB\n")
+
+    points = RandomFocusPoints(rounds)
+    for name, filters in CASES.items():
+        samples, results = [], 0
+        for lat, lon in points:
+            inputs = MongoDBSearchInputSchema(Latitude=lat, Longitude=lon, Limit=20, **filters)
+            start = time.perf_counter()
+            resp = store.Search(inputs)
+            samples.append(time.perf_counter() - start)
+            results += resp.count
+        samples.sort()
+        print(f"  {name:<22} median {statistics.median(samples) * 1e3:7.3f} ms   "
+              f"p99 {samples[int(len(samples) * 0.99) - 1] * 1e3:7.3f} ms   avg results {results / len(points):5.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=36000, help="Number of synthetic restaurants")
+    parser.add_argument("--rounds", type=int, default=500, help="Focus points per case")
+    args = parser.parse_args()
+    main(args.count, args.rounds)
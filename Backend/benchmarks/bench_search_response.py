@@ -0,0 +1,91 @@
+"""Benchmark: per-row CPU cost of a search response, from the projected documents to the JSON body.
+
+Compares, on one page of `limit` projected documents (the `$project` output of a search), after the
+handler rows (`MongoDBRestaurantResponse`) both paths share:
+- models: `DataRestaurantResponseModel.FromMongoDB` rows (validated), then FastAPI's response model
+  path (validate + serialize the response);
+- rows: `DataRestaurantResponseModel.RowFromMongoDB` dicts, serialized once by
+  `DataRestaurantSearchResponseSchema.DumpRows` (the search route),
+and checks both produce the same JSON. With `--fields`, also the rows of that sparse fieldset
+(projected and serialized). No MongoDB needed.
+
+Usage (from the `Backend/` folder):
+    python benchmarks/bench_search_response.py [--limit 100] [--rounds 500] [--fields id,name,rating,distance]
+"""
+
+import sys, time, json, argparse, statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.utils import create_model_field
+from core.mongodb import MongoDBHandlers, SearchProjection
+from schemas.data import DataRestaurantResponseModel, DataRestaurantSearchResponseSchema
+from handlers.data import DataRestaurantSearchPage
+from benchmarks.synthetic import GenerateRestaurants
+
+to_response = MongoDBHandlers._MongoDBHandlers__to_response  # the handler's row conversion
+response_field = create_model_field(name="Response", type_=DataRestaurantSearchResponseSchema, mode="serialization")
+
+
+def projected(limit: int):
+    """Documents shaped like MONGODB_RESTAURANT_PROJECTION (a text search page)."""
+    docs = []
+    for i, doc in enumerate(GenerateRestaurants(limit)):
+        distance = 37.5 * (i + 1)
+        docs.append({"id": f"{i:024x}", "name": doc["name"], "category": doc["category"], "rating": doc["rating"],
+                     "address": doc["address"], "province": doc["province"], "district": doc["district"],
+                     "tags": doc["tags"], "location": doc["location"], "distance": distance,
+                     "distance_km": distance / 1000, "link": doc["link"], "textScore": 1.0 / (i + 1)})
+    return docs
+
+
+def models(restaurants) -> bytes:
+    page = DataRestaurantSearchPage(Restaurants=[DataRestaurantResponseModel.FromMongoDB(m) for m in restaurants],
+                                    NextCursor="cursor")
+    response = DataRestaurantSearchResponseSchema(data=page.Restaurants, next_cursor=page.NextCursor)
+    # What fastapi.routing.serialize_response does with a response model
+    value, _ = response_field.validate(response, {}, loc=("response",))
+    return response_field.serialize_json(value, by_alias=True)
+
+
+def rows(restaurants, fields=None) -> bytes:
+    page = DataRestaurantSearchPage(Rows=[DataRestaurantResponseModel.RowFromMongoDB(m, fields) for m in restaurants],
+                                    NextCursor="cursor")
+    return DataRestaurantSearchResponseSchema.DumpRows(page.Rows, page.NextCursor)
+
+
+def main(limit: int, rounds: int, fields=None):
+    docs = projected(limit)
+    restaurants = [to_response(doc) for doc in docs]
+    assert json.loads(models(restaurants)) == json.loads(rows(restaurants)), "The rows path changed the response"
+    print(f"Same JSON for both paths ({len(rows(restaurants)):,} bytes for {limit} rows)")
+
+    paths = [("handler rows", lambda: [to_response(doc) for doc in docs]),
+             ("models", lambda: models(restaurants)),
+             ("rows", lambda: rows(restaurants))]
+    if fields:
+        keep = set(SearchProjection(fields))
+        sparse_docs = [{name: value for name, value in doc.items() if name in keep} for doc in docs]
+        sparse = [to_response(doc) for doc in sparse_docs]
+        print(f"Fields {','.join(fields)}: {len(rows(sparse, fields)):,} bytes")
+        paths += [("sparse handler", lambda: [to_response(doc) for doc in sparse_docs]),
+                  ("sparse rows", lambda: rows(sparse, fields))]
+    print()
+    for name, path in paths:
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            path()
+            samples.append(time.perf_counter() - start)
+        median = statistics.median(samples)
+        print(f"  {name:<14} median {median * 1e3:6.2f} ms per page   {median / limit * 1e6:6.2f} us per row")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=100, help="Rows of the page")
+    parser.add_argument("--rounds", type=int, default=500, help="Repetitions")
+    parser.add_argument("--fields", default=None, help="A sparse fieldset to measure too (comma-separated)")
+    args = parser.parse_args()
+    main(args.limit, args.rounds, tuple(args.fields.split(",")) if args.fields else None)
@@ -0,0 +1,63 @@
+"""Benchmark: `GridSpatialIndex` radius / k-nearest queries vs a full vectorized scan.
+
+Runs on synthetic city-clustered points (no MongoDB needed) at 36k, 500k and 2M points.
+
+Usage (from the `Backend/` folder):
+    python benchmarks/bench_spatial_index.py [--sizes 36000 500000 2000000] [--rounds 200] [--cell-size 500]
+"""
+
+import sys, time, argparse, statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from core.search import GridSpatialIndex, HaversineMeters
+from benchmarks.synthetic import SyntheticPoints, RandomFocusPoints
+
+
+def timed(fn, points) -> list:
+    samples = []
+    for lat, lon in points:
+        start = time.perf_counter()
+        fn(lat, lon)
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)
+
+
+def report(name: str, samples: list):
+    print(f"    {name:<22} median {statistics.median(samples) * 1e3:8.3f} ms   "
+          f"p99 {samples[int(len(samples) * 0.99) - 1] * 1e3:8.3f} ms")
+
+
+def main(sizes: list, rounds: int, cell_size: float):
+    points = RandomFocusPoints(rounds)
+    for size in sizes:
+        lats, lons = SyntheticPoints(size)
+        start = time.perf_counter()
+        index = GridSpatialIndex(lats, lons, cell_size)
+        print(f"\n{size:,} points: built in {time.perf_counter() - start:.2f}s, "
+              f"index {index.nbytes / 2**20:.1f} MiB (cell {cell_size:.0f} m)")
+
+        for radius in (1000.0, 5000.0):
+            report(f"scan  within {radius / 1000:.0f}km",
+                   timed(lambda a, b: np.flatnonzero(HaversineMeters(a, b, lats, lons) <= radius), points))
+            report(f"grid  within {radius / 1000:.0f}km",
+                   timed(lambda a, b: index.WithinRadius(a, b, radius), points))
+
+        def scan_knn(a, b, k=20):
+            d = HaversineMeters(a, b, lats, lons)
+            top = np.argpartition(d, k - 1)[:k]
+            return top[np.argsort(d[top])]
+
+        report("scan  20-nearest", timed(scan_knn, points))
+        report("grid  20-nearest", timed(lambda a, b: index.Nearest(a, b, 20), points))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[36000, 500000, 2000000], help="Dataset sizes")
+    parser.add_argument("--rounds", type=int, default=200, help="Focus points per query")
+    parser.add_argument("--cell-size", type=float, default=500.0, help="Grid cell size in meters")
+    args = parser.parse_args()
+    main(args.sizes, args.rounds, args.cell_size)
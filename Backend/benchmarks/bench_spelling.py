@@ -0,0 +1,54 @@
+"""Benchmark: query spelling correction (`RestaurantStore.CorrectQuery`) latency.
+
+Builds the store from synthetic documents (no MongoDB needed), then corrects queries with
+one or two typos per word (dropped accents, swapped, missing and doubled letters) and
+queries that are already correct. The target is a few tens of microseconds per query.
+
+Usage (from the `Backend/` folder):
+    python benchmarks/bench_spelling.py [--count 36000] [--rounds 2000]
+"""
+
+import sys, time, argparse, statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.search import RestaurantStore
+from benchmarks.synthetic import GenerateRestaurants
+
+QUERIES = {
+    "misspelled": ["hủ tíu", "bahn mi", "pgo bo", "com tamm", "goi cuonn", "banh xoe", "mi quagn"],
+    "correct": ["phở bò", "bánh xèo", "cơm tấm", "bun cha", "mi quang"],
+}
+
+
+def main(count: int, rounds: int):
+    docs = GenerateRestaurants(count)
+    for i, doc in enumerate(docs):
+        doc["_id"] = f"{i:024x}"
+    start = time.perf_counter()
+    store = RestaurantStore(docs)
+    print(f"Built store of {store.Count:,} restaurants in {time.perf_counter() - start:.2f}s\n")
+
+    for query in QUERIES["misspelled"]:
+        print(f"  {query!r:<18} -> {store.CorrectQuery(query)!r}")
+    print()
+
+    for name, queries in QUERIES.items():
+        samples = []
+        for _ in range(rounds):
+            for query in queries:
+                start = time.perf_counter()
+                store.CorrectQuery(query)
+                samples.append(time.perf_counter() - start)
+        samples.sort()
+        print(f"  {name:<12} median {statistics.median(samples) * 1e6:7.1f} us   "
+              f"p99 {samples[int(len(samples) * 0.99) - 1] * 1e6:7.1f} us   max {samples[-1] * 1e6:7.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=36000, help="Number of synthetic restaurants")
+    parser.add_argument("--rounds", type=int, default=2000, help="Repetitions of every query")
+    args = parser.parse_args()
+    main(args.count, args.rounds)
@@ -0,0 +1,120 @@
+"""Benchmark: in-process Vietnamese inverted index vs MongoDB `$text`, recall and latency.
+
+Builds the `RestaurantStore` text index from synthetic documents and measures, for accented
+and unaccented queries ("phở bò" / "pho bo"):
+  - recall and precision against the ground truth (the restaurants whose normalized name,
+    category or address contain every query syllable),
+  - the latency of the index lookup alone and of a full `RestaurantStore.Search` (text + geo).
+With `--mongo`, the same queries also run as `$text` on a scratch database (MongoDB's default
+text analyzer has no Vietnamese support, so unaccented queries mostly miss).
+
+Usage (from the `Backend/` folder):
+    python benchmarks/bench_text_index.py [--count 36000] [--rounds 200] [--mongo]
+
+The MongoDB URI is read from `MONGODB_BENCH_URI` (default: mongodb://localhost:27017).
+Do NOT point it at the shared Atlas database, the scratch database is dropped.
+"""
+
+import sys, os, time, asyncio, argparse, statistics
+from pathlib import Path
+from typing import Dict, List, Set
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.mongodb import MongoDBSearchInputSchema
+from core.search import RestaurantStore
+from core.search.text import InvertedIndex, NormalizeVietnamese, RestaurantSearchTokens
+from benchmarks.synthetic import GenerateRestaurants, RandomFocusPoints
+
+BENCH_DATABASE = "smart_food_bench"
+
+QUERIES = ["phở", "pho", "bún bò", "bun bo", "cơm tấm", "com tam", "bánh mì", "banh mi",
+           "lẩu", "lau", "mì quảng", "mi quang", "trần hưng đạo", "tran hung dao"]
+
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    print(f"  {name:<26} median {statistics.median(samples) * 1000:8.3f} ms   p95 {p95 * 1000:8.3f} ms")
+
+
+def ground_truth(docs: List[Dict], query: str) -> Set[int]:
+    syllables = set(NormalizeVietnamese(query).split())
+    return {
+        i for i, doc in enumerate(docs)
+        if syllables <= set(NormalizeVietnamese(f"{doc['name']} {doc['category']} {doc['address']}").split())
+    }
+
+
+def quality(found: Set[int], truth: Set[int]) -> str:
+    recall = len(found & truth) / len(truth) if truth else 1.0
+    precision = len(found & truth) / len(found) if found else 1.0
+    return f"recall {recall:6.1%}   precision {precision:6.1%}   ({len(found):,} found / {len(truth):,} expected)"
+
+
+async def mongo_text(docs: List[Dict], rounds: int, truths: Dict[str, Set[int]]):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(os.getenv("MONGODB_BENCH_URI", "mongodb://localhost:27017"))
+    db = client[BENCH_DATABASE]
+    await db.restaurants.drop()
+    for i in range(0, len(docs), 5000):
+        await db.restaurants.insert_many([{**d, "row": i + j} for j, d in enumerate(docs[i:i + 5000])])
+    await db.restaurants.create_index([("name", "text"), ("category", "text"), ("address", "text")],
+                                      name="text_search_index")
+
+    print("\nMongoDB $text")
+    for query in QUERIES:
+        samples, found = [], set()
+        for _ in range(max(1, rounds // 10)):
+            start = time.perf_counter()
+            found = {d["row"] for d in await db.restaurants.find({"$text": {"$search": query}}, {"row": 1})
+                     .to_list(length=None)}
+            samples.append(time.perf_counter() - start)
+        print(f"  {query!r:<18} {quality(found, truths[query])}")
+        report(f"$text {query!r}", samples)
+
+    await client.drop_database(BENCH_DATABASE)
+    client.close()
+
+
+def main(count: int, rounds: int, mongo: bool):
+    docs = GenerateRestaurants(count)
+    for i, doc in enumerate(docs):
+        doc["_id"] = f"{i:024x}"
+    truths = {query: ground_truth(docs, query) for query in QUERIES}
+
+    start = time.perf_counter()
+    index = InvertedIndex([RestaurantSearchTokens(d["name"], d["category"], d["address"]) for d in docs])
+    print(f"Built the text index of {index.Count:,} restaurants in {time.perf_counter() - start:.2f}s "
+          f"({index.nbytes / 2**20:.2f} MiB)")
+    store = RestaurantStore(docs)
+
+    print("\nin-process index")
+    points = RandomFocusPoints(rounds)
+    for query in QUERIES:
+        syllables = NormalizeVietnamese(query).split()
+        lookups, searches = [], []
+        for lat, lon in points:
+            start = time.perf_counter()
+            found = index.Match(syllables)
+            lookups.append(time.perf_counter() - start)
+
+            inputs = MongoDBSearchInputSchema(Text=query, Latitude=lat, Longitude=lon, Radius=10000.0, Limit=20)
+            start = time.perf_counter()
+            store.Search(inputs)
+            searches.append(time.perf_counter() - start)
+        print(f"  {query!r:<18} {quality(set(found.tolist()), truths[query])}")
+        report("index lookup", lookups)
+        report("store search (10km)", searches)
+
+    if mongo:
+        asyncio.run(mongo_text(docs, rounds, truths))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=36000, help="Number of synthetic restaurants")
+    parser.add_argument("--rounds", type=int, default=200, help="Queries per case")
+    parser.add_argument("--mongo", action="store_true", help="Also measure MongoDB $text (needs a reachable MongoDB)")
+    args = parser.parse_args()
+    main(args.count, args.rounds, args.mongo)
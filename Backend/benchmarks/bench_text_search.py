@@ -0,0 +1,127 @@
+"""Benchmark: legacy vs geo-bounded `$text` search pipeline.
+
+Seeds a synthetic `restaurants` collection in a scratch database, then runs the same
+text queries through the legacy pipeline (whole-collection `$text`, distance computed
+for every match, radius filtered afterwards) and through `MongoDBHandlers.Search`
+(`$text` + `$geoWithin` + filters in the first `$match`).
+
+Usage (from the `Backend/` folder, needs a reachable MongoDB):
+    python benchmarks/bench_text_search.py [--count 36000] [--rounds 20]
+
+The MongoDB URI is read from `MONGODB_BENCH_URI` (default: mongodb://localhost:27017).
+Do NOT point it at the shared Atlas database, the scratch database is dropped.
+"""
+
+import sys, os, time, asyncio, argparse, statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from core.mongodb import MongoDBHandlers, MongoDBSearchInputSchema
+from core.mongodb.handlers import MONGODB_EARTH_RADIUS_METERS
+from benchmarks.synthetic import GenerateRestaurants, RandomFocusPoints
+
+BENCH_DATABASE = "smart_food_bench"
+QUERIES = ["phở", "bún", "bánh mì", "cơm tấm", "lẩu"]
+
+
+def legacy_text_pipeline(inputs: MongoDBSearchInputSchema) -> list:
+    """
+    The text-search pipeline as it was before the geo-bounded `$match` (same filters, but with
+    the current Earth radius, so both pipelines return the same restaurants).
+    """
+    match_conditions = []
+    if inputs.MinRating is not None:
+        match_conditions.append({"rating": {"$gte": inputs.MinRating}})
+    if inputs.Category:
+        match_conditions.append({"category": inputs.Category})
+    if inputs.Province:
+        match_conditions.append({"province": inputs.Province})
+    if inputs.District:
+        match_conditions.append({"district": inputs.District})
+
+    pipeline = [
+        {"$match": {"$text": {"$search": inputs.Text}}},
+        {"$addFields": {"textScore": {"$meta": "textScore"}}},
+        {"$addFields": {"distance": {"$multiply": [MONGODB_EARTH_RADIUS_METERS, {"$acos": {"$add": [
+            {"$multiply": [
+                {"$sin": {"$degreesToRadians": {"$arrayElemAt": ["$location.coordinates", 1]}}},
+                {"$sin": {"$degreesToRadians": inputs.Latitude}}]},
+            {"$multiply": [
+                {"$cos": {"$degreesToRadians": {"$arrayElemAt": ["$location.coordinates", 1]}}},
+                {"$cos": {"$degreesToRadians": inputs.Latitude}},
+                {"$cos": {"$degreesToRadians": {"$subtract": [
+                    inputs.Longitude, {"$arrayElemAt": ["$location.coordinates", 0]}]}}}]}
+        ]}}]}}},
+        {"$match": {"distance": {"$lte": inputs.Radius}}},
+    ]
+    if match_conditions:
+        pipeline.append({"$match": {"$and": match_conditions}})
+    pipeline += [
+        {"$addFields": {"distance_km": {"$divide": ["$distance", 1000]}}},
+        {"$sort": {"textScore": -1, "distance": 1}},
+        {"$limit": inputs.Limit},
+        {"$project": {"_id": 0, "name": 1, "distance": 1, "textScore": 1}},
+    ]
+    return pipeline
+
+
+async def seed(db, count: int):
+    await db.restaurants.drop()
+    docs = GenerateRestaurants(count)
+    for i in range(0, len(docs), 5000):
+        await db.restaurants.insert_many(docs[i:i + 5000])
+    await db.restaurants.create_index([("location", "2dsphere")])
+    await db.restaurants.create_index([("name", "text"), ("category", "text"), ("address", "text")],
+                                      name="text_search_index")
+
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    print(f"  {name:<14} median {statistics.median(samples) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+async def main(count: int, rounds: int):
+    client = AsyncIOMotorClient(os.getenv("MONGODB_BENCH_URI", "mongodb://localhost:27017"))
+    db = client[BENCH_DATABASE]
+    print(f"Seeding {count:,} synthetic restaurants...")
+    await seed(db, count)
+
+    handler = MongoDBHandlers(db)
+    points = RandomFocusPoints(rounds)
+
+    for radius in (1000.0, 5000.0, 20000.0):
+        print(f"\nradius = {radius / 1000:.0f} km")
+        for text in QUERIES:
+            legacy, bounded = [], []
+            for lat, lon in points:
+                inputs = MongoDBSearchInputSchema(Text=text, Latitude=lat, Longitude=lon, Radius=radius, Limit=20)
+
+                start = time.perf_counter()
+                old = await db.restaurants.aggregate(legacy_text_pipeline(inputs)).to_list(length=inputs.Limit)
+                legacy.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                new = await handler.Search(inputs)
+                bounded.append(time.perf_counter() - start)
+
+                if not new.success:
+                    raise RuntimeError(new.error)
+                if len(old) != new.count:
+                    print(f"  ! result count differs for '{text}' at ({lat:.4f}, {lon:.4f}): {len(old)} vs {new.count}")
+            print(f" '{text}'")
+            report("legacy", legacy)
+            report("geo-bounded", bounded)
+
+    await client.drop_database(BENCH_DATABASE)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=36000, help="Number of synthetic restaurants")
+    parser.add_argument("--rounds", type=int, default=20, help="Focus points per query")
+    args = parser.parse_args()
+    asyncio.run(main(args.count, args.rounds))
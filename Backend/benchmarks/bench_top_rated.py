@@ -0,0 +1,108 @@
+"""Benchmark: live top-rated aggregations vs the materialized `top_rated_restaurants` view.
+
+Seeds a synthetic `restaurants` collection in a scratch database, builds the view, then compares:
+  - `GetTopRated` (the live `$geoNear` + `MinRating=4.0` search around a focus point),
+  - `GetTopRatedByDistrict(materialized=False)` (live `$match` + `$sort` on `restaurants`),
+  - `GetTopRatedByDistrict()` (indexed `find` on the view).
+It also times a full build and an incremental refresh after updating a few restaurants.
+
+Usage (from the `Backend/` folder, needs a reachable MongoDB 5.0+):
+    python benchmarks/bench_top_rated.py [--count 36000] [--rounds 50] [--updates 100]
+
+The MongoDB URI is read from `MONGODB_BENCH_URI` (default: mongodb://localhost:27017).
+Do NOT point it at the shared Atlas database, the scratch database is dropped.
+"""
+
+import sys, os, time, random, asyncio, argparse, statistics
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from core.mongodb import MongoDBHandlers, MongoDBTopRatedView
+from benchmarks.synthetic import GenerateRestaurants, RandomFocusPoints, CITIES, CATEGORIES
+
+BENCH_DATABASE = "smart_food_bench"
+
+
+async def seed(db, count: int):
+    await db.restaurants.drop()
+    docs = GenerateRestaurants(count)
+    for i in range(0, len(docs), 5000):
+        await db.restaurants.insert_many(docs[i:i + 5000])
+    await db.restaurants.create_index([("location", "2dsphere")])
+    await db.restaurants.create_index([("province", 1), ("district", 1), ("rating", -1)],
+                                      name="location_rating_index")
+
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    print(f"  {name:<22} median {statistics.median(samples) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+async def timed(fn) -> float:
+    start = time.perf_counter()
+    resp = await fn()
+    elapsed = time.perf_counter() - start
+    if not resp.success:
+        raise RuntimeError(resp.error)
+    return elapsed
+
+
+async def main(count: int, rounds: int, updates: int):
+    client = AsyncIOMotorClient(os.getenv("MONGODB_BENCH_URI", "mongodb://localhost:27017"))
+    db = client[BENCH_DATABASE]
+    print(f"Seeding {count:,} synthetic restaurants...")
+    await seed(db, count)
+
+    view = MongoDBTopRatedView(db)
+    start = time.perf_counter()
+    await view.Refresh(full=True)
+    print(f"Full build: {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({await db.top_rated_restaurants.count_documents({}):,} view rows)")
+
+    handler = MongoDBHandlers(db)
+    rng = random.Random(3)
+    keys = [(rng.choice(CITIES)[0], f"Quận {rng.randint(1, 12)}", rng.choice([None] + CATEGORIES))
+            for _ in range(rounds)]
+
+    near, live, materialized = [], [], []
+    for (lat, lon), (province, district, category) in zip(RandomFocusPoints(rounds), keys):
+        near.append(await timed(lambda: handler.GetTopRated(lat, lon, category=category)))
+        live.append(await timed(lambda: handler.GetTopRatedByDistrict(province, district, category, materialized=False)))
+        materialized.append(await timed(lambda: handler.GetTopRatedByDistrict(province, district, category)))
+
+        a = await handler.GetTopRatedByDistrict(province, district, category, materialized=False)
+        b = await handler.GetTopRatedByDistrict(province, district, category)
+        if [r.id for r in a.restaurants] != [r.id for r in b.restaurants]:
+            print(f"  ! view differs from live for {province} / {district} / {category}")
+
+    print("\ntop-rated reads")
+    report("GetTopRated ($geoNear)", near)
+    report("district aggregation", live)
+    report("materialized view", materialized)
+
+    # Touch a few restaurants, then refresh only their keys
+    later = datetime.utcnow() + timedelta(seconds=1)
+    sample = await db.restaurants.aggregate([{"$sample": {"size": updates}}]).to_list(length=updates)
+    for doc in sample:
+        await db.restaurants.update_one({"_id": doc["_id"]},
+                                        {"$set": {"rating": 5.0, "updated_at": later}})
+    start = time.perf_counter()
+    refreshed = await view.Refresh()
+    print(f"\nIncremental refresh after {updates} updates: {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({refreshed} keys)")
+
+    await client.drop_database(BENCH_DATABASE)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=36000, help="Number of synthetic restaurants")
+    parser.add_argument("--rounds", type=int, default=50, help="Reads per variant")
+    parser.add_argument("--updates", type=int, default=100, help="Restaurants updated before the incremental refresh")
+    args = parser.parse_args()
+    asyncio.run(main(args.count, args.rounds, args.updates))
@@ -0,0 +1,86 @@
+"""Synthetic restaurant dataset shared by the benchmark scripts.
+
+The generated documents follow the same shape as the ones produced by
+`Data/scripts/import_to_mongodb.py`, clustered around the big Vietnamese cities
+so that radius queries behave like they do on the real 36k dataset.
+"""
+
+import random
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+# (province, center latitude, center longitude, spread in degrees, weight)
+CITIES: List[Tuple[str, float, float, float, float]] = [
+    ("Hồ Chí Minh", 10.7769, 106.7009, 0.12, 0.45),
+    ("Hà Nội", 21.0285, 105.8542, 0.10, 0.35),
+    ("Đà Nẵng", 16.0544, 108.2022, 0.06, 0.12),
+    ("Cần Thơ", 10.0452, 105.7469, 0.05, 0.08),
+]
+
+CATEGORIES = [
+    "Nhà hàng", "Quán ăn", "Quán cà phê", "Quán phở", "Quán bún",
+    "Tiệm bánh", "Nhà hàng chay", "Quán lẩu", "Quán nướng", "Quán chè",
+]
+
+DISHES = [
+    "Phở", "Bún bò", "Bún chả", "Bún riêu", "Cơm tấm", "Bánh mì", "Bánh xèo",
+    "Hủ tiếu", "Lẩu", "Chè", "Gỏi cuốn", "Cháo lòng", "Bánh cuốn", "Mì Quảng",
+]
+
+SUFFIXES = ["Bà Ba", "Cô Hai", "Số 1", "Gia Truyền", "Ngon", "Sài Gòn", "Hà Thành", "36", "Ông Tư"]
+
+STREETS = ["Lê Lợi", "Nguyễn Huệ", "Trần Hưng Đạo", "Hai Bà Trưng", "Lý Thường Kiệt", "Pasteur"]
+
+
+def GenerateRestaurants(count: int, seed: int = 42) -> List[Dict]:
+    """Generate `count` synthetic restaurant documents (deterministic for a given seed)."""
+    rng = random.Random(seed)
+    weights = [c[4] for c in CITIES]
+    now = datetime.utcnow()
+
+    docs: List[Dict] = []
+    for i in range(count):
+        province, c_lat, c_lon, spread, _ = rng.choices(CITIES, weights=weights)[0]
+        lat = rng.gauss(c_lat, spread / 2)
+        lon = rng.gauss(c_lon, spread / 2)
+        dish = rng.choice(DISHES)
+        district = f"Quận {rng.randint(1, 12)}"
+        docs.append({
+            "name": f"{dish} {rng.choice(SUFFIXES)}",
+            "category": rng.choice(CATEGORIES),
+            "address": f"{rng.randint(1, 300)} {rng.choice(STREETS)}, {district}, {province}",
+            "latitude": lat,
+            "longitude": lon,
+            "location": {"type": "Point", "coordinates": [lon, lat]},
+            "rating": round(min(5.0, max(1.0, rng.gauss(4.1, 0.5))), 1),
+            "link": None,
+            "district": district,
+            "province": province,
+            "tags": [dish.lower()],
+            "created_at": now,
+            "updated_at": now,
+        })
+    return docs
+
+
+def RandomFocusPoints(count: int, seed: int = 7) -> List[Tuple[float, float]]:
+    """Generate `count` (latitude, longitude) focus points inside the synthetic cities."""
+    rng = random.Random(seed)
+    weights = [c[4] for c in CITIES]
+    points = []
+    for _ in range(count):
+        _, c_lat, c_lon, spread, _ = rng.choices(CITIES, weights=weights)[0]
+        points.append((rng.gauss(c_lat, spread / 3), rng.gauss(c_lon, spread / 3)))
+    return points
+
+
+def SyntheticPoints(count: int, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """Generate `count` (latitudes, longitudes) float32 points with the same city clustering (vectorized)."""
+    rng = np.random.default_rng(seed)
+    weights = np.array([c[4] for c in CITIES])
+    city = rng.choice(len(CITIES), size=count, p=weights / weights.sum())
+    centers = np.array([(c[1], c[2], c[3]) for c in CITIES])[city]
+    latitudes = rng.normal(centers[:, 0], centers[:, 2] / 2).astype(np.float32)
+    longitudes = rng.normal(centers[:, 1], centers[:, 2] / 2).astype(np.float32)
+    return latitudes, longitudes
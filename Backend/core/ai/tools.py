@@ -316,9 +316,14 @@ class ToolExecutor:
         max_results = min(int(args.get("max_results", 5)), 10)
         radius_km = max(0.5, min(float(args.get("radius_km", 5.0)), 10.0))
 
+        # 0. CORRECT TYPOS ("hu tiu" -> "hu tieu") so the database finds them before falling back to SERP
+        from core.search import RestaurantStore
+        store = RestaurantStore.Get()
+        corrected_query = store.CorrectQuery(query) if store is not None and query else None
+
         # 1. SEARCH IN MONGODB
         db_results = search_restaurants_in_db(
-            query=query,
+            query=corrected_query or query,
             latitude=latitude,
             longitude=longitude,
             radius_km=radius_km,
@@ -330,7 +335,8 @@ class ToolExecutor:
                 "success": True,
                 "source": "database",
                 "results": db_results,
-                "count": len(db_results)
+                "count": len(db_results),
+                "corrected_query": corrected_query
             }
 
         # 2. FALLBACK TO SERP
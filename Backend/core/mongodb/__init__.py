@@ -1,18 +1,82 @@
 """MongoDB handlers module."""
 
-from .connection import MongoDB, MongoConfig
+from .connection import MongoDB, MongoConfig, MongoPoolConfig, MongoTimeoutsConfig
+from .pool import MongoDBPoolMetrics, MONGODB_POOL_WAIT_BUCKETS
 from .handlers import (
     MongoDBHandlers,
     MongoDBSearchInputSchema,
     MongoDBRestaurantResponse,
-    MongoDBSearchResponse
+    MongoDBSearchResponse,
+    MongoDBViewportInputSchema,
+    MongoDBViewportCluster,
+    MongoDBViewportResponse,
+    SearchInputsFingerprint,
+    DecodeSearchCursor,
+    NextSearchCursor,
+    SearchProjection,
+    MONGODB_SEARCH_FIELDS,
+    MONGODB_STREAM_BATCH_SIZE,
+    MONGODB_STREAM_MAX_LIMIT,
+    MONGODB_FACET_MAX_BUCKETS,
+    MONGODB_FACET_RATING_BOUNDARIES,
+    MONGODB_VIEWPORT_MAX_MARKERS,
+    MONGODB_VIEWPORT_MAX_CLUSTERS,
+    MONGODB_VIEWPORT_MARKER_MIN_ZOOM
 )
+from .cursor import MongoDBSearchCursor, MongoDBInvalidCursorError
+from .changes import MongoDBChangeFeed, MongoDBRestaurantChange, MongoDBChangeFeedMode
+from .planner import MongoDBQueryPlanner, MongoDBSlowQuery, MongoDBLatencyHistogram, MongoDBSearchStrategy
+from .deadline import MongoDBDeadline, MongoDBDeadlineExceededError, MongoDBCancellations
+from .indexes import MongoDBIndex, MongoDBIndexManager, MongoDBIndexReport, MongoDBIndexesOf, MONGODB_INDEXES
+from .search_tokens import MongoDBSearchTokens, MONGODB_SEARCH_TOKENS_BATCH_SIZE
+from .top_rated import MongoDBTopRatedView, MONGODB_TOP_RATED_COLLECTION, MONGODB_TOP_RATED_SIZE
 
 __all__ = [
     "MongoDB",
     "MongoConfig",
+    "MongoPoolConfig",
+    "MongoTimeoutsConfig",
+    "MongoDBPoolMetrics",
+    "MONGODB_POOL_WAIT_BUCKETS",
     "MongoDBHandlers",
     "MongoDBSearchInputSchema", 
     "MongoDBRestaurantResponse",
-    "MongoDBSearchResponse"
+    "MongoDBSearchResponse",
+    "MongoDBViewportInputSchema",
+    "MongoDBViewportCluster",
+    "MongoDBViewportResponse",
+    "SearchInputsFingerprint",
+    "DecodeSearchCursor",
+    "NextSearchCursor",
+    "SearchProjection",
+    "MONGODB_SEARCH_FIELDS",
+    "MongoDBSearchCursor",
+    "MongoDBInvalidCursorError",
+    "MongoDBChangeFeed",
+    "MongoDBRestaurantChange",
+    "MongoDBChangeFeedMode",
+    "MongoDBQueryPlanner",
+    "MongoDBSlowQuery",
+    "MongoDBLatencyHistogram",
+    "MongoDBSearchStrategy",
+    "MongoDBDeadline",
+    "MongoDBDeadlineExceededError",
+    "MongoDBCancellations",
+    "MongoDBIndex",
+    "MongoDBIndexManager",
+    "MongoDBIndexReport",
+    "MongoDBIndexesOf",
+    "MONGODB_INDEXES",
+    "MongoDBSearchTokens",
+    "MONGODB_SEARCH_TOKENS_BATCH_SIZE",
+    "MongoDBTopRatedView",
+    "MONGODB_TOP_RATED_COLLECTION",
+    "MONGODB_TOP_RATED_SIZE",
+    "MONGODB_STREAM_BATCH_SIZE",
+    "MONGODB_STREAM_MAX_LIMIT",
+    "MONGODB_FACET_MAX_BUCKETS",
+    "MONGODB_FACET_RATING_BOUNDARIES",
+    "MONGODB_VIEWPORT_MAX_MARKERS",
+    "MONGODB_VIEWPORT_MAX_CLUSTERS",
+    "MONGODB_VIEWPORT_MARKER_MIN_ZOOM"
 ]
@@ -0,0 +1,223 @@
+"""
+Restaurant data change notifications, for cache invalidation.
+
+`MongoDBChangeFeed` watches the `restaurants` collection and emits `MongoDBRestaurantChange`
+events with the changed ids and their old and new locations, so cache owners can evict
+precisely instead of relying on short TTLs. It uses a change stream when the server is a
+replica set (or mongos), and polls `updated_at` otherwise.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Set, Tuple, Callable, Awaitable, Literal
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+MONGODB_CHANGE_FEED_POLL_INTERVAL = 30.0
+"""The default polling interval (seconds) without change streams."""
+MONGODB_CHANGE_FEED_RETRY_DELAY = 5.0
+"""How long to wait before reopening a failed change stream (seconds)."""
+
+MongoDBChangeFeedMode = Literal["auto", "changeStream", "poll"]
+
+
+@dataclass
+class MongoDBRestaurantChange:
+    """An invalidation event: some restaurants changed."""
+    Ids: Set[str] = field(default_factory=set)
+    """The ids of the inserted, updated or deleted restaurants."""
+    Locations: List[Tuple[float, float]] = field(default_factory=list)
+    """The (latitude, longitude) of the changed restaurants, before and after the change."""
+    Full: bool = False
+    """Anything may have changed (collection dropped/re-imported or changes were missed): evict everything."""
+
+
+MongoDBChangeSubscriber = Callable[[MongoDBRestaurantChange], Awaitable[None]]
+
+
+def _location_of(doc: Optional[Dict[str, Any]]) -> Optional[Tuple[float, float]]:
+    try:
+        lon, lat = doc["location"]["coordinates"][:2]
+        return float(lat), float(lon)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class MongoDBChangeFeed:
+    """
+    Change notifications of the `restaurants` collection.
+
+    Subscribers are awaited one after the other, in subscription order; changes happening
+    meanwhile are batched into the next event. A subscriber error is logged, not propagated.
+
+    Usage:
+        feed = MongoDBChangeFeed(MongoDB.get_database())
+        feed.Subscribe(on_change)          # async def on_change(change: MongoDBRestaurantChange)
+        await feed.Start()
+        ...
+        await feed.Stop()
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase, mode: MongoDBChangeFeedMode = "auto",
+                 poll_interval: float = MONGODB_CHANGE_FEED_POLL_INTERVAL) -> None:
+        """
+        Args:
+            database: AsyncIOMotorDatabase instance from MongoDB.get_database()
+            mode: "changeStream", "poll", or "auto" (change stream if the server supports it).
+            poll_interval: The polling interval in seconds (poll mode).
+        """
+        self.__database = database
+        self.__collection = database.restaurants
+        self.__mode = mode
+        self.__poll_interval = poll_interval
+        self.__subscribers: List[MongoDBChangeSubscriber] = []
+        self.__task: Optional["asyncio.Task"] = None
+        # The last known location of every restaurant (the old location of a change)
+        self.__locations: Dict[str, Optional[Tuple[float, float]]] = {}
+        self.__watermark: Optional[datetime] = None
+        self.__events = 0
+
+    @property
+    def Mode(self) -> MongoDBChangeFeedMode:
+        """The mode in use ("changeStream" or "poll" once started)."""
+        return self.__mode
+
+    def Stats(self) -> Dict[str, Any]:
+        """The feed mode, number of emitted events and subscribers."""
+        return {"mode": self.__mode, "events": self.__events, "subscribers": len(self.__subscribers)}
+
+    def Subscribe(self, subscriber: MongoDBChangeSubscriber) -> Callable[[], None]:
+        """
+        Add a subscriber, returns the function removing it.
+
+        Args:
+            subscriber: Async callback receiving each MongoDBRestaurantChange.
+        """
+        self.__subscribers.append(subscriber)
+        return lambda: self.__subscribers.remove(subscriber) if subscriber in self.__subscribers else None
+
+    async def __emit(self, change: MongoDBRestaurantChange):
+        if not change.Full and not change.Ids:
+            return
+        from utils import Logger
+        self.__events += 1
+        for subscriber in list(self.__subscribers):
+            try:
+                await subscriber(change)
+            except Exception as e:
+                Logger.LogException(e, "MongoDBChangeFeed: A subscriber failed")
+
+    async def __snapshot(self):
+        """Reload the known locations (and the polling watermark) from the collection."""
+        documents = await self.__collection.find({}, {"location": 1, "updated_at": 1}).to_list(length=None)
+        self.__locations = {str(d["_id"]): _location_of(d) for d in documents}
+        dates = [d["updated_at"] for d in documents if isinstance(d.get("updated_at"), datetime)]
+        self.__watermark = max(dates) if dates else None
+
+    def __apply(self, change: MongoDBRestaurantChange, rid: str, doc: Optional[Dict[str, Any]]):
+        """Record the change of one restaurant (`doc` None if deleted)."""
+        change.Ids.add(rid)
+        old = self.__locations.pop(rid, None)
+        if old is not None:
+            change.Locations.append(old)
+        if doc is not None:
+            new = _location_of(doc)
+            self.__locations[rid] = new
+            if new is not None and new != old:
+                change.Locations.append(new)
+
+    async def __supports_change_streams(self) -> bool:
+        hello = await self.__database.client.admin.command("hello")
+        return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+    async def __watch(self):
+        from utils import Logger
+        resume_token = None
+        while True:
+            try:
+                async with self.__collection.watch(full_document="updateLookup",
+                                                   resume_after=resume_token) as stream:
+                    async for event in stream:
+                        # Drain what is already buffered, so a burst (e.g. an import) is one event
+                        change = MongoDBRestaurantChange()
+                        while event is not None:
+                            resume_token = stream.resume_token
+                            operation = event.get("operationType")
+                            if operation in ("insert", "update", "replace"):
+                                self.__apply(change, str(event["documentKey"]["_id"]), event.get("fullDocument"))
+                            elif operation == "delete":
+                                self.__apply(change, str(event["documentKey"]["_id"]), None)
+                            elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+                                change.Full = True
+                            event = await stream.try_next()
+                        if change.Full:
+                            await self.__snapshot()
+                            resume_token = None if operation == "invalidate" else resume_token
+                        await self.__emit(change)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                Logger.LogException(e, "MongoDBChangeFeed: Change stream failed, reopening")
+                # Changes may have been missed (e.g. resume token too old)
+                resume_token = None
+                await asyncio.sleep(MONGODB_CHANGE_FEED_RETRY_DELAY)
+                try:
+                    await self.__snapshot()
+                except Exception:
+                    pass
+                await self.__emit(MongoDBRestaurantChange(Full=True))
+
+    async def Poll(self) -> MongoDBRestaurantChange:
+        """
+        Poll the changes since the last poll (`updated_at`), and the deleted and inserted restaurants
+        (the ids are compared on every poll, inserts without `updated_at` included), and emit them.
+        """
+        change = MongoDBRestaurantChange()
+        query = {"updated_at": {"$gt": self.__watermark}} if self.__watermark is not None else {}
+        documents = await self.__collection.find(query, {"location": 1, "updated_at": 1}).to_list(length=None)
+        for doc in documents:
+            self.__apply(change, str(doc["_id"]), doc)
+            if isinstance(doc.get("updated_at"), datetime) and \
+                    (self.__watermark is None or doc["updated_at"] > self.__watermark):
+                self.__watermark = doc["updated_at"]
+
+        # A count comparison misses a deletion and an insert in the same interval, compare the ids
+        present = {str(d["_id"]): d["_id"] for d in await self.__collection.find({}, {"_id": 1}).to_list(length=None)}
+        for rid in [rid for rid in self.__locations if rid not in present]:
+            self.__apply(change, rid, None)
+        inserted = [key for rid, key in present.items() if rid not in self.__locations]
+        if inserted:
+            for doc in await self.__collection.find({"_id": {"$in": inserted}}, {"location": 1}).to_list(length=None):
+                self.__apply(change, str(doc["_id"]), doc)
+
+        await self.__emit(change)
+        return change
+
+    async def __poll_loop(self):
+        from utils import Logger
+        while True:
+            await asyncio.sleep(self.__poll_interval)
+            try:
+                await self.Poll()
+            except Exception as e:
+                Logger.LogException(e, "MongoDBChangeFeed: Failed to poll changes")
+
+    async def Start(self):
+        """Load the known locations and start watching (change stream or polling) in the background."""
+        from utils import Logger
+        await self.Stop()
+        await self.__snapshot()
+        if self.__mode == "auto":
+            self.__mode = "changeStream" if await self.__supports_change_streams() else "poll"
+        self.__task = asyncio.create_task(self.__watch() if self.__mode == "changeStream" else self.__poll_loop())
+        Logger.LogInfo(f"MongoDBChangeFeed: Watching {len(self.__locations):,} restaurants ({self.__mode})")
+
+    async def Stop(self):
+        """Stop watching."""
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
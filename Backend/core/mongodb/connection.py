@@ -1,10 +1,38 @@
 """MongoDB connection and configuration for Smart Food Recommendation System."""
 
-import os
-from typing import Optional
+import os, asyncio, threading
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+from typing import Optional, List, Dict, Any, Literal, Callable, TypeVar
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pymongo import MongoClient
 from pydantic import BaseModel, Field, ConfigDict
+from core.mongodb.pool import MongoDBPoolMetrics
+
+MONGODB_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+"""The module each wire compressor needs (zlib is always available)."""
+
+T = TypeVar("T")
+
+
+class MongoPoolConfig(BaseModel):
+    """MongoDB connection pool configuration (per server, per process)."""
+    model_config = ConfigDict(extra='ignore', populate_by_name=True)
+    
+    min_size: int = Field(default=0, ge=0, alias="minSize")
+    max_size: int = Field(default=100, ge=1, alias="maxSize")
+    max_connecting: int = Field(default=2, ge=1, alias="maxConnecting")
+    max_idle_time: Optional[float] = Field(default=None, gt=0, alias="maxIdleTime")
+    wait_queue_timeout: Optional[float] = Field(default=None, gt=0, alias="waitQueueTimeout")
+
+
+class MongoTimeoutsConfig(BaseModel):
+    """MongoDB client timeouts (milliseconds, None for the driver default)."""
+    model_config = ConfigDict(extra='ignore', populate_by_name=True)
+    
+    server_selection: Optional[float] = Field(default=None, gt=0, alias="serverSelection")
+    connect: Optional[float] = Field(default=None, gt=0, alias="connect")
+    socket: Optional[float] = Field(default=None, gt=0, alias="socket")
 
 
 class MongoConfig(BaseModel):
@@ -17,6 +45,44 @@ class MongoConfig(BaseModel):
     username: Optional[str] = Field(default=None, alias="username")
     password: Optional[str] = Field(default=None, alias="password")
     connection_string: Optional[str] = Field(default=None, alias="connectionString")
+    pool: MongoPoolConfig = Field(default_factory=MongoPoolConfig, alias="pool")
+    compressors: List[Literal["zstd", "snappy", "zlib"]] = Field(default_factory=list, alias="compressors")
+    zlib_level: Optional[int] = Field(default=None, ge=-1, le=9, alias="zlibLevel")
+    timeouts: MongoTimeoutsConfig = Field(default_factory=MongoTimeoutsConfig, alias="timeouts")
+    read_preference: Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"] = \
+        Field(default="primary", alias="readPreference")
+    admin_workers: int = Field(default=2, ge=1, alias="adminWorkers")
+    
+    def available_compressors(self) -> List[str]:
+        """The configured wire compressors whose module is installed (in preference order)."""
+        return [c for c in self.compressors if find_spec(MONGODB_COMPRESSOR_MODULES[c]) is not None]
+    
+    def client_options(self, pooled: bool = True) -> Dict[str, Any]:
+        """
+        The client keyword options (pool, compression, timeouts, read preference).
+        
+        Args:
+            pooled: Apply the pool sizing (the sync admin client is sized by `admin_workers` instead).
+        """
+        options: Dict[str, Any] = {"readPreference": self.read_preference}
+        if pooled:
+            options.update(minPoolSize=self.pool.min_size, maxPoolSize=self.pool.max_size,
+                           maxConnecting=self.pool.max_connecting)
+            if self.pool.max_idle_time is not None:
+                options["maxIdleTimeMS"] = int(self.pool.max_idle_time)
+            if self.pool.wait_queue_timeout is not None:
+                options["waitQueueTimeoutMS"] = int(self.pool.wait_queue_timeout)
+        compressors = self.available_compressors()
+        if compressors:
+            options["compressors"] = ",".join(compressors)
+            if "zlib" in compressors and self.zlib_level is not None:
+                options["zlibCompressionLevel"] = self.zlib_level
+        for option, value in (("serverSelectionTimeoutMS", self.timeouts.server_selection),
+                              ("connectTimeoutMS", self.timeouts.connect),
+                              ("socketTimeoutMS", self.timeouts.socket)):
+            if value is not None:
+                options[option] = int(value)
+        return options
 
 
 class MongoDB:
@@ -25,7 +91,12 @@ class MongoDB:
     _client: Optional[AsyncIOMotorClient] = None
     _database: Optional[AsyncIOMotorDatabase] = None
     _sync_client: Optional[MongoClient] = None
+    _sync_lock = threading.Lock()
+    _admin_executor: Optional[ThreadPoolExecutor] = None
+    _connection_uri: Optional[str] = None
     _config: Optional[MongoConfig] = None
+    _pool_metrics: Optional[MongoDBPoolMetrics] = None
+    _sync_pool_metrics: Optional[MongoDBPoolMetrics] = None
     
     @classmethod
     async def initialize(cls, config: Optional[MongoConfig] = None) -> bool:
@@ -34,6 +105,8 @@ class MongoDB:
         
         Args:
             config: MongoDB configuration. If None, will try to get from environment.
+                The `MONGODB_CONNECTION_STRING` environment variable also applies to a configuration
+                without a connection string.
             
         Returns:
             bool: True if connection successful, False otherwise.
@@ -50,6 +123,8 @@ class MongoDB:
                 else:
                     # Use defaults
                     config = MongoConfig()
+            elif not config.connection_string and os.getenv("MONGODB_CONNECTION_STRING"):
+                config = config.model_copy(update={"connection_string": os.getenv("MONGODB_CONNECTION_STRING")})
             
             cls._config = config
             
@@ -63,16 +138,24 @@ class MongoDB:
                     connection_uri = f"mongodb://{config.host}:{config.port}"
             
             # Create async client for runtime operations
-            cls._client = AsyncIOMotorClient(connection_uri)
+            missing = [c for c in config.compressors if c not in config.available_compressors()]
+            if missing:
+                Logger.LogWarning(f"MongoDB: Wire compressors {', '.join(missing)} are not installed, skipped")
+            cls._pool_metrics = MongoDBPoolMetrics(config.pool.max_size)
+            cls._client = AsyncIOMotorClient(connection_uri, event_listeners=[cls._pool_metrics],
+                                             **config.client_options())
             cls._database = cls._client[config.database]
             
-            # Create sync client for data loading/migration operations
-            cls._sync_client = MongoClient(connection_uri)
+            # The sync client for data loading/migration operations is created on first use
+            cls._connection_uri = connection_uri
             
             # Test connection
             await cls._client.admin.command('ping')
             
             Logger.LogInfo(f"MongoDB connected successfully to database: {config.database}")
+            Logger.LogInfo(f"MongoDB: Pool {config.pool.min_size}-{config.pool.max_size} connections per server "
+                           f"(pid {os.getpid()}), compressors: {', '.join(config.available_compressors()) or 'none'}, "
+                           f"read preference: {config.read_preference}")
             return True
             
         except Exception as e:
@@ -89,10 +172,22 @@ class MongoDB:
         try:
             from utils import Logger
             
+            if cls._pool_metrics:
+                stats = cls._pool_metrics.Stats()
+                wait = stats["checkout_wait"]
+                Logger.LogInfo(f"MongoDB: Pool peak {stats['peak_in_use']}/{stats['max_pool_size']} connections in use, "
+                               f"{stats['checkouts']} checkouts (p95 wait {wait['p95_ms'] or 0:.2f}ms), "
+                               f"{sum(stats['checkout_failures'].values())} failed")
             if cls._client:
                 cls._client.close()
-            if cls._sync_client:
-                cls._sync_client.close()
+            if cls._admin_executor:
+                cls._admin_executor.shutdown(wait=False, cancel_futures=True)
+                cls._admin_executor = None
+            with cls._sync_lock:
+                if cls._sync_client:
+                    cls._sync_client.close()
+                    cls._sync_client = None
+                    cls._sync_pool_metrics = None
                 
             Logger.LogInfo("MongoDB connection closed")
         except Exception as e:
@@ -120,7 +215,9 @@ class MongoDB:
     @classmethod
     def get_sync_client(cls) -> MongoClient:
         """
-        Get sync client for data loading/migration operations.
+        Get sync client for data loading/migration operations, creating it on first use.
+        
+        Its calls block, so call it from `run_admin` (or a script), never from the event loop.
         
         Returns:
             MongoClient: The sync MongoDB client.
@@ -129,7 +226,15 @@ class MongoDB:
             Exception: If MongoDB is not initialized.
         """
         if cls._sync_client is None:
-            raise Exception("MongoDB not initialized! Call MongoDB.initialize() first.")
+            with cls._sync_lock:
+                if cls._sync_client is None:
+                    if cls._connection_uri is None or cls._config is None:
+                        raise Exception("MongoDB not initialized! Call MongoDB.initialize() first.")
+                    # Only the admin threads use it, one connection each
+                    cls._sync_pool_metrics = MongoDBPoolMetrics(cls._config.admin_workers)
+                    cls._sync_client = MongoClient(cls._connection_uri, event_listeners=[cls._sync_pool_metrics],
+                                                   maxPoolSize=cls._config.admin_workers,
+                                                   **cls._config.client_options(pooled=False))
         return cls._sync_client
     
     @classmethod
@@ -143,51 +248,63 @@ class MongoDB:
         Raises:
             Exception: If MongoDB is not initialized.
         """
-        if cls._sync_client is None or cls._config is None:
+        client = cls.get_sync_client()
+        return client[cls._config.database]
+    
+    @classmethod
+    async def run_admin(cls, operation: Callable[..., T], *args: Any) -> T:
+        """
+        Run a blocking admin or bulk operation on the sync database, in the bounded admin thread pool
+        (`adminWorkers` threads), so it never blocks the event loop nor holds a runtime pool connection.
+        
+        Args:
+            operation: Called as `operation(sync_database, *args)` in an admin thread.
+            
+        Returns:
+            T: The operation result.
+            
+        Raises:
+            Exception: If MongoDB is not initialized, or what the operation raised.
+        """
+        if cls._config is None:
             raise Exception("MongoDB not initialized! Call MongoDB.initialize() first.")
-        return cls._sync_client[cls._config.database]
+        if cls._admin_executor is None:
+            cls._admin_executor = ThreadPoolExecutor(max_workers=cls._config.admin_workers,
+                                                     thread_name_prefix="mongodb-admin")
+        
+        def run() -> T:
+            return operation(cls.get_sync_database(), *args)
+        return await asyncio.get_running_loop().run_in_executor(cls._admin_executor, run)
+    
+    @classmethod
+    def pool_stats(cls) -> Optional[Dict[str, Any]]:
+        """
+        Get the connection pool metrics of this process (see `MongoDBPoolMetrics.Stats`).
+        
+        Returns:
+            Optional[Dict[str, Any]]: The runtime ("async") and data loading ("sync", None until the sync
+                client is first used) client metrics, None if MongoDB is not initialized.
+        """
+        if cls._pool_metrics is None:
+            return None
+        sync_metrics = cls._sync_pool_metrics
+        return {"async": cls._pool_metrics.Stats(), "sync": sync_metrics.Stats() if sync_metrics else None}
     
     @classmethod
     async def create_indexes(cls):
-        """Create database indexes for optimal query performance."""
+        """Create the missing declared indexes (`core.mongodb.indexes.MONGODB_INDEXES`), waiting for the builds."""
         try:
             from utils import Logger
+            from core.mongodb.indexes import MongoDBIndexManager
             
-            db = cls.get_database()
-            restaurants = db.restaurants
-            
-            # 1. Geospatial index for location-based queries (CRITICAL for nearby search)
-            await restaurants.create_index([("location", "2dsphere")])
-            Logger.LogInfo("Created geospatial index on 'location'")
-            
-            # 2. Text index for name, category, and address search
-            await restaurants.create_index([
-                ("name", "text"),
-                ("category", "text"),
-                ("address", "text")
-            ], name="text_search_index")
-            Logger.LogInfo("Created text search index")
-            
-            # 3. Compound index for category + rating queries
-            await restaurants.create_index([
-                ("category", 1),
-                ("rating", -1)
-            ], name="category_rating_index")
-            Logger.LogInfo("Created compound index on 'category' and 'rating'")
-            
-            # 4. Compound index for location-based filtering
-            await restaurants.create_index([
-                ("province", 1),
-                ("district", 1),
-                ("rating", -1)
-            ], name="location_rating_index")
-            Logger.LogInfo("Created compound index on 'province', 'district', and 'rating'")
-            
-            # 5. Single field index on rating for sorting
-            await restaurants.create_index([("rating", -1)], name="rating_index")
-            Logger.LogInfo("Created index on 'rating'")
-            
-            Logger.LogInfo("All MongoDB indexes created successfully")
+            report = await MongoDBIndexManager(cls.get_database(), run_admin=cls.run_admin).Verify(build=True)
+            for label in report.built:
+                Logger.LogInfo(f"Created index {label}")
+            for label, error in report.failed.items():
+                Logger.LogError(f"Failed to create index {label}: {error}")
+            
+            Logger.LogInfo("All MongoDB indexes created successfully" if not report.failed
+                           else "Some MongoDB indexes could not be created")
             
         except Exception as e:
             try:
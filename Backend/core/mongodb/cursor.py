@@ -0,0 +1,74 @@
+"""
+Opaque continuation tokens for keyset-paginated restaurant searches.
+
+A token encodes the sort key of the last returned restaurant:
+- geo search:  (distance, rating, _id)   ordered by distance asc, rating desc, _id asc
+- text search: (textScore, distance, _id) ordered by textScore desc, distance asc, _id asc
+plus a fingerprint of the query, so a token can't be replayed against another search.
+Every engine (MongoDB, the in-process store, the search cache) uses the same geo ordering and
+computes the distances in float64 with the Earth radius of `$geoNear`, so a geo page produced by
+one engine can be continued by another. Text scores differ
+between MongoDB ($text), the hybrid MongoDB strategy and the store (its own inverted index),
+so a text page is only continued by the engine that produced it (`Engine`).
+"""
+
+import base64, hashlib, json
+from typing import Optional, Literal
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+MONGODB_CURSOR_DISTANCE_TOLERANCE = 1e-6
+"""Distances (meters) closer than this are a tie when resuming, absorbing the rounding differences
+between the float64 haversine of the memory engine and the search cache and MongoDB's spherical
+distance (float32 coordinates would be ~0.5 m off, far beyond it)."""
+
+
+class MongoDBInvalidCursorError(ValueError):
+    """Raised when a continuation token is malformed or belongs to another query."""
+
+
+class MongoDBSearchCursor(BaseModel):
+    """The decoded content of a continuation token."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+
+    Version: int = Field(default=1, alias="v")
+    Fingerprint: str = Field(alias="f", description="Fingerprint of the query the token belongs to")
+    Engine: Literal["mongo", "hybrid", "memory"] = Field(default="mongo", alias="e", description="The engine that produced the page")
+    Distance: float = Field(alias="d", description="Distance (meters) of the last restaurant")
+    Rating: Optional[float] = Field(default=None, alias="r", description="Rating of the last restaurant")
+    Score: Optional[float] = Field(default=None, alias="s", description="Text score of the last restaurant")
+    Id: str = Field(alias="i", description="Id of the last restaurant")
+
+    def Encode(self) -> str:
+        """Encode into an opaque URL-safe token."""
+        raw = json.dumps(self.model_dump(by_alias=True, exclude_none=True), separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def Decode(token: str, fingerprint: str) -> "MongoDBSearchCursor":
+        """
+        Decode a token and check it belongs to the query.
+
+        Args:
+            token: The opaque token.
+            fingerprint: The fingerprint of the current query (see SearchFingerprint).
+
+        Raises:
+            MongoDBInvalidCursorError: If the token is malformed or from another query.
+        """
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            cursor = MongoDBSearchCursor.model_validate(json.loads(base64.urlsafe_b64decode(padded)))
+        except (ValueError, ValidationError) as e:
+            raise MongoDBInvalidCursorError("Malformed search cursor") from e
+        if cursor.Fingerprint != fingerprint:
+            raise MongoDBInvalidCursorError("The search cursor belongs to another query")
+        return cursor
+
+
+def SearchFingerprint(text: Optional[str], latitude: float, longitude: float, radius: float,
+                      min_rating: Optional[float], category: Optional[str],
+                      province: Optional[str], district: Optional[str]) -> str:
+    """A short stable fingerprint of the search parameters that define a result ordering."""
+    raw = json.dumps([text, latitude, longitude, radius, min_rating, category, province, district],
+                     ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,101 @@
+"""
+Time budgets of the MongoDB work of a request, and the counters of the work cut short.
+
+A request gets a `MongoDBDeadline` from the search latency objective (SLO). Every aggregation
+it runs is sent with `maxTimeMS` set to what is left of the budget, so the server itself
+stops a pathological query. When the request is cancelled instead (the client disconnected),
+the aggregation's server operation is killed and its cursor closed.
+`MongoDBCancellations` counts both, and how much work they saved.
+"""
+
+import time
+from typing import Dict, List, Any
+
+MONGODB_DEADLINE_MIN_BUDGET = 0.02
+"""The minimum `maxTimeMS` budget (seconds) of a query, so a late query still gets a chance to run."""
+
+
+class MongoDBDeadlineExceededError(TimeoutError):
+    """Raised when a query would start after its request deadline."""
+
+
+class MongoDBDeadline:
+    """
+    The deadline of the MongoDB work of a request.
+
+    Usage:
+        deadline = MongoDBDeadline(0.8)                  # 800 ms from now
+        collection.aggregate(pipeline, maxTimeMS=deadline.MaxTimeMS())
+    """
+
+    def __init__(self, budget: float, min_budget: float = MONGODB_DEADLINE_MIN_BUDGET) -> None:
+        """
+        Args:
+            budget: The time budget from now, in seconds.
+            min_budget: The minimum budget of a query started before the deadline, in seconds.
+        """
+        self.__expires = time.monotonic() + budget
+        self.__min_budget = min_budget
+
+    def Remaining(self) -> float:
+        """The seconds left before the deadline (negative once expired)."""
+        return self.__expires - time.monotonic()
+
+    def MaxTimeMS(self) -> int:
+        """
+        The `maxTimeMS` of a query starting now.
+
+        Raises:
+            MongoDBDeadlineExceededError: If the deadline has already passed.
+        """
+        remaining = self.Remaining()
+        if remaining <= 0:
+            raise MongoDBDeadlineExceededError(f"The request deadline passed {-remaining * 1000:.0f}ms ago")
+        return max(1, int(max(remaining, self.__min_budget) * 1000))
+
+
+class MongoDBCancellations:
+    """Process-wide counters of the MongoDB searches stopped by their deadline or a client disconnect."""
+
+    __counters: Dict[str, Any] = {
+        "timeouts": 0,                  # stopped by maxTimeMS (or not started after the deadline)
+        "cancelled": 0,                 # cancelled while running (client disconnected)
+        "killed_operations": 0,         # server operations killed for cancelled searches
+        "docs_examined": 0,             # documents the killed operations had examined ($currentOp)
+        "keys_examined": 0,             # index keys the killed operations had examined ($currentOp)
+        "server_time_used_ms": 0.0,     # server time the killed operations had run ($currentOp)
+        "documents_unreturned_max": 0,  # upper bound: the page limits of the cancelled searches
+        "server_time_saved_max_ms": 0.0  # upper bound: the maxTimeMS budget left to the cancelled searches
+    }
+
+    @staticmethod
+    def RecordTimeout():
+        MongoDBCancellations.__counters["timeouts"] += 1
+
+    @staticmethod
+    def RecordCancelled(operations: List[Dict[str, Any]], documents: int, budget_ms: float):
+        """
+        Args:
+            operations: The killed server operations, as reported by `$currentOp`
+                (`docsExamined`, `keysExamined`, `microsecs_running`, when known).
+            documents: The documents the search could still have returned (its limit minus
+                the documents already received).
+            budget_ms: The server time the search was still allowed to use (0 if unbounded).
+        """
+        counters = MongoDBCancellations.__counters
+        counters["cancelled"] += 1
+        counters["killed_operations"] += len(operations)
+        for operation in operations:
+            counters["docs_examined"] += int(operation.get("docsExamined") or 0)
+            counters["keys_examined"] += int(operation.get("keysExamined") or 0)
+            counters["server_time_used_ms"] += (operation.get("microsecs_running") or 0) / 1000
+        counters["documents_unreturned_max"] += max(0, documents)
+        counters["server_time_saved_max_ms"] += budget_ms
+
+    @staticmethod
+    def Stats() -> Dict[str, Any]:
+        """
+        The counters. `docs_examined`, `keys_examined` and `server_time_used_ms` are measured on
+        the killed operations; the `_max` counters are upper bounds of the work they were spared.
+        """
+        return dict(MongoDBCancellations.__counters)
@@ -3,9 +3,45 @@ MongoDB handlers for restaurant search operations.
 Follows the same pattern as VietMap handlers for consistent frontend integration.
 """
 
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, ConfigDict, Field, PositiveFloat
+import math, time, uuid, asyncio
+import numpy as np
+from typing import Optional, List, Dict, Any, Literal, AsyncIterator, Union, Tuple, Set
+from pydantic import BaseModel, ConfigDict, Field, PositiveFloat, model_validator, field_validator
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo.errors import ExecutionTimeout
+from core.mongodb.cursor import MongoDBSearchCursor, MongoDBInvalidCursorError, SearchFingerprint, MONGODB_CURSOR_DISTANCE_TOLERANCE
+from core.mongodb.top_rated import MONGODB_TOP_RATED_COLLECTION
+from core.mongodb.planner import MongoDBQueryPlanner, MongoDBSearchStrategy
+from core.mongodb.deadline import MongoDBDeadline, MongoDBDeadlineExceededError, MongoDBCancellations
+from core.mongodb.search_tokens import MongoDBSearchTokens
+
+MONGODB_EARTH_RADIUS_METERS = 6378100.0
+"""The Earth radius used by MongoDB for spherical geometry ($geoNear distances, $centerSphere radians)."""
+
+MONGODB_STREAM_BATCH_SIZE = 200
+"""The cursor batch size of streamed searches (documents held in memory at once)."""
+MONGODB_STREAM_MAX_LIMIT = 5000
+"""The maximum number of restaurants of a streamed search."""
+
+MONGODB_HYBRID_MAX_CANDIDATES = 2000
+"""The maximum number of (nearest) candidates ranked in-process by a hybrid text search."""
+
+MONGODB_FACET_MAX_BUCKETS = 20
+"""The maximum number of values of the category/district facets (most frequent first)."""
+MONGODB_FACET_RATING_BOUNDARIES = [0.0, 1.0, 2.0, 3.0, 3.5, 4.0, 4.5, 5.01]
+"""The rating facet buckets, each bucket is [boundary, next boundary)."""
+
+MONGODB_VIEWPORT_MAX_MARKERS = 300
+"""A viewport with at most this many matches returns the restaurants themselves."""
+MONGODB_VIEWPORT_MAX_CLUSTERS = 400
+"""The maximum number of clusters of a viewport (most populated first)."""
+MONGODB_VIEWPORT_MARKER_MIN_ZOOM = 17
+"""From this zoom level, a viewport always returns restaurants (best rated first, capped)."""
+MONGODB_VIEWPORT_CLUSTER_CELLS_PER_TILE = 4
+"""Clusters are the cells of a grid splitting each 256px Web Mercator tile into N x N (64px cells)."""
+MONGODB_MERCATOR_MAX_LATITUDE = 85.05112878
+"""The latitude limit of the Web Mercator projection."""
 
 
 class MongoDBSearchInputSchema(BaseModel):
@@ -21,6 +57,17 @@ class MongoDBSearchInputSchema(BaseModel):
     Province: Optional[str] = Field(default=None, description="Filter by province")
     District: Optional[str] = Field(default=None, description="Filter by district")
     Limit: int = Field(default=20, ge=1, le=100, description="Maximum number of results")
+    Cursor: Optional[str] = Field(default=None, description="Continuation token (next_cursor of the previous page)")
+    Facets: bool = Field(default=False, description="Also count all the matches (total) and their category/district/rating facets")
+    Fields: Optional[Tuple[str, ...]] = Field(default=None, description="Only project these MONGODB_SEARCH_FIELDS (None for every field)")
+    
+    @field_validator("Fields")
+    @classmethod
+    def __fields_validate(cls, fields: Optional[Tuple[str, ...]]) -> Optional[Tuple[str, ...]]:
+        unknown = [name for name in fields or () if name not in MONGODB_SEARCH_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown search fields: {', '.join(unknown)}")
+        return fields
 
 
 class MongoDBRestaurantResponse(BaseModel):
@@ -51,55 +98,253 @@ class MongoDBSearchResponse(BaseModel):
     count: int = Field(description="Number of results returned")
     query_info: Dict[str, Any] = Field(description="Information about the query")
     restaurants: List[MongoDBRestaurantResponse] = Field(description="List of restaurants")
+    next_cursor: Optional[str] = Field(default=None, description="Continuation token of the next page, None if last page")
+    total: Optional[int] = Field(default=None, description="Number of matches over all pages (if Facets requested)")
+    facets: Optional[Dict[str, List[Dict[str, Any]]]] = Field(
+        default=None,
+        description="Match counts by 'category', 'district' and 'rating' bucket, as [{'value', 'count'}] (if Facets requested)"
+    )
+    error: Optional[str] = Field(default=None, description="Error message if failed")
+    timed_out: bool = Field(default=False, description="Whether the search failed because its deadline passed")
+
+
+MONGODB_RESTAURANT_PROJECTION = {
+    "id": {"$toString": "$_id"},
+    "name": 1,
+    "category": 1,
+    "rating": 1,
+    "address": 1,
+    "province": 1,
+    "district": 1,
+    "ward": 1,
+    "tags": 1,
+    "location": 1,
+    "distance": 1,
+    "distance_km": 1,
+    "link": 1,
+    "textScore": 1,
+    "_id": 0
+}
+"""The $project of the restaurants returned by the pipelines (see `MongoDBRestaurantResponse`)."""
+MONGODB_SEARCH_KEY_FIELDS = ("id", "rating", "distance", "textScore")
+"""The projected fields every search keeps (the ordering and continuation token keys)."""
+MONGODB_SEARCH_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "id": (),
+    "score": (),
+    "name": ("name",),
+    "category": ("category",),
+    "rating": (),
+    "address": ("address",),
+    "province": ("province",),
+    "district": ("district",),
+    "ward": ("ward",),
+    "lat": ("location",),
+    "lon": ("location",),
+    "distance": (),
+    "distance_km": ("distance_km",),
+    "tags": ("tags",),
+    "link": ("link",)
+}
+"""The sparse fieldset of a search (the response field names), and the projected fields each one needs."""
+
+
+def SearchProjection(fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+    """The $project of a search returning only `fields` (MONGODB_SEARCH_FIELDS, None for every field)."""
+    if fields is None:
+        return MONGODB_RESTAURANT_PROJECTION
+    keep = set(MONGODB_SEARCH_KEY_FIELDS).union(*(MONGODB_SEARCH_FIELDS[name] for name in fields))
+    return {name: value for name, value in MONGODB_RESTAURANT_PROJECTION.items() if name in keep or name == "_id"}
+
+
+class MongoDBViewportInputSchema(BaseModel):
+    """Input schema for MongoDB map viewport (bounding box) search."""
+    model_config = ConfigDict(extra="ignore")
+    
+    MinLatitude: float = Field(ge=-90, le=90, description="South bound of the viewport")
+    MaxLatitude: float = Field(ge=-90, le=90, description="North bound of the viewport")
+    MinLongitude: float = Field(ge=-180, le=180, description="West bound of the viewport")
+    MaxLongitude: float = Field(ge=-180, le=180, description="East bound of the viewport")
+    Zoom: int = Field(ge=0, le=22, description="The map zoom level (Web Mercator)")
+    MinRating: Optional[float] = Field(default=None, ge=0.0, le=5.0, description="Minimum rating filter")
+    Category: Optional[str] = Field(default=None, description="Filter by category")
+    Province: Optional[str] = Field(default=None, description="Filter by province")
+    District: Optional[str] = Field(default=None, description="Filter by district")
+    
+    @model_validator(mode="after")
+    def __bounds_validate(self) -> "MongoDBViewportInputSchema":
+        if self.MinLatitude > self.MaxLatitude or self.MinLongitude > self.MaxLongitude:
+            raise ValueError("The viewport minimum bounds must not be greater than the maximum bounds")
+        if self.MaxLongitude - self.MinLongitude >= 180:
+            raise ValueError("The viewport must span less than 180 degrees of longitude")
+        return self
+
+
+class MongoDBViewportCluster(BaseModel):
+    """A grid cluster of restaurants of a viewport."""
+    model_config = ConfigDict(extra="ignore")
+    
+    key: str = Field(description="Stable cluster id 'zoom/x/y' (cluster grid cell)")
+    latitude: float = Field(description="Latitude of the centroid of the restaurants")
+    longitude: float = Field(description="Longitude of the centroid of the restaurants")
+    count: int = Field(description="Number of restaurants in the cluster")
+    best_rating: float = Field(description="The best rating in the cluster")
+
+
+class MongoDBViewportResponse(BaseModel):
+    """Response model for a viewport search: restaurants at high zoom, clusters at low zoom."""
+    success: bool = Field(description="Whether the search was successful")
+    total: int = Field(default=0, description="Number of restaurants in the viewport")
+    clustered: bool = Field(default=False, description="Whether `clusters` is returned instead of `restaurants`")
+    truncated: bool = Field(default=False, description="Whether some restaurants/clusters were left out (best ones kept)")
+    restaurants: List[MongoDBRestaurantResponse] = Field(default_factory=list, description="The restaurants (if not clustered)")
+    clusters: List[MongoDBViewportCluster] = Field(default_factory=list, description="The clusters (if clustered)")
+    query_info: Dict[str, Any] = Field(default_factory=dict, description="Information about the query")
     error: Optional[str] = Field(default=None, description="Error message if failed")
 
 
+def ViewportUsesMarkers(zoom: int, total: int) -> bool:
+    """Whether a viewport with `total` matches at `zoom` returns restaurants instead of clusters."""
+    return zoom >= MONGODB_VIEWPORT_MARKER_MIN_ZOOM or total <= MONGODB_VIEWPORT_MAX_MARKERS
+
+
+def ViewportClusterGridSize(zoom: int) -> int:
+    """The number of cluster grid cells along each Web Mercator axis at `zoom`."""
+    return (1 << zoom) * MONGODB_VIEWPORT_CLUSTER_CELLS_PER_TILE
+
+
+def SearchInputsFingerprint(inputs: MongoDBSearchInputSchema) -> str:
+    """The fingerprint of the search inputs that define a result ordering (page-independent)."""
+    return SearchFingerprint(inputs.Text, inputs.Latitude, inputs.Longitude, inputs.Radius,
+                             inputs.MinRating, inputs.Category, inputs.Province, inputs.District)
+
+
+def DecodeSearchCursor(inputs: MongoDBSearchInputSchema) -> Optional[MongoDBSearchCursor]:
+    """
+    Decode the continuation token of the inputs, if any.
+
+    Raises:
+        MongoDBInvalidCursorError: If the token is malformed or from another query.
+    """
+    if not inputs.Cursor:
+        return None
+    return MongoDBSearchCursor.Decode(inputs.Cursor, SearchInputsFingerprint(inputs))
+
+
+def NextSearchCursor(inputs: MongoDBSearchInputSchema,
+                     restaurants: List[MongoDBRestaurantResponse],
+                     engine: Literal["mongo", "hybrid", "memory"] = "mongo") -> Optional[str]:
+    """The continuation token after the last restaurant of a page, None if the page is the last one."""
+    if len(restaurants) < inputs.Limit or not restaurants:
+        return None
+    last = restaurants[-1]
+    return MongoDBSearchCursor(
+        Fingerprint=SearchInputsFingerprint(inputs),
+        Engine=engine,
+        Distance=last.distance or 0.0,
+        Rating=last.rating,
+        Score=last.score if inputs.Text else None,
+        Id=last.id
+    ).Encode()
+
+
 class MongoDBHandlers:
     """
     MongoDB handlers for restaurant search operations.
     Optimized for geospatial and text search queries.
     """
     
-    def __init__(self, database: AsyncIOMotorDatabase) -> None:
+    __kills: Set["asyncio.Task"] = set()
+    """The background kills of cancelled aggregations (referenced until done)."""
+    
+    def __init__(self, database: AsyncIOMotorDatabase, hybrid_text: bool = False,
+                 text_distance_weight: Optional[float] = None,
+                 text_max_candidates: int = MONGODB_HYBRID_MAX_CANDIDATES,
+                 planner: Optional[MongoDBQueryPlanner] = None) -> None:
         """
         Initialize MongoDB handlers.
         
         Args:
             database: AsyncIOMotorDatabase instance from MongoDB.get_database()
+            hybrid_text: Rank text searches in-process (BM25 over $geoNear candidates) instead of $text.
+            text_distance_weight: The share of the distance in the hybrid text score
+                (None: TEXT_DEFAULT_DISTANCE_WEIGHT, see `core.search.text.BlendDistance`).
+            text_max_candidates: The maximum number of nearest candidates of a hybrid text search.
+            planner: The (shared) query planner recording the searches and choosing the text search
+                strategy when `hybrid_text` is off, None to always use $text.
         """
         self.__db = database
         self.__collection = database.restaurants
+        self.__top_rated = database[MONGODB_TOP_RATED_COLLECTION]
+        self.__hybrid_text = hybrid_text
+        self.__text_distance_weight = text_distance_weight
+        self.__text_max_candidates = text_max_candidates
+        self.__planner = planner
+    
+    @staticmethod
+    def __build_filters(inputs: Union[MongoDBSearchInputSchema, MongoDBViewportInputSchema]) -> Dict[str, Any]:
+        """Build the plain equality/range filters shared by every strategy."""
+        filters: Dict[str, Any] = {}
+        if inputs.MinRating is not None:
+            filters["rating"] = {"$gte": inputs.MinRating}
+        if inputs.Category:
+            filters["category"] = inputs.Category
+        if inputs.Province:
+            filters["province"] = inputs.Province
+        if inputs.District:
+            filters["district"] = inputs.District
+        return filters
     
-    async def __build_pipeline(self, inputs: MongoDBSearchInputSchema) -> List[Dict[str, Any]]:
+    async def __build_pipeline(self, inputs: MongoDBSearchInputSchema,
+                               limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Build optimized aggregation pipeline based on input parameters.
+        `limit` overrides `inputs.Limit` (used by streamed searches).
         
         Strategy:
-        - If text search: Use $match with $text (MUST be first), then calculate distance manually
+        - If text search: Use $match with $text (MUST be first), bounded by a $geoWithin
+          circle and the other filters, then calculate distance only for the survivors
         - If no text: Use $geoNear (faster, can be first stage)
+        - (Hybrid text search does not use this pipeline, see `__hybrid_text_search`)
         - Apply other filters
         - Sort by relevance/distance
         """
         pipeline = []
+        filters = MongoDBHandlers.__build_filters(inputs)
+        cursor = DecodeSearchCursor(inputs)
+        if cursor is not None:
+            last_id = ObjectId(cursor.Id) if ObjectId.is_valid(cursor.Id) else cursor.Id
+            # Distances of a same restaurant may differ in the last bits between engines
+            same_distance = {"$gte": cursor.Distance - MONGODB_CURSOR_DISTANCE_TOLERANCE,
+                             "$lte": cursor.Distance + MONGODB_CURSOR_DISTANCE_TOLERANCE}
         
         if inputs.Text:
             # STRATEGY A: Text search with distance calculation
-            # Stage 1: Text search (MUST be first when using $text)
+            # Stage A1: Text search (MUST be first when using $text)
+            # The $geoWithin circle and the plain filters live in the same $match, so
+            # only restaurants inside the radius reach the distance/sort stages below.
             pipeline.append({
                 "$match": {
-                    "$text": {"$search": inputs.Text}
+                    "$text": {"$search": inputs.Text},
+                    "location": {
+                        "$geoWithin": {
+                            "$centerSphere": [
+                                [inputs.Longitude, inputs.Latitude],
+                                inputs.Radius / MONGODB_EARTH_RADIUS_METERS
+                            ]
+                        }
+                    },
+                    **filters
                 }
             })
             
-            # Stage 2: Add text score
+            # Stage A2: Add text score
             pipeline.append({
                 "$addFields": {
                     "textScore": {"$meta": "textScore"}
                 }
             })
             
-            # Stage 3: Calculate distance using $geoNear alternative
-            # Use $geoWithin for filtering, then calculate distance with $function or expression
+            # Stage A3: Calculate distance (spherical law of cosines, same Earth radius as $geoNear)
             pipeline.append({
                 "$addFields": {
                     "distance": {
@@ -112,28 +357,31 @@ class MongoDBHandlers:
                             },
                             "in": {
                                 "$multiply": [
-                                    6371000,  # Earth radius in meters
+                                    MONGODB_EARTH_RADIUS_METERS,
                                     {
                                         "$acos": {
-                                            "$add": [
-                                                {
-                                                    "$multiply": [
-                                                        {"$sin": {"$degreesToRadians": "$$lat1"}},
-                                                        {"$sin": {"$degreesToRadians": "$$lat2"}}
-                                                    ]
-                                                },
-                                                {
-                                                    "$multiply": [
-                                                        {"$cos": {"$degreesToRadians": "$$lat1"}},
-                                                        {"$cos": {"$degreesToRadians": "$$lat2"}},
-                                                        {"$cos": {
-                                                            "$degreesToRadians": {
-                                                                "$subtract": ["$$lon2", "$$lon1"]
-                                                            }
-                                                        }}
-                                                    ]
-                                                }
-                                            ]
+                                            # Clamp to 1.0, rounding can push identical points above it
+                                            "$min": [1.0, {
+                                                "$add": [
+                                                    {
+                                                        "$multiply": [
+                                                            {"$sin": {"$degreesToRadians": "$$lat1"}},
+                                                            {"$sin": {"$degreesToRadians": "$$lat2"}}
+                                                        ]
+                                                    },
+                                                    {
+                                                        "$multiply": [
+                                                            {"$cos": {"$degreesToRadians": "$$lat1"}},
+                                                            {"$cos": {"$degreesToRadians": "$$lat2"}},
+                                                            {"$cos": {
+                                                                "$degreesToRadians": {
+                                                                    "$subtract": ["$$lon2", "$$lon1"]
+                                                                }
+                                                            }}
+                                                        ]
+                                                    }
+                                                ]
+                                            }]
                                         }
                                     }
                                 ]
@@ -143,43 +391,22 @@ class MongoDBHandlers:
                 }
             })
             
-            # Stage 4: Filter by distance radius
-            pipeline.append({
-                "$match": {
-                    "distance": {"$lte": inputs.Radius}
-                }
-            })
-            
-            # Stage 5: Apply other filters
-            match_conditions = []
-            if inputs.MinRating is not None:
-                match_conditions.append({"rating": {"$gte": inputs.MinRating}})
-            if inputs.Category:
-                match_conditions.append({"category": inputs.Category})
-            if inputs.Province:
-                match_conditions.append({"province": inputs.Province})
-            if inputs.District:
-                match_conditions.append({"district": inputs.District})
-            
-            if match_conditions:
+            # Stage A4 (with a cursor): Resume after the previous page (textScore desc, distance asc, _id asc)
+            page_start = len(pipeline)
+            if cursor is not None:
                 pipeline.append({
-                    "$match": {"$and": match_conditions}
+                    "$match": {
+                        "$or": [
+                            {"textScore": {"$lt": cursor.Score}},
+                            {"textScore": cursor.Score, "distance": {"$gt": same_distance["$lte"]}},
+                            {"textScore": cursor.Score, "distance": same_distance, "_id": {"$gt": last_id}}
+                        ]
+                    }
                 })
             
         else:
             # STRATEGY B: No text search, use $geoNear (faster)
-            geo_query = {}
-            
-            # Add filters to $geoNear query
-            if inputs.MinRating is not None:
-                geo_query["rating"] = {"$gte": inputs.MinRating}
-            if inputs.Category:
-                geo_query["category"] = inputs.Category
-            if inputs.Province:
-                geo_query["province"] = inputs.Province
-            if inputs.District:
-                geo_query["district"] = inputs.District
-            
+            # Stage B1: Geo search, nearest first (MUST be first when using $geoNear)
             geo_near_stage = {
                 "$geoNear": {
                     "near": {
@@ -193,25 +420,54 @@ class MongoDBHandlers:
                 }
             }
             
-            if geo_query:
-                geo_near_stage["$geoNear"]["query"] = geo_query
+            # Add filters to $geoNear query
+            if filters:
+                geo_near_stage["$geoNear"]["query"] = filters
+            
+            # Resume after the previous page: the index scan starts at the last distance,
+            # then ties are broken on (rating desc, _id asc)
+            # (not with facets, which count the rows of the previous pages too)
+            if cursor is not None and not inputs.Facets:
+                geo_near_stage["$geoNear"]["minDistance"] = max(0.0, same_distance["$gte"])
             
             pipeline.append(geo_near_stage)
+            
+            # Stage B2: Missing ratings rank (and are returned) as 0.0, so every engine orders them the same
+            pipeline.append({
+                "$addFields": {
+                    "rating": {"$ifNull": ["$rating", 0.0]}
+                }
+            })
+            
+            # Stage B3 (with a cursor): Resume among the ties of the last distance (rating desc, _id asc)
+            page_start = len(pipeline)
+            if cursor is not None:
+                rating = cursor.Rating or 0.0
+                pipeline.append({
+                    "$match": {
+                        "$or": [
+                            {"distance": {"$gt": same_distance["$lte"]}},
+                            {"distance": same_distance, "rating": {"$lt": rating}},
+                            {"distance": same_distance, "rating": rating, "_id": {"$gt": last_id}}
+                        ]
+                    }
+                })
         
-        # Stage 3: Add distance in kilometers
+        # Stage A5/B4: Add distance in kilometers
         pipeline.append({
             "$addFields": {
                 "distance_km": {"$divide": ["$distance", 1000]}
             }
         })
         
-        # Stage 4: Sort by relevance
+        # Stage A6/B5: Sort by relevance
         if inputs.Text:
             # If text search: sort by text score first, then distance
             pipeline.append({
                 "$sort": {
                     "textScore": -1,
-                    "distance": 1
+                    "distance": 1,
+                    "_id": 1
                 }
             })
         else:
@@ -219,45 +475,250 @@ class MongoDBHandlers:
             pipeline.append({
                 "$sort": {
                     "distance": 1,
-                    "rating": -1
+                    "rating": -1,
+                    "_id": 1
                 }
             })
         
-        # Stage 5: Limit results
-        pipeline.append({"$limit": inputs.Limit})
+        # Stage A7/B6: Limit results
+        pipeline.append({"$limit": limit if limit is not None else inputs.Limit})
         
-        # Stage 6: Project only needed fields
-        pipeline.append({
-            "$project": {
-                "id": {"$toString": "$_id"},
-                "name": 1,
-                "category": 1,
-                "rating": 1,
-                "address": 1,
-                "province": 1,
-                "district": 1,
-                "ward": 1,
-                "tags": 1,
-                "location": 1,
-                "distance": 1,
-                "distance_km": 1,
-                "link": 1,
-                "textScore": 1,
-                "_id": 0
-            }
-        })
+        # Stage A8/B7: Project only needed fields (the requested fieldset)
+        pipeline.append({"$project": SearchProjection(inputs.Fields)})
+        
+        # Facets: the stages above are the page, computed next to the counts of every match
+        if inputs.Facets:
+            pipeline[page_start:] = [MongoDBHandlers.__facet_stage(pipeline[page_start:])]
         
         return pipeline
     
-    async def Search(self, inputs: MongoDBSearchInputSchema) -> MongoDBSearchResponse:
+    @staticmethod
+    def __facet_stage(page: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """The $facet running the `page` stages next to the total and facet counts of every match."""
+        return {
+            "$facet": {
+                "page": page,
+                "total": [{"$count": "count"}],
+                "category": [{"$sortByCount": "$category"}, {"$limit": MONGODB_FACET_MAX_BUCKETS}],
+                "district": [{"$sortByCount": "$district"}, {"$limit": MONGODB_FACET_MAX_BUCKETS}],
+                "rating": [{
+                    "$bucket": {
+                        "groupBy": {"$ifNull": ["$rating", 0.0]},
+                        "boundaries": MONGODB_FACET_RATING_BOUNDARIES,
+                        "default": "other"
+                    }
+                }]
+            }
+        }
+    
+    @staticmethod
+    def __read_facets(faceted: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int, Dict[str, List[Dict[str, Any]]]]:
+        """The page documents, total and facets of a `__facet_stage` result."""
+        total = faceted["total"][0]["count"] if faceted["total"] else 0
+        facets = {
+            name: [{"value": b["_id"], "count": b["count"]} for b in faceted[name]]
+            for name in ("category", "district", "rating")
+        }
+        return faceted["page"], total, facets
+    
+    def TextStrategy(self, inputs: MongoDBSearchInputSchema) -> Literal["text", "hybrid"]:
+        """
+        The strategy `Search` would use for a text search (the planner may pick either, at random
+        while exploring, so pass it back as `Search(..., strategy=)` to run exactly this one).
+        
+        Raises:
+            MongoDBInvalidCursorError: If the inputs continue a text page of the in-process store.
+        """
+        return self.__text_strategy(inputs)
+    
+    def __text_strategy(self, inputs: MongoDBSearchInputSchema) -> Literal["text", "hybrid"]:
+        """
+        The strategy of a text search, a continued page keeps the strategy of its first page.
+        Until every restaurant has its `search_tokens` (MongoDBSearchTokens), it is always $text.
+        """
+        cursor = DecodeSearchCursor(inputs)
+        if cursor is not None:
+            if cursor.Engine == "memory":
+                # Its scores are the store's BM25, not comparable with textScore or the hybrid scores
+                raise MongoDBInvalidCursorError("This text search page can only be continued by the in-process "
+                                                "store, which is not loaded: search again from the first page")
+            return "hybrid" if cursor.Engine == "hybrid" else "text"
+        if not MongoDBSearchTokens.Ready():
+            return "text"
+        if self.__hybrid_text:
+            return "hybrid"
+        if self.__planner is None:
+            return "text"
+        return self.__planner.ChooseTextStrategy(inputs, self.__text_max_candidates)
+    
+    async def __kill(self, cursor: Any, comment: str, documents: int, budget_ms: float):
+        """
+        Kill the server operation of a cancelled aggregation (found by its comment) and close its cursor,
+        recording the work the operation had done (`$currentOp`) when it was killed.
+        """
+        from utils import Logger
+        killed: List[Dict[str, Any]] = []
+        try:
+            admin = self.__db.client.admin
+            operations = await admin.aggregate([
+                {"$currentOp": {"localOps": True}},
+                {"$match": {"command.comment": comment}},
+                {"$project": {"opid": 1, "docsExamined": 1, "keysExamined": 1, "microsecs_running": 1}}
+            ]).to_list(length=None)
+            for operation in operations:
+                await admin.command("killOp", op=operation["opid"])
+                killed.append(operation)
+            await cursor.close()
+        except Exception as e:
+            Logger.LogException(e, "MongoDBHandlers: Failed to kill a cancelled search")
+        MongoDBCancellations.RecordCancelled(killed, documents, budget_ms)
+    
+    async def __aggregate(self, inputs: MongoDBSearchInputSchema, strategy: MongoDBSearchStrategy,
+                          pipeline: List[Dict[str, Any]], length: Optional[int],
+                          deadline: Optional[MongoDBDeadline] = None) -> List[Dict[str, Any]]:
+        """
+        Run a search pipeline, recording its latency (and sampled explain) in the planner.
+        
+        The aggregation gets the `maxTimeMS` left to the deadline. If the caller is cancelled
+        (client disconnected), the server operation is killed in the background.
+        """
+        comment = f"search-{uuid.uuid4().hex}"
+        options: Dict[str, Any] = {"comment": comment}
+        if deadline is not None:
+            options["maxTimeMS"] = deadline.MaxTimeMS()
+        start = time.perf_counter()
+        cursor = self.__collection.aggregate(pipeline, **options)
+        try:
+            docs = await cursor.to_list(length=length)
+        except asyncio.CancelledError:
+            budget_ms = max(0.0, deadline.Remaining() * 1000) if deadline is not None else 0.0
+            # None of the page had reached the caller: `to_list` drops the batches it had received
+            task = asyncio.get_running_loop().create_task(
+                self.__kill(cursor, comment, inputs.Limit, budget_ms)
+            )
+            MongoDBHandlers.__kills.add(task)
+            task.add_done_callback(MongoDBHandlers.__kills.discard)
+            raise
+        except ExecutionTimeout:
+            # Not recorded in the planner: explaining it would re-run the query without a time limit
+            MongoDBCancellations.RecordTimeout()
+            raise
+        if self.__planner is not None:
+            explain = {"aggregate": self.__collection.name, "pipeline": pipeline, "cursor": {}}
+            self.__planner.Record(
+                MongoDBQueryPlanner.Shape(inputs, strategy), time.perf_counter() - start, pipeline,
+                lambda: self.__db.command({"explain": explain, "verbosity": "executionStats"})
+            )
+        return docs
+    
+    async def __hybrid_text_search(self, inputs: MongoDBSearchInputSchema, limit: Optional[int] = None,
+                                   deadline: Optional[MongoDBDeadline] = None
+                                   ) -> Tuple[List[Dict[str, Any]], Optional[int], Optional[Dict[str, Any]]]:
+        """
+        Text search ranked in-process: $geoNear fetches the nearest candidates holding every
+        (diacritic-insensitive) query syllable in their `search_tokens`, then BM25 blended with
+        the distance ranks them. Same ordering as $text: (score desc, distance asc, _id asc).
+        
+        Returns:
+            The page documents (with `textScore`), and the total and facets if requested.
+        """
+        from core.search.text import TextTokens, BM25Scores, BlendDistance, TEXT_DEFAULT_DISTANCE_WEIGHT
+        
+        syllables, bigrams = TextTokens(inputs.Text or "")
+        if not syllables:
+            return [], (0 if inputs.Facets else None), \
+                ({"category": [], "district": [], "rating": []} if inputs.Facets else None)
+        
+        query = {
+            **MongoDBHandlers.__build_filters(inputs),
+            **{f"search_tokens.{syllable}": {"$exists": True} for syllable in syllables}
+        }
+        # Every candidate is scored (not just the page), so pages share the same scores
+        candidates = [
+            {"$limit": self.__text_max_candidates},
+            {"$addFields": {"distance_km": {"$divide": ["$distance", 1000]}}},
+            {"$project": {**SearchProjection(inputs.Fields), "search_tokens": 1}}
+        ]
+        pipeline: List[Dict[str, Any]] = [
+            {"$geoNear": {
+                "near": {"type": "Point", "coordinates": [inputs.Longitude, inputs.Latitude]},
+                "distanceField": "distance",
+                "maxDistance": inputs.Radius,
+                "spherical": True,
+                "key": "location",
+                "query": query
+            }},
+            {"$addFields": {"rating": {"$ifNull": ["$rating", 0.0]}}}
+        ]
+        
+        total, facets = None, None
+        if inputs.Facets:
+            pipeline.append(MongoDBHandlers.__facet_stage(candidates))
+            docs, total, facets = MongoDBHandlers.__read_facets(
+                (await self.__aggregate(inputs, "hybrid", pipeline, 1, deadline))[0]
+            )
+        else:
+            docs = await self.__aggregate(inputs, "hybrid", pipeline + candidates, None, deadline)
+        
+        weight = self.__text_distance_weight
+        scores = BlendDistance(
+            BM25Scores(syllables + bigrams, [doc.pop("search_tokens", None) or {} for doc in docs]),
+            np.array([doc["distance"] for doc in docs], dtype=np.float64),
+            inputs.Radius, TEXT_DEFAULT_DISTANCE_WEIGHT if weight is None else weight
+        )
+        for doc, score in zip(docs, scores):
+            doc["textScore"] = float(score)
+        
+        cursor = DecodeSearchCursor(inputs)
+        if cursor is not None:
+            low = cursor.Distance - MONGODB_CURSOR_DISTANCE_TOLERANCE
+            high = cursor.Distance + MONGODB_CURSOR_DISTANCE_TOLERANCE
+            score = cursor.Score or 0.0
+            docs = [
+                doc for doc in docs
+                if doc["textScore"] < score or (doc["textScore"] == score and (
+                    doc["distance"] > high or (doc["distance"] >= low and doc["id"] > cursor.Id)
+                ))
+            ]
+        
+        # The ids are ObjectId hex strings, which sort like the ObjectIds
+        docs.sort(key=lambda doc: (-doc["textScore"], doc["distance"], doc["id"]))
+        return docs[:limit if limit is not None else inputs.Limit], total, facets
+    
+    @staticmethod
+    def __to_response(doc: Dict[str, Any]) -> MongoDBRestaurantResponse:
+        """Transform a projected pipeline document to a response model."""
+        return MongoDBRestaurantResponse(
+            id=doc.get("id", ""),
+            name=doc.get("name", ""),
+            category=doc.get("category", "Unknown"),
+            rating=doc.get("rating", 0.0),
+            address=doc.get("address", ""),
+            province=doc.get("province", ""),
+            district=doc.get("district", ""),
+            ward=doc.get("ward"),
+            tags=doc.get("tags", []),
+            location=doc.get("location", {}),
+            distance=doc.get("distance"),
+            distance_km=doc.get("distance_km"),
+            link=doc.get("link"),
+            score=doc.get("textScore")
+        )
+    
+    async def Search(self, inputs: MongoDBSearchInputSchema,
+                     deadline: Optional[MongoDBDeadline] = None,
+                     strategy: Optional[MongoDBSearchStrategy] = None) -> MongoDBSearchResponse:
         """
         Search for restaurants near a location with optional filters.
         
         Args:
             inputs: MongoDBSearchInputSchema with search parameters
+            deadline: The deadline of the request (each aggregation gets the `maxTimeMS` left), None for no limit.
+                A cancelled search (client disconnected) kills its server operation.
+            strategy: The strategy of a text search ("text" or "hybrid", see `TextStrategy`), None to choose it.
             
         Returns:
-            MongoDBSearchResponse with list of restaurants
+            MongoDBSearchResponse with list of restaurants (`timed_out` if the deadline passed)
             
         Example:
             >>> handler = MongoDBHandlers(db)
@@ -270,32 +731,28 @@ class MongoDBHandlers:
             ... ))
         """
         try:
-            # Build aggregation pipeline
-            pipeline = await self.__build_pipeline(inputs)
-            
-            # Execute query
-            cursor = self.__collection.aggregate(pipeline)
-            results = await cursor.to_list(length=inputs.Limit)
+            total, facets = None, None
+            if not inputs.Text:
+                strategy = "geo"
+            elif strategy is None:
+                strategy = self.__text_strategy(inputs)
+            if strategy == "hybrid":
+                results, total, facets = await self.__hybrid_text_search(inputs, deadline=deadline)
+            else:
+                # Build aggregation pipeline
+                pipeline = await self.__build_pipeline(inputs)
+                
+                # Execute query
+                if inputs.Facets:
+                    # One document holding the page and the counts
+                    results, total, facets = MongoDBHandlers.__read_facets(
+                        (await self.__aggregate(inputs, strategy, pipeline, 1, deadline))[0]
+                    )
+                else:
+                    results = await self.__aggregate(inputs, strategy, pipeline, inputs.Limit, deadline)
             
             # Transform results to response models
-            restaurants = []
-            for doc in results:
-                restaurants.append(MongoDBRestaurantResponse(
-                    id=doc.get("id", ""),
-                    name=doc.get("name", ""),
-                    category=doc.get("category", "Unknown"),
-                    rating=doc.get("rating", 0.0),
-                    address=doc.get("address", ""),
-                    province=doc.get("province", ""),
-                    district=doc.get("district", ""),
-                    ward=doc.get("ward"),
-                    tags=doc.get("tags", []),
-                    location=doc.get("location", {}),
-                    distance=doc.get("distance"),
-                    distance_km=doc.get("distance_km"),
-                    link=doc.get("link"),
-                    score=doc.get("textScore")
-                ))
+            restaurants = [MongoDBHandlers.__to_response(doc) for doc in results]
             
             # Build response
             return MongoDBSearchResponse(
@@ -313,11 +770,26 @@ class MongoDBHandlers:
                     "category": inputs.Category,
                     "province": inputs.Province,
                     "district": inputs.District,
-                    "limit": inputs.Limit
+                    "limit": inputs.Limit,
+                    "strategy": strategy
                 },
-                restaurants=restaurants
+                restaurants=restaurants,
+                next_cursor=NextSearchCursor(inputs, restaurants, "hybrid" if strategy == "hybrid" else "mongo"),
+                total=total,
+                facets=facets
             )
             
+        except (ExecutionTimeout, MongoDBDeadlineExceededError) as e:
+            if isinstance(e, MongoDBDeadlineExceededError):
+                MongoDBCancellations.RecordTimeout()
+            return MongoDBSearchResponse(
+                success=False,
+                count=0,
+                query_info={},
+                restaurants=[],
+                error=str(e),
+                timed_out=True
+            )
         except Exception as e:
             return MongoDBSearchResponse(
                 success=False,
@@ -327,6 +799,156 @@ class MongoDBHandlers:
                 error=str(e)
             )
     
+    async def SearchStream(self, inputs: MongoDBSearchInputSchema,
+                           limit: int = MONGODB_STREAM_MAX_LIMIT,
+                           batch_size: int = MONGODB_STREAM_BATCH_SIZE,
+                           deadline: Optional[MongoDBDeadline] = None) -> AsyncIterator[MongoDBRestaurantResponse]:
+        """
+        Search restaurants like `Search`, but yield them one by one while the cursor is
+        fetched in batches, so memory stays bounded by `batch_size` whatever the result count.
+        A hybrid text search is the exception: its candidates (at most `text_max_candidates`,
+        which also caps the result count) are ranked in memory before the first one is yielded.
+        
+        Args:
+            inputs: MongoDBSearchInputSchema with search parameters (`Limit` is ignored)
+            limit: Maximum number of results (capped to MONGODB_STREAM_MAX_LIMIT)
+            batch_size: Number of documents per cursor batch
+            deadline: The deadline of the server work (the aggregation gets the `maxTimeMS` left
+                when it starts, for all its batches), None for no limit.
+            
+        Yields:
+            MongoDBRestaurantResponse, in the same order as `Search`
+            
+        Raises:
+            ExecutionTimeout, MongoDBDeadlineExceededError: If the deadline passed.
+            Exception: Any database error (unlike `Search`, errors are not wrapped in a response).
+        """
+        hybrid = bool(inputs.Text) and self.__text_strategy(inputs) == "hybrid"
+        try:
+            if hybrid:
+                # Ranked in-process, the candidates are already in memory
+                docs, _, _ = await self.__hybrid_text_search(inputs.model_copy(update={"Facets": False}),
+                                                             min(limit, MONGODB_STREAM_MAX_LIMIT), deadline)
+                for doc in docs:
+                    yield MongoDBHandlers.__to_response(doc)
+                return
+            pipeline = await self.__build_pipeline(inputs.model_copy(update={"Facets": False}),
+                                                   min(limit, MONGODB_STREAM_MAX_LIMIT))
+            options: Dict[str, Any] = {"batchSize": batch_size}
+            if deadline is not None:
+                options["maxTimeMS"] = deadline.MaxTimeMS()
+            cursor = self.__collection.aggregate(pipeline, **options)
+            try:
+                async for doc in cursor:
+                    yield MongoDBHandlers.__to_response(doc)
+            finally:
+                # Kill the server cursor too if the consumer stopped early (client disconnected)
+                await cursor.close()
+        except MongoDBDeadlineExceededError:
+            MongoDBCancellations.RecordTimeout()
+            raise
+        except ExecutionTimeout:
+            if not hybrid:  # Already recorded by the hybrid aggregation
+                MongoDBCancellations.RecordTimeout()
+            raise
+    
+    @staticmethod
+    def __mercator_cell_stage(zoom: int) -> Dict[str, Any]:
+        """The $group _id of the Web Mercator cluster grid cell of a restaurant (same as `core.search.cluster`)."""
+        size = ViewportClusterGridSize(zoom)
+        lon = {"$arrayElemAt": ["$location.coordinates", 0]}
+        lat = {"$degreesToRadians": {"$max": [-MONGODB_MERCATOR_MAX_LATITUDE, {
+            "$min": [MONGODB_MERCATOR_MAX_LATITUDE, {"$arrayElemAt": ["$location.coordinates", 1]}]
+        }]}}
+        # y = (1 - ln(tan(lat) + sec(lat)) / pi) / 2
+        mercator_y = {"$divide": [{"$subtract": [1, {"$divide": [
+            {"$ln": {"$add": [{"$tan": lat}, {"$divide": [1, {"$cos": lat}]}]}}, math.pi
+        ]}]}, 2]}
+        return {
+            "x": {"$floor": {"$multiply": [{"$divide": [{"$add": [lon, 180]}, 360]}, size]}},
+            "y": {"$floor": {"$multiply": [mercator_y, size]}}
+        }
+    
+    async def Viewport(self, inputs: MongoDBViewportInputSchema) -> MongoDBViewportResponse:
+        """
+        Search the restaurants of a map viewport. Returns the restaurants themselves when there
+        are few of them (or at high zoom), else grid clusters, so the payload stays bounded.
+        
+        Args:
+            inputs: MongoDBViewportInputSchema with the viewport and filters
+            
+        Returns:
+            MongoDBViewportResponse with either restaurants (best rated first) or clusters
+            (most populated first)
+        """
+        try:
+            filters = MongoDBHandlers.__build_filters(inputs)
+            west, south, east, north = inputs.MinLongitude, inputs.MinLatitude, inputs.MaxLongitude, inputs.MaxLatitude
+            facets: Dict[str, Any] = {
+                "total": [{"$count": "count"}],
+                "markers": [
+                    {"$sort": {"rating": -1, "_id": 1}},
+                    {"$limit": MONGODB_VIEWPORT_MAX_MARKERS},
+                    {"$project": MONGODB_RESTAURANT_PROJECTION}
+                ]
+            }
+            if inputs.Zoom < MONGODB_VIEWPORT_MARKER_MIN_ZOOM:
+                facets["clusters"] = [
+                    {"$group": {
+                        "_id": MongoDBHandlers.__mercator_cell_stage(inputs.Zoom),
+                        "count": {"$sum": 1},
+                        "latitude": {"$avg": {"$arrayElemAt": ["$location.coordinates", 1]}},
+                        "longitude": {"$avg": {"$arrayElemAt": ["$location.coordinates", 0]}},
+                        "best_rating": {"$max": "$rating"}
+                    }},
+                    {"$sort": {"count": -1, "_id.y": 1, "_id.x": 1}},
+                    {"$limit": MONGODB_VIEWPORT_MAX_CLUSTERS + 1}
+                ]
+            
+            pipeline = [
+                {"$match": {
+                    "location": {"$geoWithin": {"$geometry": {
+                        "type": "Polygon",
+                        "coordinates": [[[west, south], [east, south], [east, north], [west, north], [west, south]]]
+                    }}},
+                    **filters
+                }},
+                {"$addFields": {"rating": {"$ifNull": ["$rating", 0.0]}}},
+                {"$facet": facets}
+            ]
+            result = (await self.__collection.aggregate(pipeline).to_list(length=1))[0]
+            total = result["total"][0]["count"] if result["total"] else 0
+            
+            response = MongoDBViewportResponse(success=True, total=total, query_info={
+                "bounds": {"south": south, "west": west, "north": north, "east": east},
+                "zoom": inputs.Zoom,
+                "min_rating": inputs.MinRating,
+                "category": inputs.Category,
+                "province": inputs.Province,
+                "district": inputs.District
+            })
+            if ViewportUsesMarkers(inputs.Zoom, total):
+                response.restaurants = [MongoDBHandlers.__to_response(doc) for doc in result["markers"]]
+                response.truncated = total > len(response.restaurants)
+            else:
+                clusters = result["clusters"]
+                response.clustered = True
+                response.truncated = len(clusters) > MONGODB_VIEWPORT_MAX_CLUSTERS
+                response.clusters = [
+                    MongoDBViewportCluster(
+                        key=f"{inputs.Zoom}/{int(c['_id']['x'])}/{int(c['_id']['y'])}",
+                        latitude=c["latitude"],
+                        longitude=c["longitude"],
+                        count=c["count"],
+                        best_rating=c["best_rating"]
+                    )
+                    for c in clusters[:MONGODB_VIEWPORT_MAX_CLUSTERS]
+                ]
+            return response
+            
+        except Exception as e:
+            return MongoDBViewportResponse(success=False, error=str(e))
+    
     async def SearchNearby(
         self,
         latitude: float,
@@ -423,3 +1045,69 @@ class MongoDBHandlers:
             Limit=limit
         )
         return await self.Search(inputs)
+    
+    async def GetTopRatedByDistrict(
+        self,
+        province: str,
+        district: str,
+        category: Optional[str] = None,
+        min_rating: Optional[float] = 4.0,
+        limit: int = 10,
+        materialized: bool = True
+    ) -> MongoDBSearchResponse:
+        """
+        Get the top-rated restaurants of a district, best rated first.
+        
+        Args:
+            province: The province
+            district: The district
+            category: Category filter (optional)
+            min_rating: Minimum rating filter (default 4.0, like GetTopRated)
+            limit: Maximum number of results (at most the view size if materialized)
+            materialized: Read the `top_rated_restaurants` view (indexed find) instead of
+                aggregating the `restaurants` collection
+            
+        Returns:
+            MongoDBSearchResponse with list of top-rated restaurants (no distance)
+        """
+        try:
+            query: Dict[str, Any] = {"province": province, "district": district}
+            if category:
+                query["category"] = category
+            if min_rating is not None:
+                query["rating"] = {"$gte": min_rating}
+            
+            if materialized:
+                cursor = self.__top_rated.find(query, MONGODB_RESTAURANT_PROJECTION)
+                results = await cursor.sort([("rating", -1), ("_id", 1)]).limit(limit).to_list(length=limit)
+            else:
+                results = await self.__collection.aggregate([
+                    {"$match": query},
+                    {"$sort": {"rating": -1, "_id": 1}},
+                    {"$limit": limit},
+                    {"$project": MONGODB_RESTAURANT_PROJECTION}
+                ]).to_list(length=limit)
+            restaurants = [MongoDBHandlers.__to_response(doc) for doc in results]
+            
+            return MongoDBSearchResponse(
+                success=True,
+                count=len(restaurants),
+                query_info={
+                    "province": province,
+                    "district": district,
+                    "category": category,
+                    "min_rating": min_rating,
+                    "limit": limit,
+                    "engine": "materialized" if materialized else "mongodb"
+                },
+                restaurants=restaurants
+            )
+            
+        except Exception as e:
+            return MongoDBSearchResponse(
+                success=False,
+                count=0,
+                query_info={},
+                restaurants=[],
+                error=str(e)
+            )
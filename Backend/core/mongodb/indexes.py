@@ -0,0 +1,237 @@
+"""
+Declarative MongoDB index registry.
+
+`MONGODB_INDEXES` lists every index the backend reads rely on. `MongoDBIndexManager` diffs it
+against `list_indexes()`, builds the missing indexes (one at a time, in the background at startup)
+and reports, from `$indexStats`, the indexes that are unused since the server started, duplicated
+(same keys) or redundant (a prefix of another index). It never drops anything itself.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Tuple, Callable, Awaitable
+from pydantic import BaseModel, Field
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from core.mongodb.top_rated import MONGODB_TOP_RATED_COLLECTION
+
+
+@dataclass(frozen=True)
+class MongoDBIndex:
+    """A declared index."""
+    Collection: str
+    Name: str
+    Keys: Tuple[Tuple[str, Any], ...]
+    Options: Dict[str, Any] = field(default_factory=dict, hash=False)
+    Purpose: str = ""
+
+    @property
+    def Signature(self) -> Tuple:
+        """The key signature, comparable with `_signature` of a `list_indexes()` entry."""
+        return _signature(list(self.Keys))
+
+
+MONGODB_INDEXES: List[MongoDBIndex] = [
+    MongoDBIndex("restaurants", "location_category_rating_index",
+                 (("location", "2dsphere"), ("category", 1), ("rating", -1)),
+                 Purpose="$geoNear searches (the category/rating of the `query` filter are read from the index)"),
+    MongoDBIndex("restaurants", "text_search_index",
+                 (("name", "text"), ("category", "text"), ("address", "text")),
+                 Purpose="$text searches"),
+    MongoDBIndex("restaurants", "category_rating_index", (("category", 1), ("rating", -1)),
+                 Purpose="Top rated restaurants of a category"),
+    MongoDBIndex("restaurants", "location_rating_index", (("province", 1), ("district", 1), ("rating", -1)),
+                 Purpose="Top rated restaurants of a district (and the view refresh)"),
+    MongoDBIndex("restaurants", "rating_index", (("rating", -1),),
+                 Purpose="Top rated restaurants"),
+    MongoDBIndex("restaurants", "updated_at_index", (("updated_at", 1),),
+                 Purpose="Incremental view refresh and the polling change feed"),
+    MongoDBIndex(MONGODB_TOP_RATED_COLLECTION, "key_rating_index",
+                 (("province", 1), ("district", 1), ("category", 1), ("rating", -1), ("_id", 1)),
+                 Purpose="Top rated view reads with a category"),
+    MongoDBIndex(MONGODB_TOP_RATED_COLLECTION, "district_rating_index",
+                 (("province", 1), ("district", 1), ("rating", -1), ("_id", 1)),
+                 Purpose="Top rated view reads without a category"),
+]
+"""Every index of the backend collections."""
+
+
+def MongoDBIndexesOf(collection: str, *names: str) -> List[MongoDBIndex]:
+    """The declared indexes of a collection (only the given names, if any)."""
+    return [index for index in MONGODB_INDEXES
+            if index.Collection == collection and (not names or index.Name in names)]
+
+
+def _signature(keys: List[Tuple[str, Any]], weights: Optional[Dict[str, Any]] = None) -> Tuple:
+    """
+    The comparable signature of index keys. A text index is listed by the server as
+    `{_fts: "text", _ftsx: 1}` plus its `weights`, so its text fields become one sorted entry.
+    """
+    signature: List[Tuple[str, Any]] = []
+    text_fields = sorted(weights or {}) or sorted(name for name, kind in keys if kind == "text")
+    for name, kind in keys:
+        if name == "_ftsx":
+            continue
+        if name == "_fts" or kind == "text":
+            if ("$text", tuple(text_fields)) not in signature:
+                signature.append(("$text", tuple(text_fields)))
+            continue
+        signature.append((name, kind if isinstance(kind, str) else int(kind)))
+    return tuple(signature)
+
+
+class MongoDBIndexReport(BaseModel):
+    """The result of an index verification."""
+
+    missing: List[str] = Field(default_factory=list, description="Declared indexes not found ('collection.name')")
+    built: List[str] = Field(default_factory=list, description="Missing indexes built by this verification")
+    failed: Dict[str, str] = Field(default_factory=dict, description="Missing indexes that failed to build, and why")
+    renamed: Dict[str, str] = Field(default_factory=dict, description="Declared indexes found under another name")
+    conflicting: List[str] = Field(default_factory=list, description="Declared names used by an index with other keys")
+    undeclared: List[str] = Field(default_factory=list, description="Existing indexes not declared")
+    unused: List[str] = Field(default_factory=list, description="Indexes not used since the server started ($indexStats)")
+    duplicates: List[Tuple[str, str]] = Field(default_factory=list, description="Pairs of indexes with the same keys")
+    redundant: Dict[str, str] = Field(default_factory=dict, description="Indexes whose keys prefix another index's")
+
+
+class MongoDBIndexManager:
+    """
+    Verify (and build) the declared indexes.
+
+    Usage:
+        manager = MongoDBIndexManager(MongoDB.get_database(), run_admin=MongoDB.run_admin)
+        manager.Start()                # verify in the background, build what is missing
+        report = await manager.Verify(build=False)   # or just diff and report
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase, indexes: Optional[List[MongoDBIndex]] = None,
+                 run_admin: Optional[Callable[..., Awaitable[Any]]] = None) -> None:
+        """
+        Args:
+            database: AsyncIOMotorDatabase instance from MongoDB.get_database()
+            indexes: The declared indexes (default MONGODB_INDEXES).
+            run_admin: Runs a blocking operation on the sync database off the event loop (MongoDB.run_admin),
+                for the index builds. None builds through `database`.
+        """
+        self.__database = database
+        self.__indexes = MONGODB_INDEXES if indexes is None else indexes
+        self.__run_admin = run_admin
+        self.__task: Optional["asyncio.Task"] = None
+        self.__report: Optional[MongoDBIndexReport] = None
+
+    @property
+    def Report(self) -> Optional[MongoDBIndexReport]:
+        """The last verification report, None before the first one completes."""
+        return self.__report
+
+    async def __existing(self, collection: str) -> List[Dict[str, Any]]:
+        return await self.__database[collection].list_indexes().to_list(length=None)
+
+    async def Build(self, index: MongoDBIndex):
+        """Build one index (the server builds it without blocking reads and writes on MongoDB 4.2+)."""
+        if self.__run_admin is None:
+            await self.__database[index.Collection].create_index(list(index.Keys), name=index.Name, **index.Options)
+            return
+        # The build can take minutes, wait for it on an admin thread rather than a runtime connection
+        await self.__run_admin(lambda database: database[index.Collection].create_index(
+            list(index.Keys), name=index.Name, **index.Options))
+
+    async def Verify(self, build: bool = True) -> MongoDBIndexReport:
+        """
+        Diff the declared indexes against the existing ones, build the missing ones (if `build`),
+        then report the unused, duplicate and redundant indexes.
+
+        Args:
+            build: Build the missing indexes, one at a time.
+
+        Returns:
+            MongoDBIndexReport: The verification report (also kept as `Report`).
+        """
+        report = MongoDBIndexReport()
+        collections = list(dict.fromkeys(index.Collection for index in self.__indexes))
+        existing = {collection: await self.__existing(collection) for collection in collections}
+
+        for index in self.__indexes:
+            label = f"{index.Collection}.{index.Name}"
+            infos = existing[index.Collection]
+            same_keys = [i for i in infos if _signature(list(i["key"].items()), i.get("weights")) == index.Signature]
+            if any(i["name"] == index.Name for i in same_keys):
+                continue
+            if same_keys:
+                report.renamed[label] = same_keys[0]["name"]
+            elif any(i["name"] == index.Name for i in infos):
+                report.conflicting.append(label)
+            else:
+                report.missing.append(label)
+
+        if build:
+            for label in report.missing:
+                index = next(i for i in self.__indexes if f"{i.Collection}.{i.Name}" == label)
+                try:
+                    await self.Build(index)
+                    report.built.append(label)
+                except Exception as e:
+                    report.failed[label] = str(e)
+            for collection in collections:
+                existing[collection] = await self.__existing(collection)
+
+        declared = {(index.Collection, index.Name) for index in self.__indexes} | \
+            {(label.split(".", 1)[0], name) for label, name in report.renamed.items()}
+        for collection in collections:
+            infos = [i for i in existing[collection] if i["name"] != "_id_"]
+            report.undeclared += [f"{collection}.{i['name']}" for i in infos if (collection, i["name"]) not in declared]
+
+            signatures = {i["name"]: _signature(list(i["key"].items()), i.get("weights")) for i in infos}
+            names = list(signatures)
+            for a, name in enumerate(names):
+                for other in names[a + 1:]:
+                    if signatures[name] == signatures[other]:
+                        report.duplicates.append((f"{collection}.{name}", f"{collection}.{other}"))
+                for other in names:
+                    shorter, longer = signatures[name], signatures[other]
+                    if other != name and len(shorter) < len(longer) and longer[:len(shorter)] == shorter:
+                        report.redundant[f"{collection}.{name}"] = f"{collection}.{other}"
+                        break
+
+            try:
+                stats = await self.__database[collection].aggregate([{"$indexStats": {}}]).to_list(length=None)
+                report.unused += [f"{collection}.{s['name']}" for s in stats
+                                  if s["name"] != "_id_" and not s.get("accesses", {}).get("ops")]
+            except Exception:
+                pass  # $indexStats needs the indexStats privilege, usage is then unknown
+
+        self.__report = report
+        return report
+
+    def Start(self, build: bool = True):
+        """Verify the indexes in the background (readiness does not wait), logging the report."""
+        async def verify():
+            from utils import Logger
+            try:
+                report = await self.Verify(build)
+                for label in report.built:
+                    Logger.LogInfo(f"MongoDBIndexManager: Built missing index {label}")
+                for label, error in report.failed.items():
+                    Logger.LogError(f"MongoDBIndexManager: Failed to build index {label}: {error}")
+                if report.missing and not build:
+                    Logger.LogWarning(f"MongoDBIndexManager: Missing indexes {', '.join(report.missing)}")
+                for label, name in report.renamed.items():
+                    Logger.LogInfo(f"MongoDBIndexManager: Index {label} exists as '{name}'")
+                for label in report.conflicting:
+                    Logger.LogWarning(f"MongoDBIndexManager: Index name {label} is used with other keys")
+                for a, b in report.duplicates:
+                    Logger.LogWarning(f"MongoDBIndexManager: Duplicate indexes {a} and {b}, drop one")
+                for label, other in report.redundant.items():
+                    Logger.LogWarning(f"MongoDBIndexManager: Index {label} is a prefix of {other}, consider dropping it")
+                if report.unused:
+                    Logger.LogInfo(f"MongoDBIndexManager: Unused since the server started: {', '.join(report.unused)}")
+                if report.undeclared:
+                    Logger.LogInfo(f"MongoDBIndexManager: Undeclared indexes: {', '.join(report.undeclared)}")
+            except Exception as e:
+                Logger.LogException(e, "MongoDBIndexManager: Failed to verify the indexes")
+        self.Stop()
+        self.__task = asyncio.create_task(verify())
+
+    def Stop(self):
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
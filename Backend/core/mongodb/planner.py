@@ -0,0 +1,302 @@
+"""
+Query planner of the restaurant searches.
+
+Every search pipeline is fingerprinted by its shape (strategy, filters present, radius tier,
+facets, continuation page), and the planner keeps per shape:
+- a latency histogram,
+- the examined keys/documents of a sampled fraction of the queries (`explain("executionStats")`),
+- a bounded log of the slow queries (explained too).
+Those statistics drive the choice between the `$text` and the `$geoNear` (hybrid) strategies
+of a text search: a small circle holds few restaurants, so walking the geo index beats scoring
+every `$text` match of the whole collection, and larger circles pick the faster of the two.
+"""
+
+import time, random, asyncio, bisect
+from collections import deque
+from typing import Optional, List, Dict, Any, Tuple, Literal, Callable, Awaitable, Set, Deque
+from pydantic import BaseModel, ConfigDict, Field
+
+MONGODB_PLANNER_LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+"""The upper bounds (milliseconds) of the latency histogram buckets, the last bucket is unbounded."""
+MONGODB_PLANNER_RADIUS_TIERS = (500, 1000, 2000, 5000, 10000, 20000, 50000)
+"""The radius tiers (meters) of the query shapes, larger radiuses share the last (unbounded) tier."""
+MONGODB_PLANNER_SAMPLE_RATE = 0.01
+"""The fraction of the queries explained."""
+MONGODB_PLANNER_SLOW_THRESHOLD = 200.0
+"""A query slower than this (milliseconds) is explained and logged."""
+MONGODB_PLANNER_SLOW_LOG_SIZE = 100
+"""How many slow queries are kept (latest first)."""
+MONGODB_PLANNER_GEO_FIRST_RADIUS = 1000.0
+"""Text searches within this radius (meters) always use $geoNear."""
+MONGODB_PLANNER_MIN_SAMPLES = 20
+"""How many queries of both strategies of a shape are needed before comparing their latencies."""
+MONGODB_PLANNER_EXPLORE_RATE = 0.05
+"""The fraction of the text searches trying the strategy with too few samples."""
+
+MongoDBSearchStrategy = Literal["geo", "text", "hybrid"]
+"""`geo`: $geoNear, `text`: $text bounded by a $geoWithin circle, `hybrid`: $geoNear candidates ranked in-process."""
+
+
+def _radius_tier(radius: float) -> str:
+    index = bisect.bisect_left(MONGODB_PLANNER_RADIUS_TIERS, radius)
+    return f"r{MONGODB_PLANNER_RADIUS_TIERS[index]}" if index < len(MONGODB_PLANNER_RADIUS_TIERS) else "r+"
+
+
+def ExplainCounters(explain: Dict[str, Any]) -> Tuple[int, int, int]:
+    """
+    The examined keys, examined documents and returned documents of an `explain("executionStats")`
+    output, summed over every `executionStats` of it (aggregation stages, shards).
+    """
+    keys = docs = returned = 0
+    stack: List[Any] = [explain]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stats = node.get("executionStats")
+            if isinstance(stats, dict):
+                keys += int(stats.get("totalKeysExamined", 0))
+                docs += int(stats.get("totalDocsExamined", 0))
+                returned += int(stats.get("nReturned", 0))
+            stack.extend(v for k, v in node.items() if k != "executionStats")
+        elif isinstance(node, list):
+            stack.extend(node)
+    return keys, docs, returned
+
+
+class MongoDBLatencyHistogram:
+    """Latency histogram over MONGODB_PLANNER_LATENCY_BUCKETS (or the given bucket upper bounds)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = MONGODB_PLANNER_LATENCY_BUCKETS) -> None:
+        self.__buckets = buckets
+        self.__counts = [0] * (len(buckets) + 1)
+        self.__count = 0
+        self.__total = 0.0
+
+    @property
+    def Count(self) -> int:
+        """Number of recorded latencies."""
+        return self.__count
+
+    def Record(self, milliseconds: float):
+        self.__counts[bisect.bisect_left(self.__buckets, milliseconds)] += 1
+        self.__count += 1
+        self.__total += milliseconds
+
+    def Percentile(self, q: float) -> Optional[float]:
+        """The estimated q-th (0..1) percentile in milliseconds (interpolated in its bucket), None if empty."""
+        if self.__count == 0:
+            return None
+        rank = q * self.__count
+        seen = 0
+        for index, count in enumerate(self.__counts):
+            if count and seen + count >= rank:
+                low = self.__buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.__buckets):
+                    return float(low)
+                return low + (self.__buckets[index] - low) * (rank - seen) / count
+            seen += count
+        return float(self.__buckets[-1])
+
+    def Stats(self) -> Dict[str, Any]:
+        """The count, mean, p50/p95/p99 and the bucket counts (by upper bound, '+inf' for the last)."""
+        return {
+            "count": self.__count,
+            "mean_ms": self.__total / self.__count if self.__count else None,
+            "p50_ms": self.Percentile(0.5),
+            "p95_ms": self.Percentile(0.95),
+            "p99_ms": self.Percentile(0.99),
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.__buckets, self.__counts)},
+                "+inf": self.__counts[-1]
+            }
+        }
+
+
+class MongoDBSlowQuery(BaseModel):
+    """A slow search of the slow-query log."""
+    model_config = ConfigDict(extra="ignore")
+
+    shape: str = Field(description="The query shape")
+    duration_ms: float = Field(description="The query duration, in milliseconds")
+    timestamp: float = Field(description="When the query ran (UNIX time)")
+    keys_examined: Optional[int] = Field(default=None, description="Index keys examined (explain)")
+    docs_examined: Optional[int] = Field(default=None, description="Documents examined (explain)")
+    returned: Optional[int] = Field(default=None, description="Documents returned by the query stages (explain)")
+    pipeline: List[Dict[str, Any]] = Field(default_factory=list, description="The aggregation pipeline")
+
+
+class _ShapeStats:
+    """The statistics of one query shape."""
+
+    def __init__(self) -> None:
+        self.Latency = MongoDBLatencyHistogram()
+        self.Explained = 0
+        self.KeysExamined = 0
+        self.DocsExamined = 0
+        self.Returned = 0
+
+    def Stats(self) -> Dict[str, Any]:
+        explained = self.Explained or None
+        return {
+            "latency": self.Latency.Stats(),
+            "explained": self.Explained,
+            "avg_keys_examined": self.KeysExamined / explained if explained else None,
+            "avg_docs_examined": self.DocsExamined / explained if explained else None,
+            "avg_returned": self.Returned / explained if explained else None
+        }
+
+
+class MongoDBQueryPlanner:
+    """
+    Shared statistics of the search pipelines, and the adaptive text search strategy.
+
+    Usage:
+        planner = MongoDBQueryPlanner(sample_rate=0.01)
+        handler = MongoDBHandlers(database, planner=planner)   # every request shares the planner
+        planner.Stats()                                        # per shape latency and explain stats
+        planner.SlowQueries()
+    """
+
+    def __init__(self, sample_rate: float = MONGODB_PLANNER_SAMPLE_RATE,
+                 slow_threshold: float = MONGODB_PLANNER_SLOW_THRESHOLD,
+                 slow_log_size: int = MONGODB_PLANNER_SLOW_LOG_SIZE,
+                 adaptive: bool = True,
+                 geo_first_radius: float = MONGODB_PLANNER_GEO_FIRST_RADIUS,
+                 min_samples: int = MONGODB_PLANNER_MIN_SAMPLES,
+                 explore_rate: float = MONGODB_PLANNER_EXPLORE_RATE) -> None:
+        """
+        Args:
+            sample_rate: The fraction of the queries explained (0 to only explain slow queries).
+            slow_threshold: A query slower than this (milliseconds) is explained and logged.
+            slow_log_size: How many slow queries are kept.
+            adaptive: Choose the text search strategy from the statistics (else always $text).
+            geo_first_radius: Text searches within this radius (meters) always use $geoNear.
+            min_samples: How many queries of both strategies are needed before comparing them.
+            explore_rate: The fraction of the text searches trying the strategy with too few samples.
+        """
+        self.__sample_rate = sample_rate
+        self.__slow_threshold = slow_threshold
+        self.__adaptive = adaptive
+        self.__geo_first_radius = geo_first_radius
+        self.__min_samples = min_samples
+        self.__explore_rate = explore_rate
+        self.__shapes: Dict[str, _ShapeStats] = {}
+        self.__slow: Deque[MongoDBSlowQuery] = deque(maxlen=slow_log_size)
+        self.__explaining: Set["asyncio.Task"] = set()
+
+    @staticmethod
+    def Shape(inputs: Any, strategy: MongoDBSearchStrategy) -> str:
+        """
+        The shape of a search: strategy, filters present, radius tier, facets and continuation page,
+        e.g. "text|category,rating|r2000|page".
+
+        Args:
+            inputs: The MongoDBSearchInputSchema of the search.
+            strategy: The strategy running it.
+        """
+        filters = [name for name, value in (
+            ("rating", inputs.MinRating is not None), ("category", inputs.Category),
+            ("province", inputs.Province), ("district", inputs.District)
+        ) if value]
+        parts = [strategy, ",".join(filters) or "-", _radius_tier(inputs.Radius)]
+        if inputs.Facets:
+            parts.append("facets")
+        if inputs.Cursor:
+            parts.append("page")
+        return "|".join(parts)
+
+    def __latency(self, shape: str) -> Optional[float]:
+        stats = self.__shapes.get(shape)
+        if stats is None or stats.Latency.Count < self.__min_samples:
+            return None
+        return stats.Latency.Percentile(0.5)
+
+    def ChooseTextStrategy(self, inputs: Any, max_candidates: int) -> Literal["text", "hybrid"]:
+        """
+        The strategy of a text search (without a continuation token, a page is continued by the
+        strategy of its first page):
+        - `hybrid` ($geoNear) within `geo_first_radius`,
+        - else the strategy with the lower median latency for the same shape, once both have
+          `min_samples` queries (a few searches explore the other one until then),
+        - else `hybrid` if the explained `$text` queries of the shape examine more documents than
+          the `max_candidates` a $geoNear search fetches at most, `text` otherwise.
+
+        Args:
+            inputs: The MongoDBSearchInputSchema of the search.
+            max_candidates: The maximum number of candidates of a hybrid search.
+        """
+        if not self.__adaptive:
+            return "text"
+        if inputs.Radius <= self.__geo_first_radius:
+            return "hybrid"
+
+        text_shape = MongoDBQueryPlanner.Shape(inputs, "text")
+        hybrid_shape = MongoDBQueryPlanner.Shape(inputs, "hybrid")
+        text, hybrid = self.__latency(text_shape), self.__latency(hybrid_shape)
+        if text is not None and hybrid is not None:
+            return "hybrid" if hybrid < text else "text"
+        if random.random() < self.__explore_rate:
+            return "hybrid" if hybrid is None else "text"
+
+        stats = self.__shapes.get(text_shape)
+        if stats is not None and stats.Explained and stats.DocsExamined / stats.Explained > max_candidates:
+            return "hybrid"
+        return "text"
+
+    def Record(self, shape: str, seconds: float, pipeline: List[Dict[str, Any]],
+               explain: Callable[[], Awaitable[Dict[str, Any]]]):
+        """
+        Record the latency of a query, and explain it in the background if it is sampled or slow
+        (at most one explain runs at a time, others are skipped).
+
+        Args:
+            shape: The query shape (see `Shape`).
+            seconds: The query duration.
+            pipeline: The aggregation pipeline (kept in the slow-query log).
+            explain: Runs `explain("executionStats")` of the query.
+        """
+        milliseconds = seconds * 1000.0
+        self.__shapes.setdefault(shape, _ShapeStats()).Latency.Record(milliseconds)
+        slow = milliseconds >= self.__slow_threshold
+        if not slow and random.random() >= self.__sample_rate:
+            return
+        if self.__explaining:
+            if slow:
+                self.__log_slow(MongoDBSlowQuery(shape=shape, duration_ms=milliseconds,
+                                                 timestamp=time.time(), pipeline=pipeline))
+            return
+        task = asyncio.get_running_loop().create_task(self.__explain(shape, milliseconds, pipeline, explain, slow))
+        self.__explaining.add(task)
+        task.add_done_callback(self.__explaining.discard)
+
+    async def __explain(self, shape: str, milliseconds: float, pipeline: List[Dict[str, Any]],
+                        explain: Callable[[], Awaitable[Dict[str, Any]]], slow: bool):
+        from utils import Logger
+        entry = MongoDBSlowQuery(shape=shape, duration_ms=milliseconds, timestamp=time.time(), pipeline=pipeline)
+        try:
+            keys, docs, returned = ExplainCounters(await explain())
+            stats = self.__shapes[shape]
+            stats.Explained += 1
+            stats.KeysExamined += keys
+            stats.DocsExamined += docs
+            stats.Returned += returned
+            entry.keys_examined, entry.docs_examined, entry.returned = keys, docs, returned
+        except Exception as e:
+            Logger.LogException(e, f"MongoDBQueryPlanner: Failed to explain a '{shape}' query")
+        if slow:
+            self.__log_slow(entry)
+
+    def __log_slow(self, entry: MongoDBSlowQuery):
+        from utils import Logger
+        self.__slow.appendleft(entry)
+        Logger.LogWarning(f"MongoDBQueryPlanner: Slow '{entry.shape}' query ({entry.duration_ms:.0f} ms, "
+                          f"keys examined {entry.keys_examined}, docs examined {entry.docs_examined}, "
+                          f"returned {entry.returned})")
+
+    def Stats(self) -> Dict[str, Dict[str, Any]]:
+        """The latency histogram and average explain counters of every query shape."""
+        return {shape: stats.Stats() for shape, stats in sorted(self.__shapes.items())}
+
+    def SlowQueries(self) -> List[MongoDBSlowQuery]:
+        """The slow-query log, latest first."""
+        return list(self.__slow)
@@ -0,0 +1,168 @@
+"""
+Connection pool metrics of the MongoDB clients.
+
+`MongoDBPoolMetrics` is a pymongo connection pool listener: it keeps, per server, the open,
+checked out (in use) and waiting connection gauges with their peaks, and a histogram of the
+checkout wait times. Every uvicorn worker has its own clients, so the metrics are per process:
+a worker whose peak in-use count reaches its `maxPoolSize` while checkouts wait needs a larger
+pool (or fewer concurrent requests), one that never gets close can shrink it.
+"""
+
+import os, time, threading
+from typing import Optional, Dict, Any
+from pymongo import monitoring
+from core.mongodb.planner import MongoDBLatencyHistogram
+
+MONGODB_POOL_WAIT_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+"""The upper bounds (milliseconds) of the checkout wait histogram buckets, the last bucket is unbounded."""
+
+
+class _ServerGauges:
+    """The connection gauges of one server pool."""
+
+    def __init__(self) -> None:
+        self.Open = 0
+        self.InUse = 0
+        self.Waiting = 0
+        self.PeakInUse = 0
+        self.PeakWaiting = 0
+
+    def Stats(self) -> Dict[str, int]:
+        return {
+            "open": self.Open,
+            "in_use": self.InUse,
+            "waiting": self.Waiting,
+            "peak_in_use": self.PeakInUse,
+            "peak_waiting": self.PeakWaiting
+        }
+
+
+class MongoDBPoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool gauges and checkout wait times of a MongoDB client.
+
+    The driver calls the listener from the threads running the operations, so the state is locked.
+
+    Usage:
+        metrics = MongoDBPoolMetrics(max_pool_size=50)
+        client = AsyncIOMotorClient(uri, maxPoolSize=50, event_listeners=[metrics])
+        metrics.Stats()     # {"in_use": 3, "peak_in_use": 12, "checkout_wait": {...}, ...}
+    """
+
+    def __init__(self, max_pool_size: Optional[int] = None) -> None:
+        """
+        Args:
+            max_pool_size: The configured maximum pool size (per server), for the utilization.
+        """
+        self.__max_pool_size = max_pool_size
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__servers: Dict[str, _ServerGauges] = {}
+        self.__wait = MongoDBLatencyHistogram(MONGODB_POOL_WAIT_BUCKETS)
+        self.__checkouts = 0
+        self.__failures: Dict[str, int] = {}
+        self.__clears = 0
+        self.__created = 0
+
+    def __server(self, address) -> _ServerGauges:
+        key = f"{address[0]}:{address[1]}" if isinstance(address, tuple) else str(address)
+        gauges = self.__servers.get(key)
+        if gauges is None:
+            gauges = self.__servers[key] = _ServerGauges()
+        return gauges
+
+    def __waited(self, event) -> float:
+        """The checkout wait (milliseconds), from the event (pymongo 4.7+) or the thread's checkout start."""
+        duration = getattr(event, "duration", None)
+        if duration is None:
+            started = getattr(self.__local, "started", None)
+            duration = time.monotonic() - started if started is not None else 0.0
+        return duration * 1000
+
+    #* Pool events
+
+    def pool_created(self, event):
+        with self.__lock:
+            self.__server(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self.__lock:
+            self.__clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    #* Connection events
+
+    def connection_created(self, event):
+        with self.__lock:
+            self.__server(event.address).Open += 1
+            self.__created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self.__lock:
+            gauges = self.__server(event.address)
+            gauges.Open = max(0, gauges.Open - 1)
+
+    def connection_check_out_started(self, event):
+        self.__local.started = time.monotonic()
+        with self.__lock:
+            gauges = self.__server(event.address)
+            gauges.Waiting += 1
+            gauges.PeakWaiting = max(gauges.PeakWaiting, gauges.Waiting)
+
+    def connection_check_out_failed(self, event):
+        waited = self.__waited(event)
+        with self.__lock:
+            gauges = self.__server(event.address)
+            gauges.Waiting = max(0, gauges.Waiting - 1)
+            reason = str(getattr(event, "reason", "unknown"))
+            self.__failures[reason] = self.__failures.get(reason, 0) + 1
+            self.__wait.Record(waited)
+
+    def connection_checked_out(self, event):
+        waited = self.__waited(event)
+        with self.__lock:
+            gauges = self.__server(event.address)
+            gauges.Waiting = max(0, gauges.Waiting - 1)
+            gauges.InUse += 1
+            gauges.PeakInUse = max(gauges.PeakInUse, gauges.InUse)
+            self.__checkouts += 1
+            self.__wait.Record(waited)
+
+    def connection_checked_in(self, event):
+        with self.__lock:
+            gauges = self.__server(event.address)
+            gauges.InUse = max(0, gauges.InUse - 1)
+
+    #* Statistics
+
+    def Stats(self) -> Dict[str, Any]:
+        """
+        The pool metrics of this process: the gauges summed over the servers (and per server),
+        the checkouts, the checkout failures by reason, the pool clears and the checkout wait histogram.
+        """
+        with self.__lock:
+            servers = {address: gauges.Stats() for address, gauges in self.__servers.items()}
+            peak_in_use = max((gauges.PeakInUse for gauges in self.__servers.values()), default=0)
+            return {
+                "pid": os.getpid(),
+                "max_pool_size": self.__max_pool_size,
+                "open": sum(s["open"] for s in servers.values()),
+                "in_use": sum(s["in_use"] for s in servers.values()),
+                "waiting": sum(s["waiting"] for s in servers.values()),
+                "peak_in_use": peak_in_use,
+                "peak_utilization": peak_in_use / self.__max_pool_size if self.__max_pool_size else None,
+                "connections_created": self.__created,
+                "checkouts": self.__checkouts,
+                "checkout_failures": dict(self.__failures),
+                "pool_clears": self.__clears,
+                "checkout_wait": self.__wait.Stats(),
+                "servers": servers
+            }
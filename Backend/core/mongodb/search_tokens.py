@@ -0,0 +1,98 @@
+"""
+Backfill of the restaurants' `search_tokens`.
+
+The hybrid text search only finds the restaurants holding `search_tokens` (its `$geoNear`
+candidates are filtered on `search_tokens.<syllable>`), which `Data/scripts/import_to_mongodb.py`
+computes at import. The restaurants of a database imported before are tokenized here; until
+every restaurant has its tokens, text searches use `$text` instead.
+"""
+
+import asyncio
+from typing import Optional
+from pymongo import UpdateOne
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+MONGODB_SEARCH_TOKENS_BATCH_SIZE = 500
+"""How many restaurants are tokenized per bulk write."""
+
+_MISSING = {"search_tokens": {"$exists": False}}
+
+
+class MongoDBSearchTokens:
+    """
+    The `search_tokens` backfill, and whether the hybrid text search can be used.
+
+    Usage:
+        MongoDBSearchTokens.Start(MongoDB.get_database())   # backfill in the background
+        if MongoDBSearchTokens.Ready():
+            ...                                              # every restaurant has its tokens
+    """
+
+    __ready: bool = False
+    __task: Optional["asyncio.Task"] = None
+
+    @staticmethod
+    def Ready() -> bool:
+        """Whether every restaurant had its `search_tokens` at the last check (or backfill)."""
+        return MongoDBSearchTokens.__ready
+
+    @staticmethod
+    async def Check(database: AsyncIOMotorDatabase) -> bool:
+        """Check (and remember) whether every restaurant has its `search_tokens`."""
+        MongoDBSearchTokens.__ready = await database.restaurants.find_one(_MISSING, {"_id": 1}) is None
+        return MongoDBSearchTokens.__ready
+
+    @staticmethod
+    async def Backfill(database: AsyncIOMotorDatabase, batch_size: int = MONGODB_SEARCH_TOKENS_BATCH_SIZE) -> int:
+        """
+        Compute the `search_tokens` of the restaurants without them, `batch_size` at a time.
+        Idempotent: the tokens are only set where still missing, and `updated_at` is left as is
+        (the restaurants did not change).
+
+        Returns:
+            int: The number of tokenized restaurants.
+        """
+        from core.search.text import RestaurantSearchTokens
+        collection = database.restaurants
+        count = 0
+        while True:
+            documents = await collection.find(
+                _MISSING, {"name": 1, "category": 1, "address": 1}
+            ).limit(batch_size).to_list(length=batch_size)
+            if not documents:
+                break
+            result = await collection.bulk_write([
+                UpdateOne({"_id": doc["_id"], **_MISSING}, {"$set": {"search_tokens": RestaurantSearchTokens(
+                    doc.get("name"), doc.get("category"), doc.get("address")
+                )}})
+                for doc in documents
+            ], ordered=False)
+            count += result.modified_count
+        MongoDBSearchTokens.__ready = True
+        return count
+
+    @staticmethod
+    def Start(database: AsyncIOMotorDatabase, backfill: bool = True):
+        """Check the `search_tokens` in the background (readiness does not wait), backfilling the missing ones if `backfill`."""
+        async def run():
+            from utils import Logger
+            try:
+                if await MongoDBSearchTokens.Check(database):
+                    return
+                if not backfill:
+                    Logger.LogWarning("MongoDBSearchTokens: Some restaurants have no search_tokens, "
+                                      "text searches use $text (re-import or enable the backfill)")
+                    return
+                Logger.LogInfo("MongoDBSearchTokens: Backfilling the missing search_tokens, text searches use $text meanwhile")
+                count = await MongoDBSearchTokens.Backfill(database)
+                Logger.LogInfo(f"MongoDBSearchTokens: Tokenized {count:,} restaurants, hybrid text search enabled")
+            except Exception as e:
+                Logger.LogException(e, "MongoDBSearchTokens: Failed to backfill the search_tokens")
+        MongoDBSearchTokens.Stop()
+        MongoDBSearchTokens.__task = asyncio.create_task(run())
+
+    @staticmethod
+    def Stop():
+        if MongoDBSearchTokens.__task is not None:
+            MongoDBSearchTokens.__task.cancel()
+            MongoDBSearchTokens.__task = None
@@ -0,0 +1,179 @@
+"""
+Materialized top-rated restaurants per (province, district, category).
+
+The `top_rated_restaurants` collection holds the best `size` rated restaurants of every
+(province, district, category), ranked by (rating desc, _id). It is built with `$merge` and
+refreshed incrementally: only the keys of the restaurants changed (`updated_at`) or deleted
+since the last refresh are recomputed. Read it with `MongoDBHandlers.GetTopRatedByDistrict`.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Set, Tuple
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from core.mongodb.changes import MongoDBRestaurantChange
+
+MONGODB_TOP_RATED_COLLECTION = "top_rated_restaurants"
+"""The materialized view collection."""
+MONGODB_TOP_RATED_SIZE = 20
+"""The default number of restaurants kept per (province, district, category)."""
+MONGODB_VIEWS_STATE_COLLECTION = "materialized_views"
+"""The collection holding the refresh state (watermark) of each materialized view."""
+
+_KEY_FIELDS = {"province": 1, "district": 1, "category": 1}
+_VIEW_FIELDS = {
+    "name": 1, "category": 1, "rating": 1, "address": 1, "province": 1, "district": 1,
+    "ward": 1, "tags": 1, "location": 1, "link": 1, "updated_at": 1
+}
+
+ViewKey = Tuple[Optional[str], Optional[str], Optional[str]]
+"""A (province, district, category) key."""
+
+
+class MongoDBTopRatedView:
+    """
+    The materialized top-rated restaurants view.
+
+    Usage:
+        view = MongoDBTopRatedView(MongoDB.get_database())
+        await view.Refresh()             # full build the first time, then incremental
+        await view.Refresh(full=True)    # rebuild everything
+    """
+
+    __refresh_task: Optional["asyncio.Task"] = None
+    __refresh_lock = asyncio.Lock()
+
+    def __init__(self, database: AsyncIOMotorDatabase, size: int = MONGODB_TOP_RATED_SIZE) -> None:
+        """
+        Args:
+            database: AsyncIOMotorDatabase instance from MongoDB.get_database()
+            size: The number of restaurants kept per (province, district, category).
+        """
+        self.__database = database
+        self.__size = size
+        self.__restaurants = database.restaurants
+        self.__view = database[MONGODB_TOP_RATED_COLLECTION]
+        self.__state = database[MONGODB_VIEWS_STATE_COLLECTION]
+
+    @property
+    def Size(self) -> int:
+        return self.__size
+
+    async def EnsureIndexes(self):
+        """Create the declared indexes of the view reads (with and without a category) and of the refresh."""
+        from core.mongodb.indexes import MongoDBIndexesOf
+        for index in MongoDBIndexesOf(MONGODB_TOP_RATED_COLLECTION) + MongoDBIndexesOf("restaurants", "updated_at_index"):
+            await self.__database[index.Collection].create_index(list(index.Keys), name=index.Name, **index.Options)
+
+    def __pipeline(self, match: Dict[str, Any], refresh_id: ObjectId) -> List[Dict[str, Any]]:
+        return [
+            {"$match": {**match, "rating": {"$ne": None}}},
+            {"$setWindowFields": {
+                "partitionBy": {"province": "$province", "district": "$district", "category": "$category"},
+                "sortBy": {"rating": -1, "_id": 1},
+                "output": {"rank": {"$documentNumber": {}}}
+            }},
+            {"$match": {"rank": {"$lte": self.__size}}},
+            {"$project": {**_VIEW_FIELDS, "rank": 1, "refresh_id": {"$literal": refresh_id}}},
+            {"$merge": {"into": MONGODB_TOP_RATED_COLLECTION, "on": "_id",
+                        "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]
+
+    async def __changed_keys(self, watermark: datetime) -> Tuple[Set[ViewKey], Optional[datetime]]:
+        """The keys to recompute since `watermark`, and the new watermark."""
+        changed = await self.__restaurants.find(
+            {"updated_at": {"$gt": watermark}}, {**_KEY_FIELDS, "updated_at": 1}
+        ).to_list(length=None)
+        # The old key of a moved/recategorized restaurant is the one in the view
+        previous = await self.__view.find(
+            {"_id": {"$in": [d["_id"] for d in changed]}}, _KEY_FIELDS
+        ).to_list(length=None) if changed else []
+        deleted = await self.__view.aggregate([
+            {"$lookup": {"from": "restaurants", "localField": "_id", "foreignField": "_id", "as": "source"}},
+            {"$match": {"source": {"$size": 0}}},
+            {"$project": _KEY_FIELDS}
+        ]).to_list(length=None)
+
+        keys = {(d.get("province"), d.get("district"), d.get("category")) for d in changed + previous + deleted}
+        dates = [d["updated_at"] for d in changed if isinstance(d.get("updated_at"), datetime)]
+        return keys, max(dates) if dates else None
+
+    async def Refresh(self, full: bool = False) -> int:
+        """
+        Refresh the view: recompute the keys of the restaurants changed since the last refresh
+        (or every key if `full` or never built).
+
+        The refreshes of the process (change feed, timer) run one at a time. A refresh only
+        deletes the rows written by older refreshes (`refresh_id` ObjectIds are time ordered),
+        and the watermark never moves back, so concurrent refreshes of other processes
+        do not delete each other's rows.
+
+        Args:
+            full: Rebuild every key.
+
+        Returns:
+            int: The number of recomputed keys (-1 for a full rebuild).
+        """
+        async with MongoDBTopRatedView.__refresh_lock:
+            return await self.__refresh(full)
+
+    async def __refresh(self, full: bool) -> int:
+        state = await self.__state.find_one({"_id": MONGODB_TOP_RATED_COLLECTION})
+        full = full or state is None or state.get("size") != self.__size
+        refresh_id = ObjectId()
+
+        if full:
+            await self.EnsureIndexes()
+            latest = await self.__restaurants.find({}, {"updated_at": 1}).sort("updated_at", -1).limit(1).to_list(length=1)
+            watermark = latest[0].get("updated_at") if latest else None
+            match: Dict[str, Any] = {}
+            stale: Dict[str, Any] = {"refresh_id": {"$lt": refresh_id}}
+            count = -1
+        else:
+            keys, watermark = await self.__changed_keys(state["watermark"]) if state.get("watermark") else (set(), None)
+            if not keys:
+                return 0
+            match = {"$or": [{"province": p, "district": d, "category": c} for p, d, c in keys]}
+            stale = {**match, "refresh_id": {"$lt": refresh_id}}
+            count = len(keys)
+
+        await self.__restaurants.aggregate(self.__pipeline(match, refresh_id)).to_list(length=None)
+        # Anything of the recomputed keys merged by an older refresh fell out of the top
+        await self.__view.delete_many(stale)
+        await self.__state.update_one(
+            {"_id": MONGODB_TOP_RATED_COLLECTION},
+            {
+                "$set": {"size": self.__size, "refreshed_at": datetime.utcnow()},
+                **({"$max": {"watermark": watermark}} if watermark is not None else {})
+            },
+            upsert=True
+        )
+        return count
+
+    async def OnRestaurantsChanged(self, change: MongoDBRestaurantChange):
+        """Change feed subscriber: refresh the keys of the changed restaurants (everything if `Full`)."""
+        await self.Refresh(full=change.Full)
+
+    @staticmethod
+    def StartAutoRefresh(database: AsyncIOMotorDatabase, size: int, interval: float):
+        """Refresh the view incrementally every `interval` seconds in the background."""
+        async def loop():
+            from utils import Logger
+            view = MongoDBTopRatedView(database, size)
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    count = await view.Refresh()
+                    if count:
+                        Logger.LogInfo(f"MongoDBTopRatedView: Refreshed {count:,} keys")
+                except Exception as e:
+                    Logger.LogException(e, "MongoDBTopRatedView: Failed to refresh")
+        MongoDBTopRatedView.StopAutoRefresh()
+        MongoDBTopRatedView.__refresh_task = asyncio.create_task(loop())
+
+    @staticmethod
+    def StopAutoRefresh():
+        if MongoDBTopRatedView.__refresh_task is not None:
+            MongoDBTopRatedView.__refresh_task.cancel()
+            MongoDBTopRatedView.__refresh_task = None
@@ -0,0 +1,30 @@
+"""In-process restaurant search engine module."""
+
+from .geo import HaversineMeters, BoundingBox
+from .bitmap import Bitset, BitmapIndex, RangeBitmapIndex
+from .cluster import MercatorCells, GridClusters
+from .spatial import GridSpatialIndex, SPATIAL_DEFAULT_CELL_SIZE
+from .store import RestaurantStore, RESTAURANT_STORE_DTYPE
+from .tiles import DensityTileSet, DensityTile, DENSITY_TILE_MEDIA_TYPE
+from .autocomplete import PrefixIndex, AutocompleteSuggestion
+from .spelling import SymSpellDictionary
+
+__all__ = [
+    "HaversineMeters",
+    "BoundingBox",
+    "Bitset",
+    "BitmapIndex",
+    "RangeBitmapIndex",
+    "MercatorCells",
+    "GridClusters",
+    "GridSpatialIndex",
+    "SPATIAL_DEFAULT_CELL_SIZE",
+    "RestaurantStore",
+    "RESTAURANT_STORE_DTYPE",
+    "DensityTileSet",
+    "DensityTile",
+    "DENSITY_TILE_MEDIA_TYPE",
+    "PrefixIndex",
+    "AutocompleteSuggestion",
+    "SymSpellDictionary"
+]
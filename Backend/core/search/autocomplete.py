@@ -0,0 +1,103 @@
+"""
+In-process prefix autocomplete over normalized restaurant names and dish keywords.
+
+Every word suffix of a normalized text ("bun bo 36", "bo 36", "36") is a key of one sorted
+list, so the texts having a word starting with a prefix are one binary-searched range of keys.
+"""
+
+import bisect
+import numpy as np
+from typing import Optional, List, Dict, Callable
+from pydantic import BaseModel, ConfigDict, Field
+from core.search.text import NormalizeVietnamese
+
+AUTOCOMPLETE_MAX_CANDIDATES = 2048
+"""A prefix matching more texts only ranks its best weighted ones (cached per prefix)."""
+AUTOCOMPLETE_PROXIMITY_SCALE = 2000.0
+"""The distance (meters) at which a restaurant suggestion weighs half as much (1 / (1 + d / scale))."""
+AUTOCOMPLETE_MAX_KEYWORDS = 3
+"""The maximum number of dish keyword suggestions, listed before the restaurants."""
+
+
+class AutocompleteSuggestion(BaseModel):
+    """A single autocomplete suggestion."""
+    model_config = ConfigDict(extra="ignore")
+
+    kind: str = Field(description="'keyword' (a dish or category) or 'restaurant'")
+    text: str = Field(description="The suggested text (the keyword or the restaurant name)")
+    id: Optional[str] = Field(default=None, description="Restaurant ID (restaurant suggestions)")
+    category: Optional[str] = Field(default=None, description="Restaurant category (restaurant suggestions)")
+    rating: Optional[float] = Field(default=None, description="Restaurant rating (restaurant suggestions)")
+    distance: Optional[float] = Field(default=None, description="Distance from the focus point in meters (if given)")
+    count: Optional[int] = Field(default=None, description="Number of restaurants with the keyword (keyword suggestions)")
+
+
+class PrefixIndex:
+    """
+    Word-prefix index over texts, ranked by a static weight (and an optional query-time boost).
+
+    Usage:
+        index = PrefixIndex(["Phở Bò 36", "Bún bò Huế"], np.array([4.5, 4.0]))
+        entries = index.Complete("bo", 5)    # both, best weighted first
+    """
+
+    def __init__(self, texts: List[str], weights: np.ndarray) -> None:
+        """
+        Args:
+            texts: The texts to complete, the entry id is the list index.
+            weights: The static weight of each entry (higher first).
+        """
+        keys: List[str] = []
+        entries: List[int] = []
+        for entry, text in enumerate(texts):
+            words = NormalizeVietnamese(text or "").split()
+            for i in range(len(words)):
+                keys.append(" ".join(words[i:]))
+                entries.append(entry)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.__keys = [keys[i] for i in order]
+        self.__entries = np.array(entries, dtype=np.int32)[order] if order else np.empty(0, dtype=np.int32)
+        self.__weights = np.asarray(weights, dtype=np.float64)
+        self.__popular: Dict[str, np.ndarray] = {}
+
+    @property
+    def Count(self) -> int:
+        """Number of keys (word suffixes)."""
+        return len(self.__keys)
+
+    def Candidates(self, prefix: str) -> np.ndarray:
+        """The entries with a word starting with the (normalized) prefix, at most AUTOCOMPLETE_MAX_CANDIDATES."""
+        prefix = NormalizeVietnamese(prefix)
+        if not prefix:
+            return np.empty(0, dtype=np.int32)
+        # Normalized keys only hold [a-z0-9 ], which all sort before "\x7f"
+        low = bisect.bisect_left(self.__keys, prefix)
+        high = bisect.bisect_left(self.__keys, prefix + "\x7f", low)
+        if high - low <= AUTOCOMPLETE_MAX_CANDIDATES:
+            return np.unique(self.__entries[low:high])
+
+        # Short prefixes match thousands of texts, keep (and remember) the best weighted ones
+        popular = self.__popular.get(prefix)
+        if popular is None:
+            unique = np.unique(self.__entries[low:high])
+            popular = unique[np.argsort(-self.__weights[unique], kind="stable")[:AUTOCOMPLETE_MAX_CANDIDATES]]
+            self.__popular[prefix] = popular
+        return popular
+
+    def Complete(self, prefix: str, limit: int,
+                 boost: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> np.ndarray:
+        """
+        The best `limit` entries matching the prefix, by weight (times `boost(entries)` if given), then entry id.
+        """
+        if limit <= 0:
+            return np.empty(0, dtype=np.int32)
+        candidates = self.Candidates(prefix)
+        scores = self.__weights[candidates]
+        if boost is not None and len(candidates):
+            scores = scores * boost(candidates)
+        if len(candidates) > limit:
+            # Keep everything up to the limit-th score (ties included) before the exact sort
+            threshold = -np.partition(-scores, limit - 1)[limit - 1]
+            keep = scores >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+        return candidates[np.lexsort((candidates, -scores))[:limit]]
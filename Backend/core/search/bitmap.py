@@ -0,0 +1,176 @@
+"""Precomputed bitmap filter indexes (packed uint64 bitsets) for the in-process search engine."""
+
+import numpy as np
+from typing import Iterable, Optional
+
+
+class Bitset:
+    """
+    A fixed-size bitset packed into uint64 words (bit `i` is bit `i % 64` of word `i // 64`).
+
+    Supports `&`, `|`, `~` (word-wise, vectorized) and `bitset[ids]`, which returns the bits of
+    the given ids as a bool array, so a Bitset can be used wherever a bool mask is indexed.
+    """
+    __slots__ = ("words", "size")
+
+    def __init__(self, words: np.ndarray, size: int) -> None:
+        self.words = words
+        self.size = size
+
+    @staticmethod
+    def Empty(size: int) -> "Bitset":
+        """A bitset with every bit cleared."""
+        return Bitset(np.zeros((size + 63) // 64, dtype=np.uint64), size)
+
+    @staticmethod
+    def Full(size: int) -> "Bitset":
+        """A bitset with every bit set."""
+        return ~Bitset.Empty(size)
+
+    @staticmethod
+    def FromBools(bools: np.ndarray) -> "Bitset":
+        """Pack a bool array into a bitset."""
+        size = len(bools)
+        packed = np.packbits(bools, bitorder="little")
+        packed = np.pad(packed, (0, (-len(packed)) % 8))
+        return Bitset(packed.view(np.uint64).copy(), size)
+
+    @staticmethod
+    def FromIndices(ids: np.ndarray, size: int) -> "Bitset":
+        """A bitset with the bits of the given ids set."""
+        bitset = Bitset.Empty(size)
+        ids = np.asarray(ids, dtype=np.int64)
+        np.bitwise_or.at(bitset.words, ids >> 6, np.left_shift(np.uint64(1), (ids & 63).astype(np.uint64)))
+        return bitset
+
+    def __clear_tail(self) -> "Bitset":
+        """Clear the unused bits after `size` in the last word."""
+        tail = self.size % 64
+        if tail:
+            self.words[-1] &= np.uint64((1 << tail) - 1)
+        return self
+
+    def __and__(self, other: "Bitset") -> "Bitset":
+        return Bitset(self.words & other.words, self.size)
+
+    def __or__(self, other: "Bitset") -> "Bitset":
+        return Bitset(self.words | other.words, self.size)
+
+    def __invert__(self) -> "Bitset":
+        return Bitset(~self.words, self.size).__clear_tail()
+
+    def __getitem__(self, ids: np.ndarray) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        bits = np.right_shift(self.words[ids >> 6], (ids & 63).astype(np.uint64)) & np.uint64(1)
+        return bits.astype(bool)
+
+    def ToBools(self) -> np.ndarray:
+        """Unpack into a bool array of length `size`."""
+        return np.unpackbits(self.words.view(np.uint8), count=self.size, bitorder="little").astype(bool)
+
+    def Indices(self) -> np.ndarray:
+        """The ids of the set bits, ascending."""
+        return np.flatnonzero(self.ToBools())
+
+    def Count(self) -> int:
+        """Number of set bits."""
+        if hasattr(np, "bitwise_count"):
+            return int(np.bitwise_count(self.words).sum())
+        return int(np.unpackbits(self.words.view(np.uint8)).sum())
+
+    @property
+    def nbytes(self) -> int:
+        return self.words.nbytes
+
+
+class BitmapIndex:
+    """
+    Equality bitmaps of a dictionary-encoded column: one bitset per code.
+    Missing values (code -1) are in no bitmap.
+    """
+
+    def __init__(self, codes: np.ndarray, cardinality: int) -> None:
+        """
+        Build the index.
+
+        Args:
+            codes: The encoded column (int, -1 for missing).
+            cardinality: Number of distinct codes (codes are in [0, cardinality)).
+        """
+        self.__size = len(codes)
+        self.__words = np.zeros((cardinality, (self.__size + 63) // 64), dtype=np.uint64)
+        ids = np.flatnonzero(codes >= 0)
+        np.bitwise_or.at(
+            self.__words,
+            (codes[ids].astype(np.int64), ids >> 6),
+            np.left_shift(np.uint64(1), (ids & 63).astype(np.uint64))
+        )
+
+    def Equal(self, code: int) -> Bitset:
+        """The rows where the column equals `code` (shares the index memory, do not modify)."""
+        return Bitset(self.__words[code], self.__size)
+
+    def Any(self, codes: Iterable[int]) -> Bitset:
+        """The rows where the column equals any of `codes` (OR of the bitmaps)."""
+        rows = self.__words[list(codes)]
+        if len(rows) == 0:
+            return Bitset.Empty(self.__size)
+        return Bitset(np.bitwise_or.reduce(rows, axis=0), self.__size)
+
+    @property
+    def nbytes(self) -> int:
+        return self.__words.nbytes
+
+
+class RangeBitmapIndex:
+    """
+    Range-encoded bitmaps of a float column: one "value >= threshold" bitset per bucket
+    boundary. Thresholds between two boundaries only check the rows of that one bucket.
+    NaN values are in no bitmap (as a MongoDB range filter never matches null).
+    """
+
+    def __init__(self, values: np.ndarray, low: float, high: float, step: float) -> None:
+        """
+        Build the index.
+
+        Args:
+            values: The float column (NaN for missing).
+            low: The first bucket boundary.
+            high: The last bucket boundary.
+            step: The bucket width.
+        """
+        self.__values = values
+        self.__size = len(values)
+        count = int(round((high - low) / step)) + 1
+        self.__thresholds = np.round(low + step * np.arange(count), 6).astype(values.dtype)
+        self.__at_least = [Bitset.FromBools(values >= t) for t in self.__thresholds]
+
+    def AtLeast(self, threshold: float) -> Bitset:
+        """The rows where `value >= threshold`."""
+        threshold = self.__values.dtype.type(threshold)
+        i = int(np.searchsorted(self.__thresholds, threshold, side="left"))
+        if i < len(self.__thresholds) and self.__thresholds[i] == threshold:
+            return self.__at_least[i]
+
+        # Threshold falls inside a bucket: exact check of that bucket's rows only
+        above = self.__at_least[i] if i < len(self.__thresholds) else Bitset.Empty(self.__size)
+        bucket = self.__at_least[i - 1] & ~above if i > 0 else ~above & self.__not_nan()
+        ids = bucket.Indices()
+        return above | Bitset.FromIndices(ids[self.__values[ids] >= threshold], self.__size)
+
+    def __not_nan(self) -> Bitset:
+        return Bitset.FromBools(~np.isnan(self.__values))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.nbytes for b in self.__at_least)
+
+
+def CombineAll(bitsets: Iterable[Optional[Bitset]]) -> Optional[Bitset]:
+    """AND of the given bitsets (None entries are ignored), None if there is none."""
+    result: Optional[Bitset] = None
+    for bitset in bitsets:
+        if bitset is None:
+            continue
+        result = bitset if result is None else result & bitset
+    return result
@@ -0,0 +1,67 @@
+"""Web Mercator grid clustering of map markers (same grid as `MongoDBHandlers.Viewport`)."""
+
+import numpy as np
+from typing import Tuple
+from core.mongodb.handlers import (
+    MONGODB_MERCATOR_MAX_LATITUDE,
+    MONGODB_VIEWPORT_CLUSTER_CELLS_PER_TILE,
+    ViewportClusterGridSize
+)
+
+
+def MercatorCells(latitudes: np.ndarray, longitudes: np.ndarray, zoom: int,
+                  cells_per_tile: int = MONGODB_VIEWPORT_CLUSTER_CELLS_PER_TILE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The grid cell (x, y) of each point at `zoom`, each tile being split into `cells_per_tile` x `cells_per_tile` cells.
+
+    Args:
+        latitudes: Point latitudes (degrees).
+        longitudes: Point longitudes (degrees), same length as `latitudes`.
+        zoom: The map zoom level.
+        cells_per_tile: The cells along each axis of a tile (the cluster grid by default).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The int64 cell columns (x, west to east) and rows (y, north to south).
+    """
+    size = (1 << zoom) * cells_per_tile
+    lat = np.radians(np.clip(latitudes.astype(np.float64, copy=False),
+                             -MONGODB_MERCATOR_MAX_LATITUDE, MONGODB_MERCATOR_MAX_LATITUDE))
+    lon = longitudes.astype(np.float64, copy=False)
+    x = np.floor((lon + 180.0) / 360.0 * size).astype(np.int64)
+    y = np.floor((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * size).astype(np.int64)
+    return x, y
+
+
+def GridClusters(latitudes: np.ndarray, longitudes: np.ndarray, ratings: np.ndarray, zoom: int
+                 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Group points by cluster grid cell, most populated cell first (then by y, x).
+
+    Args:
+        latitudes: Point latitudes (degrees).
+        longitudes: Point longitudes (degrees).
+        ratings: Point ratings (NaN counts as 0.0, as in the MongoDB pipeline).
+        zoom: The map zoom level.
+
+    Returns:
+        Tuple of arrays, one row per cluster: cell x, cell y, count, centroid latitude,
+        centroid longitude and best rating.
+    """
+    if len(latitudes) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0), np.empty(0), np.empty(0)
+
+    x, y = MercatorCells(latitudes, longitudes, zoom)
+    cells = y * ViewportClusterGridSize(zoom) + x
+    unique, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+    lat_sums = np.bincount(inverse, weights=latitudes.astype(np.float64, copy=False))
+    lon_sums = np.bincount(inverse, weights=longitudes.astype(np.float64, copy=False))
+    best = np.zeros(len(unique))
+    np.maximum.at(best, inverse, np.nan_to_num(ratings.astype(np.float64, copy=False), nan=0.0))
+
+    # `unique` is sorted by (y, x), a stable sort on the count keeps that order on ties
+    order = np.argsort(-counts, kind="stable")
+    size = ViewportClusterGridSize(zoom)
+    unique, counts = unique[order], counts[order]
+    return (unique % size, unique // size, counts,
+            lat_sums[order] / counts, lon_sums[order] / counts, best[order])
@@ -0,0 +1,46 @@
+"""Vectorized geodesic helpers for the in-process search engine."""
+
+import math
+import numpy as np
+from typing import Tuple
+from core.mongodb.handlers import MONGODB_EARTH_RADIUS_METERS
+
+METERS_PER_DEGREE = MONGODB_EARTH_RADIUS_METERS * math.pi / 180.0
+"""Length of one degree of latitude (and of longitude at the equator), in meters."""
+
+
+def HaversineMeters(latitude: float, longitude: float,
+                    latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Great-circle distances (in meters) from one point to many points.
+
+    Uses the same Earth radius as MongoDB `$geoNear`, so the distances are
+    interchangeable with the ones returned by the database.
+
+    Args:
+        latitude (float): The focus point latitude (degrees).
+        longitude (float): The focus point longitude (degrees).
+        latitudes (np.ndarray): The target latitudes (degrees, any float dtype).
+        longitudes (np.ndarray): The target longitudes (degrees, any float dtype).
+
+    Returns:
+        np.ndarray: float64 array of distances in meters.
+    """
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(latitudes.astype(np.float64, copy=False))
+    d_lat = lat2 - lat1
+    d_lon = np.radians(longitudes.astype(np.float64, copy=False)) - np.radians(longitude)
+
+    a = np.sin(d_lat * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_lon * 0.5) ** 2
+    return 2.0 * MONGODB_EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def BoundingBox(latitude: float, longitude: float, radius: float) -> Tuple[float, float, float, float]:
+    """The (min_lat, max_lat, min_lon, max_lon) box enclosing a circle of `radius` meters.
+
+    The box is conservative (never smaller than the circle). Longitude wrap-around at
+    the antimeridian is not handled, which is fine for Vietnam.
+    """
+    d_lat = radius / METERS_PER_DEGREE
+    cos_lat = math.cos(math.radians(min(89.0, abs(latitude) + d_lat)))
+    d_lon = min(180.0, d_lat / cos_lat)
+    return latitude - d_lat, latitude + d_lat, longitude - d_lon, longitude + d_lon
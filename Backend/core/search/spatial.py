@@ -0,0 +1,201 @@
+"""Uniform lat/lon grid spatial index for radius and k-nearest restaurant queries."""
+
+import numpy as np
+from typing import Optional, Tuple, Union
+from core.search.geo import HaversineMeters, BoundingBox, METERS_PER_DEGREE
+from core.search.bitmap import Bitset
+
+SPATIAL_DEFAULT_CELL_SIZE = 500.0
+"""Default grid cell size, in meters (of latitude)."""
+
+SPATIAL_MAX_RADIUS = 20_037_500.0
+"""Half the Earth circumference, a radius covering every point."""
+
+
+class GridSpatialIndex:
+    """
+    Uniform lat/lon grid over a set of points, stored as sorted cell arrays.
+
+    Every point gets a cell id (`row * columns + column`); the points are sorted by cell
+    id so that each grid row of a query box is one contiguous slice, found with a binary
+    search. Exact distances are computed (vectorized haversine) only for the points of the
+    candidate cells.
+
+    Usage:
+        index = GridSpatialIndex(latitudes, longitudes, cell_size=500.0)
+        ids, distances = index.WithinRadius(10.77, 106.70, 2000.0)
+        ids, distances = index.Nearest(10.77, 106.70, k=20)
+        ids = index.WithinBox(10.70, 10.85, 106.60, 106.75)
+    """
+
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray,
+                 cell_size: float = SPATIAL_DEFAULT_CELL_SIZE) -> None:
+        """
+        Build the index.
+
+        Args:
+            latitudes: Point latitudes (degrees).
+            longitudes: Point longitudes (degrees), same length as `latitudes`.
+            cell_size: The grid cell size in meters (of latitude, cells are square in degrees).
+        """
+        self.__count = len(latitudes)
+        self.__cell_size = float(cell_size)
+        self.__cell_degrees = self.__cell_size / METERS_PER_DEGREE
+
+        self.__origin_lat = float(latitudes.min()) if self.__count else 0.0
+        self.__origin_lon = float(longitudes.min()) if self.__count else 0.0
+        rows = self.__row_of(latitudes)
+        cols = self.__col_of(longitudes)
+        self.__rows = int(rows.max()) + 1 if self.__count else 0
+        self.__cols = int(cols.max()) + 1 if self.__count else 0
+
+        cells = rows * self.__cols + cols
+        self.__order = np.argsort(cells, kind="stable").astype(np.int32)
+        self.__cells = cells[self.__order]
+        # Coordinates in cell order, so a candidate slice is contiguous in memory
+        self.__lat = np.ascontiguousarray(latitudes[self.__order])
+        self.__lon = np.ascontiguousarray(longitudes[self.__order])
+
+    def __row_of(self, latitudes: np.ndarray) -> np.ndarray:
+        return np.floor((latitudes - self.__origin_lat) / self.__cell_degrees).astype(np.int64)
+
+    def __col_of(self, longitudes: np.ndarray) -> np.ndarray:
+        return np.floor((longitudes - self.__origin_lon) / self.__cell_degrees).astype(np.int64)
+
+    @property
+    def Count(self) -> int:
+        """Number of indexed points."""
+        return self.__count
+
+    @property
+    def CellSize(self) -> float:
+        """The grid cell size, in meters."""
+        return self.__cell_size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the index arrays, in bytes."""
+        return self.__order.nbytes + self.__cells.nbytes + self.__lat.nbytes + self.__lon.nbytes
+
+    def __box_slices(self, min_lat: float, max_lat: float,
+                     min_lon: float, max_lon: float) -> Tuple[np.ndarray, np.ndarray]:
+        """The [start, end) ranges (in cell order) of the cells covering a lat/lon box."""
+        r0 = max(0, int(np.floor((min_lat - self.__origin_lat) / self.__cell_degrees)))
+        r1 = min(self.__rows - 1, int(np.floor((max_lat - self.__origin_lat) / self.__cell_degrees)))
+        c0 = max(0, int(np.floor((min_lon - self.__origin_lon) / self.__cell_degrees)))
+        c1 = min(self.__cols - 1, int(np.floor((max_lon - self.__origin_lon) / self.__cell_degrees)))
+        if r0 > r1 or c0 > c1:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        row_base = np.arange(r0, r1 + 1, dtype=np.int64) * self.__cols
+        starts = np.searchsorted(self.__cells, row_base + c0, side="left")
+        ends = np.searchsorted(self.__cells, row_base + c1, side="right")
+        keep = ends > starts
+        return starts[keep], ends[keep]
+
+    def __positions(self, starts: np.ndarray, ends: np.ndarray,
+                    mask: Optional[Union[np.ndarray, Bitset]]) -> np.ndarray:
+        """Expand the [start, end) ranges into positions (in cell order) without a Python loop."""
+        lengths = ends - starts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(int(lengths.sum())) + np.repeat(starts - offsets, lengths)
+        if mask is not None:
+            positions = positions[mask[self.__order[positions]]]
+        return positions
+
+    def WithinRadius(self, latitude: float, longitude: float, radius: float,
+                     mask: Optional[Union[np.ndarray, Bitset]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        All points within `radius` meters of a location (unordered).
+
+        Args:
+            latitude: The focus latitude.
+            longitude: The focus longitude.
+            radius: The search radius, in meters.
+            mask: Optional bool array or Bitset (by point id), only points where it is set are returned.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The point ids and their distances in meters.
+        """
+        starts, ends = self.__box_slices(*BoundingBox(latitude, longitude, radius))
+        if len(starts) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+
+        positions = self.__positions(starts, ends, mask)
+        distances = HaversineMeters(latitude, longitude, self.__lat[positions], self.__lon[positions])
+        inside = distances <= radius
+        return self.__order[positions[inside]], distances[inside]
+
+    def WithinBox(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+                  mask: Optional[Union[np.ndarray, Bitset]] = None) -> np.ndarray:
+        """
+        All points inside a lat/lon box, bounds included (unordered).
+
+        Args:
+            min_lat: The south bound.
+            max_lat: The north bound.
+            min_lon: The west bound.
+            max_lon: The east bound.
+            mask: Optional bool array or Bitset (by point id), only points where it is set are returned.
+
+        Returns:
+            np.ndarray: The point ids.
+        """
+        starts, ends = self.__box_slices(min_lat, max_lat, min_lon, max_lon)
+        if len(starts) == 0:
+            return np.empty(0, dtype=np.int32)
+
+        positions = self.__positions(starts, ends, mask)
+        lat, lon = self.__lat[positions], self.__lon[positions]
+        inside = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        return self.__order[positions[inside]]
+
+    def NearestCandidates(self, latitude: float, longitude: float, k: int,
+                          max_radius: Optional[float] = None,
+                          mask: Optional[Union[np.ndarray, Bitset]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        A superset of the `k` nearest points: every point within the smallest searched radius
+        holding at least `k` points (or within `max_radius`). Useful when the caller ranks with
+        its own tie-breaking.
+
+        Args:
+            latitude: The focus latitude.
+            longitude: The focus longitude.
+            k: The number of nearest points wanted.
+            max_radius: Optional maximum distance in meters.
+            mask: Optional bool array or Bitset (by point id), only points where it is set are returned.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The point ids and their distances in meters (unordered).
+        """
+        limit = SPATIAL_MAX_RADIUS if max_radius is None else min(max_radius, SPATIAL_MAX_RADIUS)
+        radius = min(limit, self.__cell_size)
+        while True:
+            ids, distances = self.WithinRadius(latitude, longitude, radius, mask)
+            if len(ids) >= k or radius >= limit:
+                return ids, distances
+            radius = min(limit, radius * 2.0)
+
+    def Nearest(self, latitude: float, longitude: float, k: int,
+                max_radius: Optional[float] = None,
+                mask: Optional[Union[np.ndarray, Bitset]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The `k` nearest points of a location, ordered by distance.
+
+        Args:
+            latitude: The focus latitude.
+            longitude: The focus longitude.
+            k: The number of points to return (at most).
+            max_radius: Optional maximum distance in meters.
+            mask: Optional bool array or Bitset (by point id), only points where it is set are returned.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The point ids and their distances in meters.
+        """
+        ids, distances = self.NearestCandidates(latitude, longitude, k, max_radius, mask)
+        if len(ids) > k:
+            top = np.argpartition(distances, k - 1)[:k]
+            ids, distances = ids[top], distances[top]
+        order = np.argsort(distances, kind="stable")
+        return ids[order], distances[order]
@@ -0,0 +1,137 @@
+"""
+Typo-tolerant query correction with a symmetric-delete (SymSpell) dictionary.
+
+Every dictionary word is stored under each of its variants with up to `max_distance` characters
+deleted; a misspelled word's own deletes then meet the deletes of the words it is close to, so a
+lookup is a few dictionary probes plus exact distance checks of the few candidates met.
+"""
+
+from itertools import combinations
+from collections import Counter
+from typing import Optional, List, Dict, Set, Tuple, Callable
+from core.search.text import NormalizeVietnamese
+
+SPELLING_MAX_DISTANCE = 2
+"""The maximum edit distance of a correction."""
+SPELLING_MIN_LENGTH = 2
+"""Shorter words are never corrected."""
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """The variants of a word with 1 to `distance` characters deleted."""
+    variants: Set[str] = set()
+    for count in range(1, min(distance, len(word)) + 1):
+        for positions in combinations(range(len(word)), count):
+            variants.add("".join(c for i, c in enumerate(word) if i not in positions))
+    return variants
+
+
+def EditDistance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (Damerau-Levenshtein without substring moves), `limit + 1` if above `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+class SymSpellDictionary:
+    """
+    Symmetric-delete spelling dictionary of normalized words (Vietnamese syllables) and their frequency.
+
+    Usage:
+        speller = SymSpellDictionary({"banh": 120, "xeo": 40, "tieu": 35})
+        speller.Lookup("tiu")               # ("tieu", 1)
+        speller.CorrectText("hủ tíu")       # "hu tieu"
+    """
+
+    def __init__(self, frequencies: Dict[str, int], max_distance: int = SPELLING_MAX_DISTANCE) -> None:
+        """
+        Args:
+            frequencies: The normalized words and how often they occur (ties prefer the most frequent).
+            max_distance: The maximum edit distance of a correction.
+        """
+        self.__frequencies = dict(frequencies)
+        self.__max_distance = max_distance
+        self.__deletes: Dict[str, List[str]] = {}
+        for word in self.__frequencies:
+            for variant in _deletes(word, max_distance):
+                self.__deletes.setdefault(variant, []).append(word)
+
+    @property
+    def Count(self) -> int:
+        """Number of dictionary words."""
+        return len(self.__frequencies)
+
+    @staticmethod
+    def FromTexts(texts: List[str], max_distance: int = SPELLING_MAX_DISTANCE) -> "SymSpellDictionary":
+        """Build the dictionary of the normalized syllables of texts (counted once per text occurrence)."""
+        frequencies: Dict[str, int] = {}
+        # Names, categories and tags repeat a lot, normalize each distinct text once
+        for text, count in Counter(t for t in texts if t).items():
+            for word in NormalizeVietnamese(text).split():
+                frequencies[word] = frequencies.get(word, 0) + count
+        return SymSpellDictionary(frequencies, max_distance)
+
+    def MaxDistance(self, word: str) -> int:
+        """The edit distance allowed for a word: short syllables only tolerate one typo."""
+        if len(word) < SPELLING_MIN_LENGTH:
+            return 0
+        return min(self.__max_distance, 1 if len(word) <= 4 else 2)
+
+    def Lookup(self, word: str) -> Optional[Tuple[str, int]]:
+        """
+        The closest dictionary word to a normalized word (the word itself if known).
+
+        Returns:
+            Optional[Tuple[str, int]]: The word and its edit distance, None if nothing is close enough.
+                Ties prefer the most frequent word, then the alphabetical first.
+        """
+        if word in self.__frequencies:
+            return word, 0
+        limit = self.MaxDistance(word)
+        if limit == 0:
+            return None
+
+        candidates: Set[str] = set()
+        for variant in _deletes(word, limit) | {word}:
+            candidates.update(self.__deletes.get(variant, ()))
+            if variant in self.__frequencies:
+                candidates.add(variant)
+
+        best: Optional[Tuple[int, int, str]] = None
+        for candidate in candidates:
+            distance = EditDistance(word, candidate, limit)
+            if distance <= limit:
+                key = (distance, -self.__frequencies[candidate], candidate)
+                if best is None or key < best:
+                    best = key
+        return (best[2], best[0]) if best is not None else None
+
+    def CorrectText(self, text: str, known: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """
+        Correct every unknown syllable of a text.
+
+        Args:
+            text: The text to correct.
+            known: Whether a word outside the dictionary is still valid (kept as is), e.g. an address word.
+
+        Returns:
+            Optional[str]: The normalized corrected text, None if nothing was corrected.
+        """
+        words = NormalizeVietnamese(text).split()
+        corrected = []
+        for word in words:
+            match = None if known is not None and known(word) else self.Lookup(word)
+            corrected.append(match[0] if match is not None else word)
+        return " ".join(corrected) if corrected != words else None
@@ -0,0 +1,680 @@
+"""
+In-process columnar restaurant store.
+
+Holds the whole `restaurants` collection as NumPy columns so that restaurant searches
+can be answered without a MongoDB round trip. It answers the same inputs as
+`MongoDBHandlers.Search` (`MongoDBSearchInputSchema`) and returns the same response.
+"""
+
+import sys, time, bisect, asyncio
+import numpy as np
+from typing import Optional, List, Dict, Any, Tuple, Union, Set, Iterable
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from core.mongodb.handlers import (
+    MongoDBSearchInputSchema,
+    MongoDBRestaurantResponse,
+    MongoDBSearchResponse,
+    MongoDBViewportInputSchema,
+    MongoDBViewportCluster,
+    MongoDBViewportResponse,
+    DecodeSearchCursor,
+    NextSearchCursor,
+    ViewportUsesMarkers,
+    MONGODB_FACET_MAX_BUCKETS,
+    MONGODB_FACET_RATING_BOUNDARIES,
+    MONGODB_VIEWPORT_MAX_MARKERS,
+    MONGODB_VIEWPORT_MAX_CLUSTERS
+)
+from core.mongodb.cursor import MongoDBSearchCursor, MONGODB_CURSOR_DISTANCE_TOLERANCE
+from core.mongodb.changes import MongoDBRestaurantChange
+from core.search.spatial import GridSpatialIndex, SPATIAL_DEFAULT_CELL_SIZE
+from core.search.bitmap import Bitset, BitmapIndex, RangeBitmapIndex, CombineAll
+from core.search.cluster import GridClusters
+from core.search.geo import HaversineMeters
+from core.search.autocomplete import PrefixIndex, AutocompleteSuggestion, AUTOCOMPLETE_MAX_KEYWORDS, AUTOCOMPLETE_PROXIMITY_SCALE
+from core.search.spelling import SymSpellDictionary
+from core.search.text import InvertedIndex, NormalizeVietnamese, TextTokens, RestaurantSearchTokens, BlendDistance, TEXT_DEFAULT_DISTANCE_WEIGHT
+from utils import Logger
+
+RESTAURANT_STORE_DTYPE = np.dtype([
+    ("lat", np.float64),
+    ("lon", np.float64),
+    ("rating", np.float32),
+    ("category", np.int32),
+    ("province", np.int32),
+    ("district", np.int32),
+])
+"""The numeric columns of the store. Categorical columns are dictionary-encoded, -1 means missing.
+The coordinates are float64: float32 moves a restaurant by up to ~0.5 m, so the distances would not
+match `$geoNear`'s and a geo page could not be continued on MongoDB."""
+
+RESTAURANT_STORE_PROJECTION = {
+    "name": 1, "category": 1, "rating": 1, "address": 1, "province": 1,
+    "district": 1, "ward": 1, "tags": 1, "location": 1, "link": 1, "search_tokens": 1
+}
+"""The fields loaded from the `restaurants` collection (`search_tokens` is computed at import)."""
+
+RESTAURANT_STORE_RATING_BUCKET = 0.1
+"""The rating bucket width of the rating bitmaps (ratings have one decimal)."""
+RESTAURANT_STORE_RELOAD_DELAY = 2.0
+"""How long (seconds) the store waits for more changes before rebuilding, so a burst is one rebuild."""
+
+
+class _Dictionary:
+    """A tiny string <-> int dictionary encoder."""
+
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def Encode(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def Lookup(self, value: str) -> Optional[int]:
+        return self.codes.get(value)
+
+    def Decode(self, code: int) -> Optional[str]:
+        return self.values[code] if code >= 0 else None
+
+
+class RestaurantStore:
+    """
+    In-memory restaurant store with NumPy structured array columns.
+
+    Usage:
+        await RestaurantStore.Load(MongoDB.get_database())   # app startup
+        store = RestaurantStore.Get()                        # None if not loaded
+        if store is not None and store.CanServe(inputs):
+            resp = store.Search(inputs)
+    """
+
+    __current: Optional["RestaurantStore"] = None
+    __source: Optional[Tuple[AsyncIOMotorDatabase, float, float]] = None
+    """The database, cell size and text distance weight of the last `Load`, to reload on changes."""
+    __pending: Set[str] = set()
+    """The ids of the restaurants changed since the last rebuild."""
+    __pending_full: bool = False
+    """Whether anything may have changed since the last rebuild (reload everything)."""
+    __reload_task: Optional["asyncio.Task"] = None
+
+    def __init__(self, documents: List[Dict[str, Any]], cell_size: float = SPATIAL_DEFAULT_CELL_SIZE,
+                 text_distance_weight: float = TEXT_DEFAULT_DISTANCE_WEIGHT) -> None:
+        """
+        Build the store from raw `restaurants` documents.
+
+        Args:
+            documents: Documents with (at least) the fields of RESTAURANT_STORE_PROJECTION.
+                Documents without a valid GeoJSON point are skipped (as $geoNear would).
+            cell_size: The spatial index grid cell size, in meters.
+            text_distance_weight: The share of the distance in the text search score (see `BlendDistance`).
+        """
+        self.__cell_size = cell_size
+        self.__text_distance_weight = text_distance_weight
+        self.__categories = _Dictionary()
+        self.__provinces = _Dictionary()
+        self.__districts = _Dictionary()
+
+        rows: List[Tuple] = []
+        payload: List[Tuple] = []
+        tokens: List[Dict[str, float]] = []
+        # Rows are ordered by id, so the row index breaks ties the same way `_id` does in MongoDB
+        for doc in sorted(documents, key=lambda d: str(d.get("id") or d.get("_id") or "")):
+            try:
+                lon, lat = doc["location"]["coordinates"][:2]
+                lat, lon = float(lat), float(lon)
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            rating = doc.get("rating")
+            rows.append((
+                lat, lon,
+                np.nan if rating is None else float(rating),
+                self.__categories.Encode(doc.get("category")),
+                self.__provinces.Encode(doc.get("province")),
+                self.__districts.Encode(doc.get("district")),
+            ))
+            payload.append((
+                str(doc.get("id") or doc.get("_id") or ""),
+                doc.get("name", ""),
+                doc.get("address", ""),
+                doc.get("ward"),
+                doc.get("tags") or [],
+                doc.get("link"),
+                doc["location"]
+            ))
+            # Documents imported before `search_tokens` existed are tokenized here
+            tokens.append(doc.get("search_tokens") or RestaurantSearchTokens(
+                doc.get("name"), doc.get("category"), doc.get("address")
+            ))
+
+        self.__columns = np.array(rows, dtype=RESTAURANT_STORE_DTYPE)
+        self.__lat = self.__columns["lat"]
+        self.__lon = self.__columns["lon"]
+        self.__rating = self.__columns["rating"]
+        self.__category = self.__columns["category"]
+        self.__province = self.__columns["province"]
+        self.__district = self.__columns["district"]
+        self.__payload = payload
+        self.__ids = [row[0] for row in payload]
+        self.__spatial = GridSpatialIndex(self.__lat, self.__lon, cell_size)
+        self.__text = InvertedIndex(tokens)
+
+        # Filter bitmaps, so a request's filters are a few word-wise ANDs
+        self.__category_bitmaps = BitmapIndex(self.__category, len(self.__categories.values))
+        self.__province_bitmaps = BitmapIndex(self.__province, len(self.__provinces.values))
+        self.__district_bitmaps = BitmapIndex(self.__district, len(self.__districts.values))
+        self.__rating_bitmaps = RangeBitmapIndex(self.__rating, 0.0, 5.0, RESTAURANT_STORE_RATING_BUCKET)
+
+        # Autocomplete: restaurant names by rating, dish keywords (tags and categories) by popularity
+        self.__name_completions = PrefixIndex([row[1] for row in payload], 1.0 + np.nan_to_num(self.__rating, nan=0.0))
+        keywords: Dict[str, List] = {}
+        keyword_texts: List[str] = []
+        for row, category in zip(payload, self.__category):
+            for keyword in list(row[4]) + [self.__categories.Decode(int(category))]:
+                if keyword:
+                    keyword_texts.append(keyword)
+                    entry = keywords.setdefault(NormalizeVietnamese(keyword), [keyword, 0])
+                    entry[1] += 1
+        self.__keywords = list(keywords.values())
+        self.__keyword_completions = PrefixIndex([k[0] for k in self.__keywords],
+                                                 np.array([k[1] for k in self.__keywords], dtype=np.float64))
+
+        # Query spelling: the words of names, categories and dish tags, by how often they occur
+        self.__speller = SymSpellDictionary.FromTexts([row[1] for row in payload] + keyword_texts)
+
+    @property
+    def Count(self) -> int:
+        """Number of restaurants in the store."""
+        return len(self.__payload)
+
+    def MemoryUsage(self) -> Dict[str, int]:
+        """Approximate memory footprint in bytes, split by numeric columns (and spatial index), bitmaps, text index and Python payload."""
+        columns = self.__columns.nbytes + self.__spatial.nbytes
+        text = self.__text.nbytes
+        bitmaps = sum(b.nbytes for b in (
+            self.__category_bitmaps, self.__province_bitmaps, self.__district_bitmaps, self.__rating_bitmaps
+        ))
+        payload = sys.getsizeof(self.__payload)
+        for row in self.__payload:
+            payload += sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row)
+        dictionaries = sum(
+            sum(sys.getsizeof(v) for v in d.values)
+            for d in (self.__categories, self.__provinces, self.__districts)
+        )
+        return {"columns": columns, "bitmaps": bitmaps, "text": text, "payload": payload, "dictionaries": dictionaries}
+
+    @staticmethod
+    async def Load(database: AsyncIOMotorDatabase, cell_size: float = SPATIAL_DEFAULT_CELL_SIZE,
+                   text_distance_weight: float = TEXT_DEFAULT_DISTANCE_WEIGHT) -> bool:
+        """
+        Load the whole `restaurants` collection into a new store and make it current.
+
+        Args:
+            database: AsyncIOMotorDatabase instance from MongoDB.get_database()
+            cell_size: The spatial index grid cell size, in meters.
+            text_distance_weight: The share of the distance in the text search score (see `BlendDistance`).
+
+        Returns:
+            bool: True if loaded successfully, False otherwise (the previous store is kept).
+        """
+        try:
+            start = time.perf_counter()
+            cursor = database.restaurants.find({}, RESTAURANT_STORE_PROJECTION)
+            documents = await cursor.to_list(length=None)
+            store = await asyncio.to_thread(RestaurantStore, documents, cell_size, text_distance_weight)
+            RestaurantStore.__current = store
+            RestaurantStore.__source = (database, cell_size, text_distance_weight)
+
+            usage = store.MemoryUsage()
+            Logger.LogInfo(
+                f"RestaurantStore: Loaded {store.Count:,} restaurants in {time.perf_counter() - start:.2f}s "
+                f"(columns {usage['columns'] / 2**20:.2f} MiB, bitmaps {usage['bitmaps'] / 2**20:.2f} MiB, "
+                f"text {usage['text'] / 2**20:.2f} MiB, payload ~{usage['payload'] / 2**20:.2f} MiB, "
+                f"dictionaries ~{usage['dictionaries'] / 2**10:.1f} KiB)"
+            )
+            return True
+        except Exception as e:
+            Logger.LogException(e, "RestaurantStore: Failed to load restaurants")
+            return False
+
+    @staticmethod
+    def Get() -> Optional["RestaurantStore"]:
+        """Get the current store, or None if not loaded."""
+        return RestaurantStore.__current
+
+    @staticmethod
+    def Unload():
+        """Drop the current store (searches fall back to MongoDB) and cancel its pending rebuild."""
+        if RestaurantStore.__reload_task is not None:
+            RestaurantStore.__reload_task.cancel()
+            RestaurantStore.__reload_task = None
+        RestaurantStore.__pending = set()
+        RestaurantStore.__pending_full = False
+        RestaurantStore.__current = None
+        RestaurantStore.__source = None
+
+    def Updated(self, documents: List[Dict[str, Any]], ids: Iterable[str]) -> "RestaurantStore":
+        """
+        Build a new store with the given restaurants changed (the columns are immutable). The
+        unchanged restaurants are rebuilt from this store's own rows, no source document is kept.
+
+        Args:
+            documents: The current documents of the changed restaurants (RESTAURANT_STORE_PROJECTION).
+            ids: The ids of the changed restaurants, those without a document were deleted.
+
+        Returns:
+            RestaurantStore: The new store, with the same cell size and text distance weight.
+        """
+        changed = set(ids)
+        tokens = self.__text.Documents()
+        kept: List[Dict[str, Any]] = []
+        for row, (rid, name, address, ward, tags, link, location) in enumerate(self.__payload):
+            if rid in changed:
+                continue
+            rating = float(self.__rating[row])
+            kept.append({
+                "_id": rid, "name": name, "address": address, "ward": ward, "tags": tags, "link": link,
+                "location": location,
+                "rating": None if np.isnan(rating) else rating,
+                "category": self.__categories.Decode(int(self.__category[row])),
+                "province": self.__provinces.Decode(int(self.__province[row])),
+                "district": self.__districts.Decode(int(self.__district[row])),
+                "search_tokens": tokens[row]
+            })
+        return RestaurantStore(kept + documents, self.__cell_size, self.__text_distance_weight)
+
+    @staticmethod
+    async def __update(ids: Set[str]) -> bool:
+        """Make current a store with the given restaurants fetched again (deleted if missing)."""
+        store, source = RestaurantStore.__current, RestaurantStore.__source
+        if store is None or source is None:
+            return False
+        try:
+            start = time.perf_counter()
+            keys = [ObjectId(rid) if ObjectId.is_valid(rid) else rid for rid in ids]
+            documents = await source[0].restaurants.find(
+                {"_id": {"$in": keys}}, RESTAURANT_STORE_PROJECTION
+            ).to_list(length=None)
+            updated = await asyncio.to_thread(store.Updated, documents, ids)
+            # Unless unloaded or reloaded in the meantime
+            if RestaurantStore.__current is store:
+                RestaurantStore.__current = updated
+            Logger.LogInfo(f"RestaurantStore: Updated {len(ids):,} restaurants ({len(ids) - len(documents):,} deleted) "
+                           f"in {time.perf_counter() - start:.2f}s")
+            return True
+        except Exception as e:
+            Logger.LogException(e, "RestaurantStore: Failed to update restaurants")
+            return False
+
+    @staticmethod
+    async def __reload():
+        """Rebuild the current store once the changes settled, until no change is pending."""
+        await asyncio.sleep(RESTAURANT_STORE_RELOAD_DELAY)
+        while RestaurantStore.__pending or RestaurantStore.__pending_full:
+            ids, full = RestaurantStore.__pending, RestaurantStore.__pending_full
+            RestaurantStore.__pending, RestaurantStore.__pending_full = set(), False
+            if RestaurantStore.__source is None:
+                return
+            if full:
+                await RestaurantStore.Load(*RestaurantStore.__source)
+            else:
+                await RestaurantStore.__update(ids)
+
+    @staticmethod
+    async def OnRestaurantsChanged(change: MongoDBRestaurantChange):
+        """
+        Change feed subscriber: rebuild the current store in the background, after
+        RESTAURANT_STORE_RELOAD_DELAY, with only the changed restaurants fetched again
+        (everything reloaded if `Full`). Searches use the previous store until then.
+        """
+        if RestaurantStore.__current is None or RestaurantStore.__source is None:
+            return
+        RestaurantStore.__pending_full = RestaurantStore.__pending_full or change.Full
+        RestaurantStore.__pending.update(change.Ids)
+        if RestaurantStore.__reload_task is None or RestaurantStore.__reload_task.done():
+            RestaurantStore.__reload_task = asyncio.create_task(RestaurantStore.__reload())
+
+    def CanServe(self, inputs: MongoDBSearchInputSchema) -> bool:
+        """Whether the store can answer the given inputs. Geo continuation tokens of any engine are
+        accepted (same ordering, and float64 distances with the Earth radius of `$geoNear`), but text
+        scores differ between engines, so a text search is only continued here if its first page
+        came from the store."""
+        if not inputs.Text:
+            return True
+        try:
+            cursor = DecodeSearchCursor(inputs)
+        except ValueError:
+            return False
+        return cursor is None or cursor.Engine == "memory"
+
+    def __text_match(self, text: str) -> Tuple[Bitset, List[str]]:
+        """The restaurants containing every syllable of the text, and the tokens scoring them."""
+        syllables, bigrams = TextTokens(text)
+        return Bitset.FromIndices(self.__text.Match(syllables), self.Count), syllables + bigrams
+
+    def __filter_mask(self, inputs: Union[MongoDBSearchInputSchema, MongoDBViewportInputSchema]
+                      ) -> Tuple[bool, Optional[Bitset]]:
+        """
+        Combine the precomputed filter bitmaps of the inputs.
+
+        Returns:
+            Tuple[bool, Optional[Bitset]]: Whether anything can match (False if a categorical
+            filter value is unknown), and the combined bitset (None if there is no filter at all).
+        """
+        bitsets: List[Optional[Bitset]] = []
+        if inputs.MinRating is not None:
+            bitsets.append(self.__rating_bitmaps.AtLeast(inputs.MinRating))
+        for value, dictionary, bitmaps in (
+            (inputs.Category, self.__categories, self.__category_bitmaps),
+            (inputs.Province, self.__provinces, self.__province_bitmaps),
+            (inputs.District, self.__districts, self.__district_bitmaps),
+        ):
+            if not value:
+                continue
+            code = dictionary.Lookup(value)
+            if code is None:
+                return False, None
+            bitsets.append(bitmaps.Equal(code))
+        return True, CombineAll(bitsets)
+
+    def __rank(self, candidates: np.ndarray, distances: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the top `limit` candidates ordered by (distance, -rating, id)."""
+        if len(candidates) > limit:
+            # Keep everything up to the limit-th distance (ties included) before the exact sort
+            threshold = np.partition(distances, limit - 1)[limit - 1]
+            keep = distances <= threshold
+            candidates, distances = candidates[keep], distances[keep]
+        # Missing ratings rank as 0.0, as in the MongoDB pipeline
+        ratings = np.nan_to_num(self.__rating[candidates], nan=0.0)
+        order = np.lexsort((candidates, -ratings, distances))[:limit]
+        return candidates[order], distances[order]
+
+    def __rank_text(self, candidates: np.ndarray, distances: np.ndarray, scores: np.ndarray,
+                    limit: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the top `limit` candidates ordered by (-score, distance, id)."""
+        order = np.lexsort((candidates, distances, -scores))[:limit]
+        return candidates[order], distances[order], scores[order]
+
+    def __after_text(self, cursor: MongoDBSearchCursor, candidates: np.ndarray, distances: np.ndarray,
+                     scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Keep the text candidates ordered after the last restaurant of the previous page."""
+        score = cursor.Score or 0.0
+        low = cursor.Distance - MONGODB_CURSOR_DISTANCE_TOLERANCE
+        high = cursor.Distance + MONGODB_CURSOR_DISTANCE_TOLERANCE
+        first_after = bisect.bisect_right(self.__ids, cursor.Id)
+        tie_after = (distances > high) | ((distances >= low) & (candidates >= first_after))
+        keep = (scores < score) | ((scores == score) & tie_after)
+        return candidates[keep], distances[keep], scores[keep]
+
+    def __after(self, cursor: MongoDBSearchCursor,
+                candidates: np.ndarray, distances: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Keep the candidates ordered after the last restaurant of the previous page."""
+        low = cursor.Distance - MONGODB_CURSOR_DISTANCE_TOLERANCE
+        high = cursor.Distance + MONGODB_CURSOR_DISTANCE_TOLERANCE
+        ratings = np.nan_to_num(self.__rating[candidates], nan=0.0)
+        rating = np.float32(cursor.Rating or 0.0)
+        # First row whose id sorts after the cursor id (the id may be gone since)
+        first_after = bisect.bisect_right(self.__ids, cursor.Id)
+        tie_after = (ratings < rating) | ((ratings == rating) & (candidates >= first_after))
+        keep = (distances > high) | ((distances >= low) & tie_after)
+        return candidates[keep], distances[keep]
+
+    def __facets(self, candidates: np.ndarray) -> Dict[str, List[Dict[str, Any]]]:
+        """Count the matches by category, district and rating bucket (same output as the MongoDB $facet)."""
+        facets: Dict[str, List[Dict[str, Any]]] = {}
+        for name, column, dictionary in (
+            ("category", self.__category, self.__categories),
+            ("district", self.__district, self.__districts),
+        ):
+            codes = column[candidates]
+            # -1 (missing) is shifted to bin 0
+            counts = np.bincount(codes + 1, minlength=len(dictionary.values) + 1)
+            present = np.flatnonzero(counts)
+            values = [(int(counts[b]), dictionary.Decode(int(b) - 1)) for b in present]
+            values.sort(key=lambda x: (-x[0], x[1] or ""))
+            facets[name] = [{"value": v, "count": c} for c, v in values[:MONGODB_FACET_MAX_BUCKETS]]
+
+        ratings = np.nan_to_num(self.__rating[candidates], nan=0.0)
+        boundaries = np.array(MONGODB_FACET_RATING_BOUNDARIES, dtype=np.float32)
+        buckets = np.searchsorted(boundaries, ratings, side="right") - 1
+        inside = (buckets >= 0) & (buckets < len(boundaries) - 1)
+        counts = np.bincount(buckets[inside], minlength=len(boundaries) - 1)
+        facets["rating"] = [{"value": MONGODB_FACET_RATING_BOUNDARIES[b], "count": int(c)}
+                            for b, c in enumerate(counts) if c]
+        if not inside.all():
+            facets["rating"].append({"value": "other", "count": int((~inside).sum())})
+        return facets
+
+    def __to_response(self, index: int, distance: Optional[float],
+                      score: Optional[float] = None) -> MongoDBRestaurantResponse:
+        row = self.__columns[index]
+        rid, name, address, ward, tags, link, location = self.__payload[index]
+        rating = float(row["rating"])
+        return MongoDBRestaurantResponse(
+            id=rid,
+            name=name,
+            category=self.__categories.Decode(int(row["category"])) or "Unknown",
+            rating=0.0 if np.isnan(rating) else round(rating, 2),
+            address=address,
+            province=self.__provinces.Decode(int(row["province"])) or "",
+            district=self.__districts.Decode(int(row["district"])) or "",
+            ward=ward,
+            tags=tags,
+            location=location,
+            distance=distance,
+            distance_km=distance / 1000 if distance is not None else None,
+            link=link,
+            score=score
+        )
+
+    def Search(self, inputs: MongoDBSearchInputSchema) -> MongoDBSearchResponse:
+        """
+        Search restaurants near a location, same semantics as `MongoDBHandlers.Search`.
+
+        Text is matched diacritic-insensitively with the in-process inverted index (every
+        syllable must be in the name, category or address) and ranked by BM25 blended with the
+        distance, so the scores are not MongoDB's textScore and text pages can only be continued
+        by the store (see `CanServe`).
+
+        Args:
+            inputs: MongoDBSearchInputSchema with search parameters
+
+        Returns:
+            MongoDBSearchResponse with list of restaurants, ordered by distance then rating
+            (by text score, then distance, if text search)
+        """
+        try:
+            if not self.CanServe(inputs):
+                raise ValueError("RestaurantStore can not continue a MongoDB text search")
+
+            restaurants: List[MongoDBRestaurantResponse] = []
+            cursor = DecodeSearchCursor(inputs)
+            matchable, mask = self.__filter_mask(inputs)
+            total, facets = (0, {"category": [], "district": [], "rating": []}) if inputs.Facets else (None, None)
+            if matchable and inputs.Text:
+                text_mask, tokens = self.__text_match(inputs.Text)
+                candidates, distances = self.__spatial.WithinRadius(
+                    inputs.Latitude, inputs.Longitude, inputs.Radius, mask=CombineAll([mask, text_mask])
+                )
+                if inputs.Facets:
+                    total, facets = len(candidates), self.__facets(candidates)
+                # Scored among every match (not just the page), so pages share the same scores
+                scores = BlendDistance(self.__text.Score(tokens, candidates), distances,
+                                       inputs.Radius, self.__text_distance_weight)
+                if cursor is not None:
+                    candidates, distances, scores = self.__after_text(cursor, candidates, distances, scores)
+                candidates, distances, scores = self.__rank_text(candidates, distances, scores, inputs.Limit)
+                restaurants = [self.__to_response(int(i), float(d), float(s))
+                               for i, d, s in zip(candidates, distances, scores)]
+            elif matchable:
+                if cursor is None and not inputs.Facets:
+                    candidates, distances = self.__spatial.NearestCandidates(
+                        inputs.Latitude, inputs.Longitude, inputs.Limit,
+                        max_radius=inputs.Radius, mask=mask
+                    )
+                else:
+                    # Facets count every match, a later page ranks everything after the cursor
+                    candidates, distances = self.__spatial.WithinRadius(
+                        inputs.Latitude, inputs.Longitude, inputs.Radius, mask=mask
+                    )
+                    if inputs.Facets:
+                        total, facets = len(candidates), self.__facets(candidates)
+                    if cursor is not None:
+                        candidates, distances = self.__after(cursor, candidates, distances)
+                candidates, distances = self.__rank(candidates, distances, inputs.Limit)
+                restaurants = [self.__to_response(int(i), float(d)) for i, d in zip(candidates, distances)]
+
+            return MongoDBSearchResponse(
+                success=True,
+                count=len(restaurants),
+                query_info={
+                    "text": inputs.Text,
+                    "location": {
+                        "latitude": inputs.Latitude,
+                        "longitude": inputs.Longitude
+                    },
+                    "radius_meters": inputs.Radius,
+                    "radius_km": inputs.Radius / 1000,
+                    "min_rating": inputs.MinRating,
+                    "category": inputs.Category,
+                    "province": inputs.Province,
+                    "district": inputs.District,
+                    "limit": inputs.Limit,
+                    "engine": "memory"
+                },
+                restaurants=restaurants,
+                next_cursor=NextSearchCursor(inputs, restaurants, "memory"),
+                total=total,
+                facets=facets
+            )
+
+        except Exception as e:
+            return MongoDBSearchResponse(
+                success=False,
+                count=0,
+                query_info={},
+                restaurants=[],
+                error=str(e)
+            )
+
+    def CorrectQuery(self, text: str) -> Optional[str]:
+        """
+        Correct the misspelled words of a search text ("bun bo hueh", "hu tiu") to the closest
+        name, category or dish tag word (edit distance 1 for short syllables, 2 otherwise).
+        Words of the text index (e.g. address words) are never corrected.
+
+        Args:
+            text: The search text.
+
+        Returns:
+            Optional[str]: The corrected text (normalized, without accents), None if nothing was corrected.
+        """
+        return self.__speller.CorrectText(text, self.__text.Contains)
+
+    def Autocomplete(self, prefix: str, latitude: Optional[float] = None, longitude: Optional[float] = None,
+                     limit: int = 8) -> List[AutocompleteSuggestion]:
+        """
+        Suggest what the user is typing: the dish keywords (most common first), then the restaurants
+        (best rated first, weighed by proximity if a focus point is given) with a word starting
+        with the prefix, diacritic-insensitively.
+
+        Args:
+            prefix: The text typed so far.
+            latitude: The focus point latitude (optional, with longitude).
+            longitude: The focus point longitude (optional, with latitude).
+            limit: The maximum number of suggestions.
+
+        Returns:
+            List[AutocompleteSuggestion]: At most AUTOCOMPLETE_MAX_KEYWORDS keywords, then restaurants.
+        """
+        suggestions = [
+            AutocompleteSuggestion(kind="keyword", text=self.__keywords[k][0], count=self.__keywords[k][1])
+            for k in self.__keyword_completions.Complete(prefix, min(limit, AUTOCOMPLETE_MAX_KEYWORDS))
+        ]
+
+        focused = latitude is not None and longitude is not None
+        def distances(rows: np.ndarray) -> np.ndarray:
+            return HaversineMeters(latitude, longitude, self.__lat[rows], self.__lon[rows])
+        rows = self.__name_completions.Complete(
+            prefix, limit - len(suggestions),
+            (lambda rows: 1.0 / (1.0 + distances(rows) / AUTOCOMPLETE_PROXIMITY_SCALE)) if focused else None
+        )
+
+        for row, distance in zip(rows, distances(rows) if focused else [None] * len(rows)):
+            rating = float(self.__rating[row])
+            suggestions.append(AutocompleteSuggestion(
+                kind="restaurant",
+                text=self.__payload[row][1],
+                id=self.__ids[row],
+                category=self.__categories.Decode(int(self.__category[row])),
+                rating=None if np.isnan(rating) else round(rating, 2),
+                distance=None if distance is None else float(distance)
+            ))
+        return suggestions
+
+    def Viewport(self, inputs: MongoDBViewportInputSchema) -> MongoDBViewportResponse:
+        """
+        Search the restaurants of a map viewport, same semantics as `MongoDBHandlers.Viewport`.
+
+        Args:
+            inputs: MongoDBViewportInputSchema with the viewport and filters
+
+        Returns:
+            MongoDBViewportResponse with either restaurants (best rated first) or clusters
+            (most populated first)
+        """
+        try:
+            response = MongoDBViewportResponse(success=True, query_info={
+                "bounds": {"south": inputs.MinLatitude, "west": inputs.MinLongitude,
+                           "north": inputs.MaxLatitude, "east": inputs.MaxLongitude},
+                "zoom": inputs.Zoom,
+                "min_rating": inputs.MinRating,
+                "category": inputs.Category,
+                "province": inputs.Province,
+                "district": inputs.District,
+                "engine": "memory"
+            })
+            matchable, mask = self.__filter_mask(inputs)
+            if not matchable:
+                return response
+
+            candidates = self.__spatial.WithinBox(inputs.MinLatitude, inputs.MaxLatitude,
+                                                  inputs.MinLongitude, inputs.MaxLongitude, mask=mask)
+            response.total = len(candidates)
+            if ViewportUsesMarkers(inputs.Zoom, response.total):
+                # Best rated first, then id (row order), as the MongoDB pipeline
+                ratings = np.nan_to_num(self.__rating[candidates], nan=0.0)
+                best = candidates[np.lexsort((candidates, -ratings))[:MONGODB_VIEWPORT_MAX_MARKERS]]
+                response.restaurants = [self.__to_response(int(i), None) for i in best]
+                response.truncated = response.total > len(best)
+            else:
+                xs, ys, counts, lats, lons, ratings = GridClusters(
+                    self.__lat[candidates], self.__lon[candidates], self.__rating[candidates], inputs.Zoom
+                )
+                response.clustered = True
+                response.truncated = len(counts) > MONGODB_VIEWPORT_MAX_CLUSTERS
+                response.clusters = [
+                    MongoDBViewportCluster(
+                        key=f"{inputs.Zoom}/{int(x)}/{int(y)}",
+                        latitude=float(lat),
+                        longitude=float(lon),
+                        count=int(count),
+                        best_rating=round(float(rating), 2)
+                    )
+                    for x, y, count, lat, lon, rating in zip(
+                        xs[:MONGODB_VIEWPORT_MAX_CLUSTERS], ys[:MONGODB_VIEWPORT_MAX_CLUSTERS],
+                        counts, lats, lons, ratings
+                    )
+                ]
+            return response
+
+        except Exception as e:
+            return MongoDBViewportResponse(success=False, error=str(e))
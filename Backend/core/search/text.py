@@ -0,0 +1,207 @@
+"""
+Vietnamese diacritic-insensitive text normalization and in-process inverted index.
+
+"Phở Bò Đặc Biệt" and "pho bo dac biet" normalize to the same syllables
+(`pho bo dac biet`), indexed with their bigrams (`pho_bo`, `bo_dac`, ...) so that
+adjacent syllables ("phở bò", not "bò ... phở") score higher.
+"""
+
+import re, unicodedata
+import numpy as np
+from typing import Optional, List, Dict, Tuple, Iterable
+
+TEXT_FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "address": 1.0}
+"""The weight of a token found in each restaurant field (the best field counts)."""
+
+TEXT_BM25_K1 = 1.2
+"""BM25 term frequency saturation."""
+TEXT_BM25_B = 0.75
+"""BM25 document length normalization."""
+TEXT_DEFAULT_DISTANCE_WEIGHT = 0.3
+"""The default share of the distance in the blended text score (0: relevance only, 1: distance only)."""
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def NormalizeVietnamese(text: str) -> str:
+    """Lowercase, strip the tones/diacritics (and đ -> d) and keep only [a-z0-9] syllables separated by spaces."""
+    decomposed = unicodedata.normalize("NFD", text.lower().replace("đ", "d"))
+    stripped = "".join(c for c in decomposed if unicodedata.category(c) != "Mn")
+    return _NON_ALNUM.sub(" ", stripped).strip()
+
+
+def TextTokens(text: str) -> Tuple[List[str], List[str]]:
+    """
+    Tokenize a text into normalized syllables and bigrams.
+
+    Returns:
+        Tuple[List[str], List[str]]: The syllables and the bigrams (`a_b`), in text order.
+    """
+    syllables = NormalizeVietnamese(text).split()
+    return syllables, [f"{a}_{b}" for a, b in zip(syllables, syllables[1:])]
+
+
+def RestaurantSearchTokens(name: Optional[str], category: Optional[str], address: Optional[str]) -> Dict[str, float]:
+    """
+    The weighted search tokens of a restaurant (stored as `search_tokens` at import).
+
+    Returns:
+        Dict[str, float]: Every syllable and bigram of the fields, with the weight of the best field it is in.
+    """
+    tokens: Dict[str, float] = {}
+    for value, weight in ((name, TEXT_FIELD_WEIGHTS["name"]), (category, TEXT_FIELD_WEIGHTS["category"]),
+                          (address, TEXT_FIELD_WEIGHTS["address"])):
+        if not value:
+            continue
+        syllables, bigrams = TextTokens(value)
+        for token in syllables + bigrams:
+            if tokens.get(token, 0.0) < weight:
+                tokens[token] = weight
+    return tokens
+
+
+def _bm25(weights: List[np.ndarray], lengths: np.ndarray) -> np.ndarray:
+    """
+    BM25 of candidates, with the candidates as the collection (idf and average length).
+
+    Args:
+        weights: For each query token (in a fixed order), its weight in each candidate (0 if absent).
+            The field weight plays the term frequency (BM25F-style).
+        lengths: The length of each candidate (sum of its token weights).
+    """
+    scores = np.zeros(len(lengths), dtype=np.float64)
+    if len(lengths) == 0:
+        return scores
+    average = float(lengths.mean()) or 1.0
+    norms = TEXT_BM25_K1 * (1.0 - TEXT_BM25_B + TEXT_BM25_B * lengths / average)
+    for w in weights:
+        frequency = int(np.count_nonzero(w))
+        if frequency == 0:
+            continue
+        idf = np.log(1.0 + (len(lengths) - frequency + 0.5) / (frequency + 0.5))
+        scores += idf * w * (TEXT_BM25_K1 + 1.0) / (w + norms)
+    return scores
+
+
+def BM25Scores(tokens: Iterable[str], documents: List[Dict[str, float]]) -> np.ndarray:
+    """
+    BM25 relevance of candidate documents (the same as `InvertedIndex.Score` of these documents).
+
+    Args:
+        tokens: The query syllables and bigrams.
+        documents: The weighted tokens of each candidate (see `RestaurantSearchTokens`).
+    """
+    lengths = np.array([sum(d.values()) for d in documents], dtype=np.float64)
+    weights = [np.array([d.get(t, 0.0) for d in documents], dtype=np.float64) for t in sorted(set(tokens))]
+    return _bm25(weights, lengths)
+
+
+def BlendDistance(scores: np.ndarray, distances: np.ndarray, radius: float, weight: float) -> np.ndarray:
+    """
+    Blend text relevance with proximity: `(1 - weight) * score / max score + weight * (1 - distance / radius)`.
+
+    The scores are normalized by the best candidate, so the blend is the same for every page of a search.
+    """
+    best = float(scores.max()) if len(scores) else 0.0
+    relevance = scores / best if best > 0 else scores
+    proximity = 1.0 - np.clip(distances / radius, 0.0, 1.0)
+    return (1.0 - weight) * relevance + weight * proximity
+
+
+class InvertedIndex:
+    """
+    Inverted index with the posting lists stored as one CSR array pair.
+
+    The postings of a token are a sorted int32 slice of document ids (with a parallel
+    float32 slice of weights), so a query intersects the slices of its syllables
+    (smallest first) and scores the survivors (BM25) with binary searches.
+
+    Usage:
+        index = InvertedIndex([RestaurantSearchTokens(...), ...])
+        ids = index.Match(["pho", "bo"])
+        scores = index.Score(["pho", "bo", "pho_bo"], ids)
+    """
+
+    def __init__(self, documents: List[Dict[str, float]]) -> None:
+        """
+        Build the index.
+
+        Args:
+            documents: The weighted tokens of each document, the document id is the list index.
+        """
+        self.__count = len(documents)
+        self.__terms: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        weights: List[float] = []
+        for doc_id, tokens in enumerate(documents):
+            for token, weight in tokens.items():
+                term_ids.append(self.__terms.setdefault(token, len(self.__terms)))
+                doc_ids.append(doc_id)
+                weights.append(weight)
+
+        terms = np.array(term_ids, dtype=np.int32)
+        docs = np.array(doc_ids, dtype=np.int32)
+        order = np.lexsort((docs, terms))
+        self.__postings = docs[order]
+        self.__weights = np.array(weights, dtype=np.float32)[order]
+        frequencies = np.bincount(terms, minlength=len(self.__terms))
+        self.__offsets = np.concatenate(([0], np.cumsum(frequencies))).astype(np.int64)
+        self.__lengths = np.bincount(docs, weights=np.array(weights, dtype=np.float64), minlength=self.__count)
+
+    @property
+    def Count(self) -> int:
+        """Number of indexed documents."""
+        return self.__count
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the index arrays (not the term dictionary), in bytes."""
+        return self.__postings.nbytes + self.__weights.nbytes + self.__offsets.nbytes + self.__lengths.nbytes
+
+    def Documents(self) -> List[Dict[str, float]]:
+        """The weighted tokens of each document, as given to the constructor (for a rebuild)."""
+        documents: List[Dict[str, float]] = [{} for _ in range(self.__count)]
+        for term, token in enumerate(self.__terms):
+            start, end = self.__offsets[term], self.__offsets[term + 1]
+            for doc_id, weight in zip(self.__postings[start:end].tolist(), self.__weights[start:end].tolist()):
+                documents[doc_id][token] = weight
+        return documents
+
+    def Contains(self, token: str) -> bool:
+        """Whether any document has the token."""
+        return token in self.__terms
+
+    def Postings(self, token: str) -> Tuple[np.ndarray, np.ndarray]:
+        """The sorted document ids containing the token, and their weights (empty if unknown)."""
+        term = self.__terms.get(token)
+        if term is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        start, end = self.__offsets[term], self.__offsets[term + 1]
+        return self.__postings[start:end], self.__weights[start:end]
+
+    def Match(self, tokens: Iterable[str]) -> np.ndarray:
+        """The sorted ids of the documents containing every token (empty if no token)."""
+        postings = sorted((self.Postings(t)[0] for t in set(tokens)), key=len)
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+        ids = postings[0]
+        for other in postings[1:]:
+            if len(ids) == 0:
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def Score(self, tokens: Iterable[str], ids: np.ndarray) -> np.ndarray:
+        """The BM25 relevance of the documents `ids`, with these documents as the collection (see `BM25Scores`)."""
+        weights = []
+        # A fixed order keeps the float sums (and so the text cursors) identical across processes
+        for token in sorted(set(tokens)):
+            postings, token_weights = self.Postings(token)
+            w = np.zeros(len(ids), dtype=np.float64)
+            if len(postings):
+                positions = np.minimum(np.searchsorted(postings, ids), len(postings) - 1)
+                found = postings[positions] == ids
+                w[found] = token_weights[positions[found]]
+            weights.append(w)
+        return _bm25(weights, self.__lengths[ids])
@@ -0,0 +1,456 @@
+"""
+Precomputed restaurant density tiles (heatmap layer).
+
+Every z/x/y Web Mercator tile in [min zoom, max zoom] is split into a grid of
+`DENSITY_TILE_CELLS` x `DENSITY_TILE_CELLS` cells; each non-empty cell is a GeoJSON point
+(centroid of its restaurants) with the restaurant `count` and `avg_rating`. Tiles are built
+once from the `restaurants` collection, written to a disk folder and served from an LRU cache
+(then the disk), never from MongoDB. A refresh only rebuilds the tiles of the restaurants
+changed (`updated_at`) or deleted since the last build.
+"""
+
+import os, json, asyncio, hashlib, time
+import numpy as np
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple, Set, Iterable
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from core.mongodb.changes import MongoDBRestaurantChange
+from core.search.cluster import MercatorCells
+from utils import LRUCache, Logger
+
+DENSITY_TILE_CELLS = 16
+"""The cells along each axis of a tile (16px cells of a 256px tile)."""
+
+DENSITY_TILE_PROJECTION = {"location": 1, "rating": 1, "updated_at": 1}
+"""The fields loaded from the `restaurants` collection."""
+
+DENSITY_TILE_MEDIA_TYPE = "application/geo+json"
+"""The media type of an encoded tile."""
+
+_MANIFEST_FILE = "manifest.json"
+_POINTS_FILE = "points.npz"
+
+TileKey = Tuple[int, int, int]
+"""A tile (zoom, x, y)."""
+
+
+@dataclass
+class DensityTile:
+    """An encoded density tile."""
+    Body: bytes
+    ETag: str
+    """The strong ETag of `Body` (quoted)."""
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _encode(features: List[Dict[str, Any]]) -> bytes:
+    return json.dumps({"type": "FeatureCollection", "features": features},
+                      separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+_EMPTY_BODY = _encode([])
+EMPTY_DENSITY_TILE = DensityTile(Body=_EMPTY_BODY, ETag=_etag(_EMPTY_BODY))
+"""The tile served where there is no restaurant."""
+
+
+class DensityTileSet:
+    """
+    The density tiles of the restaurants, with their disk folder and memory cache.
+
+    Usage:
+        await DensityTileSet.Load(MongoDB.get_database(), "data/tiles", 4, 14)   # app startup
+        tiles = DensityTileSet.Get()                                            # None if not loaded
+        tile = await tiles.Tile(12, 3260, 1923)
+        await tiles.Refresh(MongoDB.get_database())                             # rebuild changed tiles
+    """
+
+    __current: Optional["DensityTileSet"] = None
+    __database: Optional[AsyncIOMotorDatabase] = None
+    __refresh_task: Optional["asyncio.Task"] = None
+
+    def __init__(self, folder: str, min_zoom: int, max_zoom: int, memory_tiles: int = 4096) -> None:
+        """
+        Create an empty tile set (see `Build` / `Update`).
+
+        Args:
+            folder: The folder of the tile files, manifest and points snapshot.
+            min_zoom: The lowest zoom level with tiles.
+            max_zoom: The highest zoom level with tiles.
+            memory_tiles: How many encoded tiles are kept in memory.
+        """
+        if min_zoom > max_zoom:
+            raise ValueError("The density tiles minimum zoom must not be greater than the maximum zoom")
+        self.__folder = folder
+        self.__min_zoom = min_zoom
+        self.__max_zoom = max_zoom
+        self.__cache: LRUCache[TileKey, DensityTile] = LRUCache(memory_tiles)
+        self.__lock = asyncio.Lock()
+        """Serializes the builds and refreshes (auto refresh, change feed): they rewrite the same columns and files."""
+
+        self.__ids: List[str] = []
+        self.__rows: Dict[str, int] = {}
+        self.__lat = np.empty(0, dtype=np.float64)
+        self.__lon = np.empty(0, dtype=np.float64)
+        self.__rating = np.empty(0, dtype=np.float64)
+        self.__alive = np.empty(0, dtype=bool)
+        self.__built_at: Optional[datetime] = None
+        self.__etags: Dict[TileKey, str] = {}
+        """The ETag of every non-empty tile (written in the folder)."""
+
+    @property
+    def MinZoom(self) -> int:
+        return self.__min_zoom
+
+    @property
+    def MaxZoom(self) -> int:
+        return self.__max_zoom
+
+    @property
+    def Count(self) -> int:
+        """Number of non-empty tiles."""
+        return len(self.__etags)
+
+    @property
+    def BuiltAt(self) -> Optional[datetime]:
+        """The latest `updated_at` of the built restaurants."""
+        return self.__built_at
+
+    def CacheStats(self) -> Dict[str, int]:
+        """The memory tile cache counters."""
+        return self.__cache.Stats()
+
+    def __path(self, key: TileKey) -> str:
+        zoom, x, y = key
+        return os.path.join(self.__folder, str(zoom), str(x), f"{y}.geojson")
+
+    def __tiles_of(self, rows: np.ndarray) -> Set[TileKey]:
+        """The tiles (at every zoom) containing the given rows."""
+        tiles: Set[TileKey] = set()
+        for zoom in range(self.__min_zoom, self.__max_zoom + 1):
+            x, y = MercatorCells(self.__lat[rows], self.__lon[rows], zoom, DENSITY_TILE_CELLS)
+            tiles.update((zoom, int(tx), int(ty)) for tx, ty in
+                         set(zip((x // DENSITY_TILE_CELLS).tolist(), (y // DENSITY_TILE_CELLS).tolist())))
+        return tiles
+
+    def __encode_zoom(self, zoom: int, dirty: Optional[Set[Tuple[int, int]]]) -> Dict[TileKey, bytes]:
+        """Encode the tiles of one zoom level (every non-empty tile if `dirty` is None)."""
+        rows = np.flatnonzero(self.__alive)
+        x, y = MercatorCells(self.__lat[rows], self.__lon[rows], zoom, DENSITY_TILE_CELLS)
+        tx, ty = x // DENSITY_TILE_CELLS, y // DENSITY_TILE_CELLS
+        tiles = ty * (1 << zoom) + tx
+        if dirty is not None:
+            keep = np.isin(tiles, np.array([t[1] * (1 << zoom) + t[0] for t in dirty], dtype=np.int64))
+            rows, x, y, tiles = rows[keep], x[keep], y[keep], tiles[keep]
+
+        # Group by (tile, cell): sorted, so each tile is one contiguous run of cells
+        cells = tiles * (DENSITY_TILE_CELLS * DENSITY_TILE_CELLS) + \
+            (y % DENSITY_TILE_CELLS) * DENSITY_TILE_CELLS + (x % DENSITY_TILE_CELLS)
+        unique, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+        lat_sums = np.bincount(inverse, weights=self.__lat[rows], minlength=len(unique))
+        lon_sums = np.bincount(inverse, weights=self.__lon[rows], minlength=len(unique))
+        ratings = self.__rating[rows]
+        rated = ~np.isnan(ratings)
+        rated_counts = np.bincount(inverse[rated], minlength=len(unique))
+        rating_sums = np.bincount(inverse[rated], weights=ratings[rated], minlength=len(unique))
+
+        encoded: Dict[TileKey, bytes] = {}
+        cell_tiles = unique // (DENSITY_TILE_CELLS * DENSITY_TILE_CELLS)
+        bounds = np.flatnonzero(np.diff(cell_tiles)) + 1
+        for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(unique)]))):
+            if start == end:
+                continue
+            tile = int(cell_tiles[start])
+            features = [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [
+                        round(float(lon_sums[i] / counts[i]), 6), round(float(lat_sums[i] / counts[i]), 6)
+                    ]},
+                    "properties": {
+                        "count": int(counts[i]),
+                        "avg_rating": round(float(rating_sums[i] / rated_counts[i]), 2) if rated_counts[i] else None
+                    }
+                }
+                for i in range(start, end)
+            ]
+            encoded[(zoom, tile % (1 << zoom), tile >> zoom)] = _encode(features)
+        return encoded
+
+    def __write(self, dirty: Optional[Set[TileKey]]):
+        """Rebuild and write the dirty tiles (all tiles if None), then the manifest and points snapshot."""
+        for zoom in range(self.__min_zoom, self.__max_zoom + 1):
+            zoom_dirty = None if dirty is None else {(x, y) for z, x, y in dirty if z == zoom}
+            if zoom_dirty is not None and not zoom_dirty:
+                continue
+            encoded = self.__encode_zoom(zoom, zoom_dirty)
+            removed = [k for k in self.__etags if k[0] == zoom] if zoom_dirty is None else \
+                [(zoom, x, y) for x, y in zoom_dirty]
+            for key in removed:
+                if key not in encoded and self.__etags.pop(key, None) is not None:
+                    try:
+                        os.remove(self.__path(key))
+                    except FileNotFoundError:
+                        pass
+            for key, body in encoded.items():
+                path = self.__path(key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(body)
+                os.replace(path + ".tmp", path)
+                self.__etags[key] = _etag(body)
+
+        points_path = os.path.join(self.__folder, _POINTS_FILE)
+        with open(points_path + ".tmp", "wb") as f:
+            np.savez(f, ids=np.array(self.__ids, dtype=str),
+                     lat=self.__lat, lon=self.__lon, rating=self.__rating, alive=self.__alive)
+        os.replace(points_path + ".tmp", points_path)
+        manifest = {
+            "min_zoom": self.__min_zoom,
+            "max_zoom": self.__max_zoom,
+            "cells": DENSITY_TILE_CELLS,
+            "built_at": self.__built_at.isoformat() if self.__built_at else None,
+            "tiles": {f"{z}/{x}/{y}": etag for (z, x, y), etag in self.__etags.items()}
+        }
+        with open(os.path.join(self.__folder, _MANIFEST_FILE + ".tmp"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+        os.replace(os.path.join(self.__folder, _MANIFEST_FILE + ".tmp"), os.path.join(self.__folder, _MANIFEST_FILE))
+
+    def __upsert(self, documents: Iterable[Dict[str, Any]]) -> List[int]:
+        """Insert or update the points of the documents, returning their rows."""
+        changed: List[int] = []
+        for doc in documents:
+            rid = str(doc.get("_id"))
+            try:
+                lon, lat = doc["location"]["coordinates"][:2]
+                lat, lon = float(lat), float(lon)
+            except (KeyError, TypeError, ValueError):
+                lat = lon = None
+            rating = doc.get("rating")
+            updated_at = doc.get("updated_at")
+            if isinstance(updated_at, datetime) and (self.__built_at is None or updated_at > self.__built_at):
+                self.__built_at = updated_at
+
+            row = self.__rows.get(rid)
+            if row is None:
+                if lat is None:
+                    continue
+                row = len(self.__ids)
+                self.__rows[rid] = row
+                self.__ids.append(rid)
+                self.__lat = np.append(self.__lat, lat)
+                self.__lon = np.append(self.__lon, lon)
+                self.__rating = np.append(self.__rating, np.nan)
+                self.__alive = np.append(self.__alive, False)
+            changed.append(row)
+            # Documents without a valid location leave the tiles, as deleted ones
+            self.__alive[row] = lat is not None
+            if lat is not None:
+                self.__lat[row], self.__lon[row] = lat, lon
+            self.__rating[row] = np.nan if rating is None else float(rating)
+        return changed
+
+    def Build(self, documents: List[Dict[str, Any]]):
+        """Build every tile from raw `restaurants` documents (fields of DENSITY_TILE_PROJECTION and `_id`)."""
+        # Columns built at once instead of per-document appends (see `Update`)
+        rows = []
+        for doc in documents:
+            try:
+                lon, lat = doc["location"]["coordinates"][:2]
+                rows.append((str(doc.get("_id")), float(lat), float(lon), doc.get("rating"), doc.get("updated_at")))
+            except (KeyError, TypeError, ValueError):
+                continue
+        self.__ids = [r[0] for r in rows]
+        self.__rows = {rid: i for i, rid in enumerate(self.__ids)}
+        self.__lat = np.array([r[1] for r in rows], dtype=np.float64)
+        self.__lon = np.array([r[2] for r in rows], dtype=np.float64)
+        self.__rating = np.array([np.nan if r[3] is None else float(r[3]) for r in rows], dtype=np.float64)
+        self.__alive = np.ones(len(rows), dtype=bool)
+        dates = [r[4] for r in rows if isinstance(r[4], datetime)]
+        self.__built_at = max(dates) if dates else None
+        self.__etags = {}
+        self.__cache.Clear()
+
+        os.makedirs(self.__folder, exist_ok=True)
+        self.__write(None)
+
+    def Update(self, documents: List[Dict[str, Any]], deleted_ids: Iterable[str] = ()) -> Set[TileKey]:
+        """
+        Apply changed and deleted restaurants, rebuilding only the tiles they leave or enter.
+        The memory cache is not touched (can run in a worker thread), see `Refresh`.
+
+        Args:
+            documents: The changed (or new) raw documents.
+            deleted_ids: The ids of the deleted restaurants.
+
+        Returns:
+            Set[TileKey]: The rebuilt tiles.
+        """
+        deleted = [self.__rows[rid] for rid in deleted_ids if rid in self.__rows]
+        before = [row for row in (self.__rows.get(str(d.get("_id"))) for d in documents) if row is not None]
+        old_rows = np.array([r for r in before + deleted if self.__alive[r]], dtype=np.int64)
+        dirty = self.__tiles_of(old_rows) if len(old_rows) else set()
+
+        self.__alive[deleted] = False
+        changed = np.array([r for r in self.__upsert(documents) if self.__alive[r]], dtype=np.int64)
+        if len(changed):
+            dirty |= self.__tiles_of(changed)
+        if dirty:
+            self.__write(dirty)
+        return dirty
+
+    def __restore(self) -> bool:
+        """Restore the state of the folder (manifest and points snapshot), False if missing or built differently."""
+        try:
+            with open(os.path.join(self.__folder, _MANIFEST_FILE), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if (manifest["min_zoom"], manifest["max_zoom"], manifest["cells"]) != \
+                    (self.__min_zoom, self.__max_zoom, DENSITY_TILE_CELLS):
+                return False
+            with np.load(os.path.join(self.__folder, _POINTS_FILE)) as points:
+                self.__ids = points["ids"].tolist()
+                self.__lat, self.__lon = points["lat"], points["lon"]
+                self.__rating, self.__alive = points["rating"], points["alive"]
+        except (OSError, ValueError, KeyError):
+            return False
+        self.__rows = {rid: i for i, rid in enumerate(self.__ids)}
+        self.__built_at = datetime.fromisoformat(manifest["built_at"]) if manifest["built_at"] else None
+        self.__etags = {}
+        for key, etag in manifest["tiles"].items():
+            z, x, y = (int(v) for v in key.split("/"))
+            self.__etags[(z, x, y)] = etag
+        return True
+
+    async def Refresh(self, database: AsyncIOMotorDatabase) -> int:
+        """
+        Rebuild the tiles of the restaurants changed (`updated_at` after the last build) or deleted.
+        Concurrent refreshes run one after the other.
+
+        Args:
+            database: AsyncIOMotorDatabase instance from MongoDB.get_database()
+
+        Returns:
+            int: The number of rebuilt tiles.
+        """
+        async with self.__lock:
+            query = {"updated_at": {"$gt": self.__built_at}} if self.__built_at is not None else {}
+            changed = await database.restaurants.find(query, DENSITY_TILE_PROJECTION).to_list(length=None)
+            ids = await database.restaurants.find({}, {"_id": 1}).to_list(length=None)
+            present = {str(d["_id"]) for d in ids}
+            deleted = [rid for rid, row in self.__rows.items() if self.__alive[row] and rid not in present]
+            if not changed and not deleted:
+                return 0
+            dirty = await asyncio.to_thread(self.Update, changed, deleted)
+            for key in dirty:
+                self.__cache.Pop(key)
+            return len(dirty)
+
+    async def Tile(self, zoom: int, x: int, y: int) -> DensityTile:
+        """Get a tile (memory cache, then disk). Tiles without restaurants are `EMPTY_DENSITY_TILE`."""
+        key = (zoom, x, y)
+        tile = self.__cache.Get(key)
+        if tile is not None:
+            return tile
+        etag = self.__etags.get(key)
+        if etag is None:
+            return EMPTY_DENSITY_TILE
+
+        def read() -> bytes:
+            with open(self.__path(key), "rb") as f:
+                return f.read()
+        try:
+            body = await asyncio.to_thread(read)
+        except FileNotFoundError:
+            return EMPTY_DENSITY_TILE
+        tile = DensityTile(Body=body, ETag=_etag(body))
+        self.__cache.Put(key, tile)
+        return tile
+
+    def TileETag(self, zoom: int, x: int, y: int) -> str:
+        """The ETag of a tile without reading it (for conditional requests)."""
+        return self.__etags.get((zoom, x, y), EMPTY_DENSITY_TILE.ETag)
+
+    @staticmethod
+    async def Load(database: AsyncIOMotorDatabase, folder: str, min_zoom: int, max_zoom: int,
+                   memory_tiles: int = 4096) -> bool:
+        """
+        Load the tiles of the folder and refresh them, or build every tile if the folder has none,
+        and make the tile set current.
+
+        Args:
+            database: AsyncIOMotorDatabase instance from MongoDB.get_database()
+            folder: The folder of the tile files.
+            min_zoom: The lowest zoom level with tiles.
+            max_zoom: The highest zoom level with tiles.
+            memory_tiles: How many encoded tiles are kept in memory.
+
+        Returns:
+            bool: True if loaded successfully, False otherwise (the previous tile set is kept).
+        """
+        try:
+            start = time.perf_counter()
+            tiles = DensityTileSet(folder, min_zoom, max_zoom, memory_tiles)
+            if tiles.__restore():
+                rebuilt = await tiles.Refresh(database)
+                Logger.LogInfo(f"DensityTileSet: Restored {tiles.Count:,} tiles, rebuilt {rebuilt:,} "
+                               f"in {time.perf_counter() - start:.2f}s")
+            else:
+                documents = await database.restaurants.find({}, DENSITY_TILE_PROJECTION).to_list(length=None)
+                async with tiles.__lock:
+                    await asyncio.to_thread(tiles.Build, documents)
+                Logger.LogInfo(f"DensityTileSet: Built {tiles.Count:,} tiles (zoom {min_zoom}-{max_zoom}) "
+                               f"in {time.perf_counter() - start:.2f}s")
+            DensityTileSet.__current = tiles
+            DensityTileSet.__database = database
+            return True
+        except Exception as e:
+            Logger.LogException(e, "DensityTileSet: Failed to load density tiles")
+            return False
+
+    @staticmethod
+    def StartAutoRefresh(database: AsyncIOMotorDatabase, interval: float):
+        """Refresh the current tile set every `interval` seconds in the background."""
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                tiles = DensityTileSet.__current
+                if tiles is None:
+                    continue
+                try:
+                    rebuilt = await tiles.Refresh(database)
+                    if rebuilt:
+                        Logger.LogInfo(f"DensityTileSet: Rebuilt {rebuilt:,} tiles")
+                except Exception as e:
+                    Logger.LogException(e, "DensityTileSet: Failed to refresh density tiles")
+        DensityTileSet.StopAutoRefresh()
+        DensityTileSet.__refresh_task = asyncio.create_task(loop())
+
+    @staticmethod
+    def StopAutoRefresh():
+        if DensityTileSet.__refresh_task is not None:
+            DensityTileSet.__refresh_task.cancel()
+            DensityTileSet.__refresh_task = None
+
+    @staticmethod
+    def Get() -> Optional["DensityTileSet"]:
+        """Get the current tile set, or None if not loaded."""
+        return DensityTileSet.__current
+
+    @staticmethod
+    async def OnRestaurantsChanged(change: MongoDBRestaurantChange):
+        """Change feed subscriber: refresh the current tile set (rebuilds the changed tiles only)."""
+        tiles = DensityTileSet.__current
+        if tiles is None or DensityTileSet.__database is None:
+            return
+        # The refresh finds the changed and deleted restaurants itself, `Full` included
+        await tiles.Refresh(DensityTileSet.__database)
+
+    @staticmethod
+    def Unload():
+        """Drop the current tile set and stop its refresh (the folder is kept)."""
+        DensityTileSet.StopAutoRefresh()
+        DensityTileSet.__current = None
+        DensityTileSet.__database = None
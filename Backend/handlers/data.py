@@ -1,14 +1,66 @@
-from core.mongodb import MongoDB, MongoDBHandlers, MongoDBSearchInputSchema
-from schemas.data import DataRestaurantResponseModel
-from typing import Optional, List
-from pydantic import PositiveFloat, BaseModel
+from core.mongodb import (
+    MongoDB,
+    MongoDBHandlers,
+    MongoDBSearchInputSchema,
+    MongoDBRestaurantResponse,
+    MongoDBSearchResponse,
+    MongoDBViewportInputSchema,
+    MongoDBViewportResponse,
+    MongoDBInvalidCursorError,
+    MongoDBRestaurantChange,
+    MongoDBQueryPlanner,
+    MongoDBSearchStrategy,
+    MongoDBSlowQuery,
+    MongoDBDeadline,
+    MongoDBDeadlineExceededError,
+    MongoDBCancellations,
+    DecodeSearchCursor,
+    NextSearchCursor,
+    MONGODB_STREAM_BATCH_SIZE
+)
+from core.search import RestaurantStore, DensityTileSet, DensityTile, HaversineMeters
+from core.search.geo import METERS_PER_DEGREE
+from schemas.data import (
+    DataRestaurantResponseModel,
+    DataRestaurantFacetsModel,
+    DataRestaurantClusterModel,
+    DataRestaurantSuggestionModel,
+    DataStatsModel
+)
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator, Callable, Awaitable, TypeVar
+from dataclasses import dataclass
+from pydantic import PositiveFloat, BaseModel, Field, ValidationError
 from fastapi import status
 from fastapi.exceptions import HTTPException
+from pymongo.errors import ExecutionTimeout
+from utils import Config, LRUCache, SingleFlight, Logger
+import os, math, asyncio
+import numpy as np
 
 DATA_DEFAULT_SEARCH_RADIUS = 5000
 DATA_DEFAULT_SEARCH_LIMIT = 10
 
+DATA_DEFAULT_STREAM_LIMIT = 1000
+DATA_STREAM_DEADLINE_SCALE = 5
+"""The deadline of a streamed search, in search SLOs (it reads thousands of restaurants, not a page)."""
+DATA_DEFAULT_TOP_RATED_MIN_RATING = 4.0
+DATA_DEFAULT_AUTOCOMPLETE_LIMIT = 8
+DATA_BATCH_SEARCH_CONCURRENCY = 4
+"""How many searches of one batch request run at the same time."""
+
+DATA_SEARCH_RADIUS_TIERS = (500, 1000, 2000, 3000, 5000, 10000, 20000, 50000)
+"""The cached search radiuses (meters), a request uses the smallest tier covering it."""
+DATA_SEARCH_CACHE_FETCH_LIMIT = 100
+"""How many restaurants a cached search fetches (the MongoDB search maximum)."""
+
+DATA_CLIENT_CLOSED_REQUEST = 499
+"""The status of a search abandoned because the client disconnected (nginx convention, never received)."""
+
 DataRestaurantSearchResult = List[DataRestaurantResponseModel]
+DataDisconnectCheck = Callable[[], Awaitable[bool]]
+"""Whether the client of the request has disconnected (e.g. Starlette's `Request.is_disconnected`)."""
+
+_T = TypeVar("_T")
 
 class DataRestaurantFilter(BaseModel):
     Query: Optional[str] = None
@@ -18,17 +70,349 @@ class DataRestaurantFilter(BaseModel):
     Province: Optional[str] = None
     District: Optional[str] = None
 
+class DataRestaurantSearchPage(BaseModel):
+    """A page of restaurants of a search."""
+    Restaurants: DataRestaurantSearchResult = Field(default_factory=list)
+    Rows: Optional[List[Any]] = None
+    """The restaurants as serialized response rows instead (`RowFromMongoDB`), if requested."""
+    NextCursor: Optional[str] = None
+    """The continuation token of the next page, None if last page."""
+    Total: Optional[int] = None
+    """Number of matches over all pages (only if facets were requested)."""
+    Facets: Optional[DataRestaurantFacetsModel] = None
+    """The facet counts of the matches (only if facets were requested)."""
+    CorrectedQuery: Optional[str] = None
+    """The spelling-corrected text actually searched, None if the query was searched as typed."""
+
+class DataRestaurantBatchPointResult(BaseModel):
+    """The result of one point of a batch restaurant search: its restaurants, or why its search failed."""
+    Restaurants: DataRestaurantSearchResult = Field(default_factory=list)
+    ErrorCode: Optional[int] = None
+    """The HTTP status of the failed search of this point, None if it succeeded."""
+    Error: Optional[str] = None
+    """Why the search of this point failed, None if it succeeded."""
+
+class DataRestaurantViewport(BaseModel):
+    """The restaurants of a map viewport, or their clusters at low zoom."""
+    Total: int
+    """Number of restaurants in the viewport."""
+    Clustered: bool
+    """Whether `Clusters` is returned instead of `Restaurants`."""
+    Truncated: bool
+    """Whether some restaurants/clusters were left out (best rated/most populated kept)."""
+    Restaurants: DataRestaurantSearchResult
+    Clusters: List[DataRestaurantClusterModel]
+
+class DataRestaurantSearchPoint(BaseModel):
+    """One focus point of a batch restaurant search."""
+    Latitude: float
+    Longitude: float
+    Filters: Optional[DataRestaurantFilter] = None
+    Limit: Optional[int] = None
+
+@dataclass
+class _SearchCacheEntry:
+    """A cached search around a snapped focus point."""
+    Latitude: float
+    Longitude: float
+    Restaurants: List[MongoDBRestaurantResponse]
+    CompleteRadius: float
+    """Every match within this distance of the snapped point is in `Restaurants`."""
+
 class DataHandlers:
+    __search_cache: Optional[LRUCache[Tuple, _SearchCacheEntry]] = None
+    __search_cache_cell: float = 100.0
+    __search_cache_bypasses: int = 0
+    __search_flights: SingleFlight[Tuple, MongoDBSearchResponse] = SingleFlight()
+
+    __top_rated_size: Optional[int] = None
+    __planner: Optional[MongoDBQueryPlanner] = None
+    __deadline_slo: Optional[float] = None
+    """The MongoDB time budget of a search request (seconds), None for no deadline."""
+    __deadline_min_budget: float = 0.02
+    __disconnect_poll_interval: float = 0.1
+
     def __init__(self) -> None:
-        self.__mongo_handler = MongoDBHandlers(MongoDB.get_database())
-    
-    async def RestaurantSearch(self, focus_latitude: float,
-                               focus_longitude: float,
-                               filters: Optional[DataRestaurantFilter] = None,
-                               limit: Optional[int] = None) -> DataRestaurantSearchResult:
+        text_config = Config.Get().Data.TextRanking
+        self.__mongo_handler = MongoDBHandlers(MongoDB.get_database(), text_config.Hybrid,
+                                               text_config.DistanceWeight, text_config.MaxCandidates,
+                                               DataHandlers.__planner)
+
+    @staticmethod
+    def Initialize(top_rated_ready: bool = False):
+        """
+        Initialize the shared data handlers state (search cache, top-rated view) from the Config.
+
+        Args:
+            top_rated_ready (bool): Whether the materialized top-rated view was refreshed.
+        """
+        top_rated_config = Config.Get().Data.TopRated
+        DataHandlers.__top_rated_size = top_rated_config.Size if top_rated_config.Enabled and top_rated_ready else None
+
+        planner_config = Config.Get().Data.QueryPlanner
+        if planner_config.Enabled:
+            DataHandlers.__planner = MongoDBQueryPlanner(
+                sample_rate=planner_config.SampleRate,
+                slow_threshold=planner_config.SlowThreshold,
+                slow_log_size=planner_config.SlowLogSize,
+                adaptive=planner_config.Adaptive,
+                geo_first_radius=planner_config.GeoFirstRadius
+            )
+            Logger.LogInfo(f"DataHandlers: Search query planner enabled (explain {planner_config.SampleRate:.1%}, "
+                           f"slow {planner_config.SlowThreshold:.0f}ms, adaptive {planner_config.Adaptive})")
+        else:
+            DataHandlers.__planner = None
+
+        deadline_config = Config.Get().Data.SearchDeadline
+        if deadline_config.Enabled:
+            DataHandlers.__deadline_slo = deadline_config.SLO / 1000
+            DataHandlers.__deadline_min_budget = deadline_config.MinBudget / 1000
+            DataHandlers.__disconnect_poll_interval = deadline_config.DisconnectPollInterval
+            Logger.LogInfo(f"DataHandlers: Search deadline {deadline_config.SLO:.0f}ms, cancelled on client disconnect")
+        else:
+            DataHandlers.__deadline_slo = None
+
+        cache_config = Config.Get().Data.SearchCache
+        if cache_config.Enabled:
+            DataHandlers.__search_cache = LRUCache(cache_config.MaxEntries, cache_config.TTL)
+            DataHandlers.__search_cache_cell = cache_config.CellSize
+            Logger.LogInfo(f"DataHandlers: Search cache enabled ({cache_config.MaxEntries} entries, "
+                           f"TTL {cache_config.TTL}s, cell {cache_config.CellSize}m)")
+        else:
+            DataHandlers.__search_cache = None
+
+    @staticmethod
+    def SearchCacheStats() -> Optional[dict]:
+        """The search cache counters, or None if the cache is disabled."""
+        if DataHandlers.__search_cache is None:
+            return None
+        return {**DataHandlers.__search_cache.Stats(), "bypasses": DataHandlers.__search_cache_bypasses}
+
+    @staticmethod
+    def Stats() -> DataStatsModel:
+        """The search and database counters of this worker process."""
+        return DataStatsModel(
+            Pid=os.getpid(),
+            SearchCache=DataHandlers.SearchCacheStats(),
+            SearchCoalescing=DataHandlers.SearchCoalescingStats(),
+            SearchPlanner=DataHandlers.SearchPlannerStats(),
+            SlowSearches=[q.model_dump(exclude={"pipeline"}) for q in DataHandlers.SlowSearchQueries()],
+            SearchCancellations=DataHandlers.SearchCancellationStats(),
+            ConnectionPool=DataHandlers.ConnectionPoolStats()
+        )
+
+    @staticmethod
+    def SearchPlannerStats() -> Optional[dict]:
+        """The latency and explain statistics of every MongoDB search shape, or None if the planner is disabled."""
+        if DataHandlers.__planner is None:
+            return None
+        return DataHandlers.__planner.Stats()
+
+    @staticmethod
+    def SlowSearchQueries() -> List[MongoDBSlowQuery]:
+        """The slow MongoDB searches (latest first), empty if the planner is disabled."""
+        if DataHandlers.__planner is None:
+            return []
+        return DataHandlers.__planner.SlowQueries()
+
+    @staticmethod
+    def SearchCancellationStats() -> dict:
+        """The MongoDB searches stopped by their deadline or a client disconnect, and the work of the killed operations."""
+        return MongoDBCancellations.Stats()
+
+    @staticmethod
+    def ConnectionPoolStats() -> Optional[dict]:
+        """The MongoDB connection pool gauges and checkout wait times of this worker, or None before initialization."""
+        return MongoDB.pool_stats()
+
+    @staticmethod
+    async def OnRestaurantsChanged(change: MongoDBRestaurantChange):
+        """Change feed subscriber: evict the cached searches that may contain a changed restaurant."""
+        cache = DataHandlers.__search_cache
+        if cache is None:
+            return
+        if change.Full:
+            cache.Clear()
+            return
+
+        latitudes = np.array([loc[0] for loc in change.Locations], dtype=np.float64)
+        longitudes = np.array([loc[1] for loc in change.Locations], dtype=np.float64)
+
+        def stale(key: Tuple, entry: _SearchCacheEntry) -> bool:
+            # An entry covers the restaurants within its radius tier (key[2]) of its snapped point
+            if len(latitudes) and HaversineMeters(entry.Latitude, entry.Longitude, latitudes, longitudes).min() <= key[2]:
+                return True
+            return any(r.id in change.Ids for r in entry.Restaurants)
+
+        evicted = cache.EvictWhere(stale)
+        if evicted:
+            Logger.LogDebug(f"DataHandlers: Evicted {evicted} cached searches ({len(change.Ids)} restaurants changed)")
+
+    @staticmethod
+    def SearchCoalescingStats() -> dict:
+        """The counters of the coalesced (single-flight) MongoDB searches."""
+        return DataHandlers.__search_flights.Stats()
+
+    @staticmethod
+    def __snap(inputs: MongoDBSearchInputSchema,
+               strategy: MongoDBSearchStrategy) -> Optional[Tuple[Tuple, float, float, float]]:
+        """The cache key, snapped point and radius tier of the inputs, None if not cacheable."""
+        step = DataHandlers.__search_cache_cell / METERS_PER_DEGREE
+        lat_cell = round(inputs.Latitude / step)
+        lon_cell = round(inputs.Longitude / step)
+        # The farthest a focus point can be from its snapped point (half the cell diagonal)
+        max_offset = DataHandlers.__search_cache_cell * math.sqrt(2) / 2
+        tier = next((t for t in DATA_SEARCH_RADIUS_TIERS if t >= inputs.Radius + max_offset), None)
+        if tier is None:
+            return None
+
+        key = (
+            lat_cell, lon_cell, tier,
+            " ".join(inputs.Text.lower().split()) if inputs.Text else None,
+            inputs.MinRating, inputs.Category, inputs.Province, inputs.District, strategy
+        )
+        return key, lat_cell * step, lon_cell * step, float(tier)
+
+    @staticmethod
+    def __exact_key(inputs: MongoDBSearchInputSchema) -> Tuple:
+        """The cache key of a hybrid text search page (same layout as `__snap`, radius third)."""
+        return (
+            inputs.Latitude, inputs.Longitude, inputs.Radius,
+            " ".join(inputs.Text.lower().split()) if inputs.Text else None,
+            inputs.MinRating, inputs.Category, inputs.Province, inputs.District, "hybrid", inputs.Limit
+        )
+
+    @staticmethod
+    def __from_cache(entry: _SearchCacheEntry,
+                     inputs: MongoDBSearchInputSchema) -> Optional[List[MongoDBRestaurantResponse]]:
+        """Re-rank a cached search for the true focus point, None if the entry can't answer exactly."""
+        offset = float(HaversineMeters(inputs.Latitude, inputs.Longitude,
+                                       np.array([entry.Latitude]), np.array([entry.Longitude]))[0])
+        restaurants = entry.Restaurants
+        distances = HaversineMeters(
+            inputs.Latitude, inputs.Longitude,
+            np.array([r.location["coordinates"][1] for r in restaurants], dtype=np.float64),
+            np.array([r.location["coordinates"][0] for r in restaurants], dtype=np.float64)
+        ) if restaurants else np.empty(0)
+
+        ranked = [(float(d), r) for d, r in zip(distances, restaurants) if d <= inputs.Radius]
+        # Same ordering (and id tiebreak) as the MongoDB pipeline, so cursors stay valid
+        if inputs.Text:
+            ranked.sort(key=lambda x: (-(x[1].score or 0.0), x[0], x[1].id))
+        else:
+            ranked.sort(key=lambda x: (x[0], -x[1].rating, x[1].id))
+        ranked = ranked[:inputs.Limit]
+
+        # Anything missing from the entry is farther than CompleteRadius - offset from the true point
+        covered = entry.CompleteRadius - offset
+        if inputs.Radius > covered and (
+            inputs.Text or len(ranked) < inputs.Limit or ranked[-1][0] >= covered
+        ):
+            return None
+
+        return [r.model_copy(update={"distance": d, "distance_km": d / 1000}) for d, r in ranked]
+
+    async def __mongo_search(self, inputs: MongoDBSearchInputSchema,
+                             deadline: Optional[MongoDBDeadline] = None,
+                             strategy: Optional[MongoDBSearchStrategy] = None) -> MongoDBSearchResponse:
+        # Concurrent identical searches share one MongoDB aggregation (under the first caller's deadline,
+        # it is cancelled once every caller gave up)
+        key = (strategy,) + tuple(inputs.model_dump().items())
+        resp = await DataHandlers.__search_flights.Do(key, lambda: self.__mongo_handler.Search(inputs, deadline, strategy))
+        if resp.timed_out:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                                detail=f"The restaurant search took too long! The handler responses: {resp.error}")
+        if not resp.success:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail=f"Failed to perform restaurant search! The handler responses: {resp.error}")
+        return resp
+
+    async def __cached_mongo_search(self, inputs: MongoDBSearchInputSchema,
+                                    deadline: Optional[MongoDBDeadline] = None) -> MongoDBSearchResponse:
+        cache = DataHandlers.__search_cache
+        # Only first pages without facets are cached, the others go straight to MongoDB
+        if cache is None or inputs.Cursor or inputs.Facets:
+            return await self.__mongo_search(inputs, deadline)
+
+        # Entries are keyed on the strategy, and the search filling one runs that same strategy
+        strategy: MongoDBSearchStrategy = self.__mongo_handler.TextStrategy(inputs) if inputs.Text else "geo"
+        if strategy == "hybrid":
+            return await self.__cached_hybrid_search(inputs, deadline)
+        snapped = DataHandlers.__snap(inputs, strategy)
+        if snapped is None:
+            return await self.__mongo_search(inputs, deadline, strategy)
+
+        key, lat, lon, tier = snapped
+        entry = cache.Get(key)
+        if entry is None:
+            # Entries hold every field, so they answer any fieldset (and can be re-ranked by location)
+            restaurants = (await self.__mongo_search(inputs.model_copy(update={
+                "Latitude": lat, "Longitude": lon, "Radius": tier, "Limit": DATA_SEARCH_CACHE_FETCH_LIMIT,
+                "Fields": None
+            }), deadline, strategy)).restaurants
+            if len(restaurants) < DATA_SEARCH_CACHE_FETCH_LIMIT:
+                complete = tier
+            elif inputs.Text:
+                complete = 0.0 # Truncated by text score, not by distance
+            else:
+                complete = restaurants[-1].distance or 0.0
+            entry = _SearchCacheEntry(Latitude=lat, Longitude=lon, Restaurants=restaurants, CompleteRadius=complete)
+            cache.Put(key, entry)
+
+        result = DataHandlers.__from_cache(entry, inputs)
+        if result is None:
+            DataHandlers.__search_cache_bypasses += 1
+            return await self.__mongo_search(inputs, deadline, strategy)
+        return MongoDBSearchResponse(
+            success=True,
+            count=len(result),
+            query_info={"engine": "cache"},
+            restaurants=result,
+            next_cursor=NextSearchCursor(inputs, result)
+        )
+
+    async def __cached_hybrid_search(self, inputs: MongoDBSearchInputSchema,
+                                     deadline: Optional[MongoDBDeadline] = None) -> MongoDBSearchResponse:
+        """
+        A hybrid text search page, from the cache if the same page was searched before. Hybrid scores
+        depend on the exact focus point and radius (BM25 over the nearest candidates, blended with the
+        distance), so unlike `$text` pages, they can't be re-ranked from a snapped search.
+        """
+        cache = DataHandlers.__search_cache
+        key = DataHandlers.__exact_key(inputs)
+        entry = cache.Get(key)
+        if entry is None:
+            resp = await self.__mongo_search(inputs.model_copy(update={"Fields": None}), deadline, "hybrid")
+            cache.Put(key, _SearchCacheEntry(Latitude=inputs.Latitude, Longitude=inputs.Longitude,
+                                             Restaurants=resp.restaurants, CompleteRadius=inputs.Radius))
+            return resp
+        return MongoDBSearchResponse(
+            success=True,
+            count=len(entry.Restaurants),
+            query_info={"engine": "cache"},
+            restaurants=entry.Restaurants,
+            next_cursor=NextSearchCursor(inputs, entry.Restaurants, "hybrid")
+        )
+
+    @staticmethod
+    def __correct_query(text: Optional[str]) -> Optional[str]:
+        """The text with its misspelled words corrected by the restaurant store (as is if no store)."""
+        store = RestaurantStore.Get()
+        if not text or store is None:
+            return text
+        return store.CorrectQuery(text) or text
+
+    @staticmethod
+    def __search_inputs(focus_latitude: float, focus_longitude: float,
+                        filters: Optional[DataRestaurantFilter] = None,
+                        limit: Optional[int] = None,
+                        cursor: Optional[str] = None,
+                        facets: bool = False,
+                        fields: Optional[Tuple[str, ...]] = None) -> MongoDBSearchInputSchema:
         _filters = filters or DataRestaurantFilter()
-        inputs = MongoDBSearchInputSchema(
-            Text=_filters.Query,
+        # Corrected before any engine runs, so every engine (and the continuation tokens) sees the same text
+        return MongoDBSearchInputSchema(
+            Text=DataHandlers.__correct_query(_filters.Query),
             Latitude=focus_latitude,
             Longitude=focus_longitude,
             Radius=_filters.Radius or DATA_DEFAULT_SEARCH_RADIUS,
@@ -36,11 +420,356 @@ class DataHandlers:
             Category=_filters.Category,
             Province=_filters.Province,
             District=_filters.District,
-            Limit=limit or DATA_DEFAULT_SEARCH_LIMIT
+            Limit=limit or DATA_DEFAULT_SEARCH_LIMIT,
+            Cursor=cursor,
+            Facets=facets,
+            Fields=fields
+        )
+
+    @staticmethod
+    async def __unless_disconnected(search: Awaitable[_T], disconnected: Optional[DataDisconnectCheck]) -> _T:
+        """
+        Await a search, cancelling it (and so its MongoDB aggregation) if the client disconnects first.
+
+        Raises:
+            HTTPException: DATA_CLIENT_CLOSED_REQUEST if the client disconnected.
+        """
+        if disconnected is None:
+            return await search
+
+        async def until_disconnected():
+            while not await disconnected():
+                await asyncio.sleep(DataHandlers.__disconnect_poll_interval)
+
+        task = asyncio.ensure_future(search)
+        watcher = asyncio.ensure_future(until_disconnected())
+        try:
+            await asyncio.wait((task, watcher), return_when=asyncio.FIRST_COMPLETED)
+            if task.done():
+                return task.result()
+            raise HTTPException(status_code=DATA_CLIENT_CLOSED_REQUEST, detail="The client disconnected!")
+        finally:
+            watcher.cancel()
+            if not task.done():
+                task.cancel()
+
+    async def RestaurantSearchPage(self, focus_latitude: float,
+                                   focus_longitude: float,
+                                   filters: Optional[DataRestaurantFilter] = None,
+                                   limit: Optional[int] = None,
+                                   cursor: Optional[str] = None,
+                                   facets: bool = False,
+                                   disconnected: Optional[DataDisconnectCheck] = None,
+                                   rows: bool = False,
+                                   fields: Optional[Tuple[str, ...]] = None) -> DataRestaurantSearchPage:
+        """
+        Search one page of restaurants.
+
+        Args:
+            focus_latitude (float): The focus point latitude.
+            focus_longitude (float): The focus point longitude.
+            filters (Optional[DataRestaurantFilter]): The search filters.
+            limit (Optional[int]): The page size.
+            cursor (Optional[str]): The continuation token of the previous page, None for the first page.
+            facets (bool): Also count all the matches and their category/district/rating facets.
+            disconnected (Optional[DataDisconnectCheck]): Whether the client gave up, a MongoDB search
+                is then cancelled (and its server operation killed).
+            rows (bool): Return the restaurants as serialized response rows (`Rows`) rather than models,
+                for a response serialized once (`DataRestaurantSearchResponseSchema.DumpRows`).
+            fields (Optional[Tuple[str, ...]]): With `rows`, only fetch and return these fields
+                (MONGODB_SEARCH_FIELDS), None for every field.
+
+        Returns:
+            DataRestaurantSearchPage: The restaurants, the continuation token of the next page and the facets.
+
+        Raises:
+            HTTPException: 400 for an invalid cursor, 504 if MongoDB missed the deadline,
+                DATA_CLIENT_CLOSED_REQUEST if the client disconnected, 500 on other failures.
+        """
+        deadline = MongoDBDeadline(DataHandlers.__deadline_slo, DataHandlers.__deadline_min_budget) \
+            if DataHandlers.__deadline_slo is not None else None
+        inputs = DataHandlers.__search_inputs(focus_latitude, focus_longitude, filters, limit, cursor, facets,
+                                              fields if rows else None)
+        try:
+            DecodeSearchCursor(inputs)
+        except MongoDBInvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        store = RestaurantStore.Get()
+        if store is not None and store.CanServe(inputs):
+            resp = store.Search(inputs)
+            if not resp.success:
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                    detail=f"Failed to perform restaurant search! The handler responses: {resp.error}")
+        else:
+            if inputs.Text and inputs.Cursor:
+                try:
+                    # A text page of the store (store unloaded since) can't be continued with other scores
+                    self.__mongo_handler.TextStrategy(inputs)
+                except MongoDBInvalidCursorError as e:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            resp = await DataHandlers.__unless_disconnected(self.__cached_mongo_search(inputs, deadline), disconnected)
+
+        query = filters.Query if filters is not None else None
+        corrected = inputs.Text if inputs.Text != query else None
+        if corrected is not None:
+            resp.query_info.update({"original_text": query, "corrected_text": corrected})
+            Logger.LogDebug(f"DataHandlers: Corrected search query '{query}' to '{corrected}'")
+
+        return DataRestaurantSearchPage(
+            Restaurants=[DataRestaurantResponseModel.FromMongoDB(m) for m in resp.restaurants] if not rows else [],
+            Rows=[DataRestaurantResponseModel.RowFromMongoDB(m, inputs.Fields) for m in resp.restaurants] if rows else None,
+            NextCursor=resp.next_cursor,
+            Total=resp.total,
+            Facets=DataRestaurantFacetsModel.FromMongoDB(resp.facets) if resp.facets is not None else None,
+            CorrectedQuery=corrected
+        )
+
+    async def RestaurantSearch(self, focus_latitude: float,
+                               focus_longitude: float,
+                               filters: Optional[DataRestaurantFilter] = None,
+                               limit: Optional[int] = None,
+                               disconnected: Optional[DataDisconnectCheck] = None) -> DataRestaurantSearchResult:
+        page = await self.RestaurantSearchPage(focus_latitude, focus_longitude, filters, limit,
+                                               disconnected=disconnected)
+        return page.Restaurants
+
+    async def RestaurantSearchStream(self, focus_latitude: float,
+                                     focus_longitude: float,
+                                     filters: Optional[DataRestaurantFilter] = None,
+                                     limit: Optional[int] = None) -> AsyncIterator[DataRestaurantResponseModel]:
+        """
+        Search restaurants as a stream, for results too large to buffer (map / export clients).
+
+        The first batch is fetched before returning, so a failing search still raises a
+        HTTP 500 (504 past the deadline) before anything is sent; later database errors end the
+        iteration with that error. With a search deadline, the whole stream gets
+        DATA_STREAM_DEADLINE_SCALE times the search SLO of server time.
+
+        Args:
+            focus_latitude (float): The focus point latitude.
+            focus_longitude (float): The focus point longitude.
+            filters (Optional[DataRestaurantFilter]): The search filters.
+            limit (Optional[int]): The maximum number of restaurants (default DATA_DEFAULT_STREAM_LIMIT).
+
+        Returns:
+            AsyncIterator[DataRestaurantResponseModel]: The restaurants, in the same order as `RestaurantSearch`.
+        """
+        deadline = MongoDBDeadline(DataHandlers.__deadline_slo * DATA_STREAM_DEADLINE_SCALE,
+                                   DataHandlers.__deadline_min_budget) \
+            if DataHandlers.__deadline_slo is not None else None
+        inputs = DataHandlers.__search_inputs(focus_latitude, focus_longitude, filters)
+        stream = self.__mongo_handler.SearchStream(inputs, limit or DATA_DEFAULT_STREAM_LIMIT,
+                                                   MONGODB_STREAM_BATCH_SIZE, deadline)
+        try:
+            first = await anext(stream, None)
+        except (ExecutionTimeout, MongoDBDeadlineExceededError) as e:
+            await stream.aclose()
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                                detail=f"The restaurant search took too long! The handler responses: {e}")
+        except Exception as e:
+            await stream.aclose()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail=f"Failed to perform restaurant search! The handler responses: {e}")
+
+        async def restaurants() -> AsyncIterator[DataRestaurantResponseModel]:
+            try:
+                if first is None:
+                    return
+                yield DataRestaurantResponseModel.FromMongoDB(first)
+                async for restaurant in stream:
+                    yield DataRestaurantResponseModel.FromMongoDB(restaurant)
+            finally:
+                await stream.aclose()
+        return restaurants()
+
+    async def RestaurantBatchSearch(self, points: List[DataRestaurantSearchPoint],
+                                    dedupe: bool = False,
+                                    disconnected: Optional[DataDisconnectCheck] = None) -> List[DataRestaurantBatchPointResult]:
+        """
+        Search restaurants around several focus points concurrently (at most
+        DATA_BATCH_SEARCH_CONCURRENCY at a time), each point with its own filters.
+        A point whose search fails gets its error, the other points are still searched.
+
+        Args:
+            points (List[DataRestaurantSearchPoint]): The focus points.
+            dedupe (bool): Keep each restaurant only in the result of the nearest point
+                that found it (lowest index on ties), instead of in every overlapping result.
+            disconnected (Optional[DataDisconnectCheck]): Whether the client gave up, the pending
+                searches are then cancelled.
+
+        Returns:
+            List[DataRestaurantBatchPointResult]: The results, in the same order as `points`.
+
+        Raises:
+            HTTPException: DATA_CLIENT_CLOSED_REQUEST if the client disconnected.
+        """
+        semaphore = asyncio.Semaphore(DATA_BATCH_SEARCH_CONCURRENCY)
+
+        async def search(point: DataRestaurantSearchPoint) -> DataRestaurantBatchPointResult:
+            async with semaphore:
+                try:
+                    return DataRestaurantBatchPointResult(Restaurants=await self.RestaurantSearch(
+                        point.Latitude, point.Longitude, point.Filters, point.Limit
+                    ))
+                except HTTPException as e:
+                    return DataRestaurantBatchPointResult(ErrorCode=e.status_code, Error=str(e.detail))
+                except Exception as e:
+                    Logger.LogException(e, "DataHandlers: Failed to search a batch point")
+                    return DataRestaurantBatchPointResult(ErrorCode=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                                          Error="Failed to perform restaurant search!")
+
+        results = list(await DataHandlers.__unless_disconnected(
+            asyncio.gather(*(search(p) for p in points)), disconnected
+        ))
+        if not dedupe:
+            return results
+
+        owners = {}
+        for index, result in enumerate(results):
+            for restaurant in result.Restaurants:
+                distance = restaurant.Location.Distance if restaurant.Location.Distance is not None else math.inf
+                if restaurant.Id not in owners or distance < owners[restaurant.Id][0]:
+                    owners[restaurant.Id] = (distance, index)
+        return [result.model_copy(update={"Restaurants": [r for r in result.Restaurants if owners[r.Id][1] == index]})
+                for index, result in enumerate(results)]
+
+    async def RestaurantViewport(self, min_latitude: float, max_latitude: float,
+                                 min_longitude: float, max_longitude: float, zoom: int,
+                                 filters: Optional[DataRestaurantFilter] = None) -> DataRestaurantViewport:
+        """
+        Search the restaurants of a map viewport. Returns the restaurants at high zoom (or if
+        there are few of them), else grid clusters, so the payload stays bounded at every zoom.
+
+        Args:
+            min_latitude (float): The south bound of the viewport.
+            max_latitude (float): The north bound of the viewport.
+            min_longitude (float): The west bound of the viewport.
+            max_longitude (float): The east bound of the viewport.
+            zoom (int): The map zoom level.
+            filters (Optional[DataRestaurantFilter]): The search filters (`Query` and `Radius` are ignored).
+
+        Returns:
+            DataRestaurantViewport: The restaurants or clusters of the viewport.
+        """
+        _filters = filters or DataRestaurantFilter()
+        try:
+            inputs = MongoDBViewportInputSchema(
+                MinLatitude=min_latitude,
+                MaxLatitude=max_latitude,
+                MinLongitude=min_longitude,
+                MaxLongitude=max_longitude,
+                Zoom=zoom,
+                MinRating=_filters.MinRating,
+                Category=_filters.Category,
+                Province=_filters.Province,
+                District=_filters.District
+            )
+        except ValidationError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                detail=f"Invalid viewport! {e.errors()[0]['msg']}")
+
+        store = RestaurantStore.Get()
+        resp: MongoDBViewportResponse = store.Viewport(inputs) if store is not None \
+            else await self.__mongo_handler.Viewport(inputs)
+        if not resp.success:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail=f"Failed to perform restaurant viewport search! The handler responses: {resp.error}")
+
+        return DataRestaurantViewport(
+            Total=resp.total,
+            Clustered=resp.clustered,
+            Truncated=resp.truncated,
+            Restaurants=[DataRestaurantResponseModel.FromMongoDB(m) for m in resp.restaurants],
+            Clusters=[DataRestaurantClusterModel.FromMongoDB(c) for c in resp.clusters]
+        )
+
+    @staticmethod
+    def RestaurantAutocomplete(query: str, focus_latitude: Optional[float] = None,
+                               focus_longitude: Optional[float] = None,
+                               limit: int = DATA_DEFAULT_AUTOCOMPLETE_LIMIT) -> List[DataRestaurantSuggestionModel]:
+        """
+        Autocomplete a restaurant search from the in-process store (never queries MongoDB).
+
+        Args:
+            query (str): The text typed so far.
+            focus_latitude (Optional[float]): The focus point latitude, to prefer nearby restaurants.
+            focus_longitude (Optional[float]): The focus point longitude, to prefer nearby restaurants.
+            limit (int): The maximum number of suggestions.
+
+        Returns:
+            List[DataRestaurantSuggestionModel]: The dish keywords, then the restaurants.
+        """
+        if (focus_latitude is None) != (focus_longitude is None):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                detail="The focus point needs both a latitude and a longitude!")
+        store = RestaurantStore.Get()
+        if store is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="The restaurant autocomplete is not available!")
+        return [DataRestaurantSuggestionModel.FromSearch(s)
+                for s in store.Autocomplete(query, focus_latitude, focus_longitude, limit)]
+
+    @staticmethod
+    def __density_tiles(zoom: int) -> DensityTileSet:
+        tiles = DensityTileSet.Get()
+        if tiles is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="The restaurant density tiles are not available!")
+        if not tiles.MinZoom <= zoom <= tiles.MaxZoom:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"No density tile at zoom {zoom} (zoom {tiles.MinZoom}-{tiles.MaxZoom} only)!")
+        return tiles
+
+    @staticmethod
+    def RestaurantDensityTileETag(zoom: int, x: int, y: int) -> str:
+        """The ETag of a density tile, without reading it (for conditional requests)."""
+        return DataHandlers.__density_tiles(zoom).TileETag(zoom, x, y)
+
+    @staticmethod
+    async def RestaurantDensityTile(zoom: int, x: int, y: int) -> DensityTile:
+        """
+        Get a precomputed restaurant density tile (never queries MongoDB).
+
+        Args:
+            zoom (int): The tile zoom level.
+            x (int): The tile column.
+            y (int): The tile row.
+
+        Returns:
+            DensityTile: The GeoJSON tile and its ETag.
+        """
+        return await DataHandlers.__density_tiles(zoom).Tile(zoom, x, y)
+
+    async def RestaurantTopRated(self, province: str, district: str,
+                                 category: Optional[str] = None,
+                                 min_rating: Optional[float] = None,
+                                 limit: Optional[int] = None) -> DataRestaurantSearchResult:
+        """
+        Get the top-rated restaurants of a district, from the materialized view when it can
+        answer (enabled, and `limit` within its size), else from the restaurants collection.
+
+        Args:
+            province (str): The province.
+            district (str): The district.
+            category (Optional[str]): The category filter.
+            min_rating (Optional[float]): The minimum rating (default DATA_DEFAULT_TOP_RATED_MIN_RATING).
+            limit (Optional[int]): The maximum number of restaurants.
+
+        Returns:
+            DataRestaurantSearchResult: The restaurants, best rated first.
+        """
+        _limit = limit or DATA_DEFAULT_SEARCH_LIMIT
+        materialized = DataHandlers.__top_rated_size is not None and _limit <= DataHandlers.__top_rated_size
+        resp = await self.__mongo_handler.GetTopRatedByDistrict(
+            province=province,
+            district=district,
+            category=category,
+            min_rating=min_rating if min_rating is not None else DATA_DEFAULT_TOP_RATED_MIN_RATING,
+            limit=_limit,
+            materialized=materialized
         )
-        resp = await self.__mongo_handler.Search(inputs)
         if not resp.success:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                                detail=f"Failed to perform search from MongoDB Handler! The handler responses: {resp.error}")
-        
-        return [DataRestaurantResponseModel.FromMongoDB(m) for m in resp.restaurants]
\ No newline at end of file
+                                detail=f"Failed to get top-rated restaurants! The handler responses: {resp.error}")
+        return [DataRestaurantResponseModel.FromMongoDB(m) for m in resp.restaurants]
@@ -8,7 +8,7 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt, ExpiredSignatureError
 from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi.responses import JSONResponse
-from utils import Logger
+from utils import Logger, Config
 
 # for Vietmap
 from fastapi import Request, HTTPException
@@ -71,4 +71,27 @@ async def VerifyAccessToken(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Token verification failed: {str(e)}",
-        )
\ No newline at end of file
+        )
+
+async def VerifyAdminAccessToken(payload: Dict = Depends(VerifyAccessToken)) -> Dict:
+    """
+    Verify the JWT access token (see `VerifyAccessToken`) and that it belongs to an operator:
+    the Supabase service role, or a user whose `app_metadata.role` is the configured admin role
+    (`app_metadata` can only be written with the service role, not by the user).
+
+    Args:
+        payload: The decoded JWT payload.
+
+    Returns:
+        Dict: The decoded JWT payload.
+
+    Raises:
+        HTTPException: 401 as `VerifyAccessToken`, 403 if the token is not an operator's.
+    """
+    app_metadata = payload.get("app_metadata") or {}
+    if payload.get("role") == "service_role" or app_metadata.get("role") == Config.Get().Security.AdminRole:
+        return payload
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="This endpoint is restricted to administrators",
+    )
@@ -13,12 +13,25 @@ from handlers.maps import (
 )
 from handlers.data import (
     DataHandlers,
+    DataDisconnectCheck,
     DataRestaurantSearchResult,
+    DataRestaurantSearchPage,
+    DataRestaurantSearchPoint,
+    DataRestaurantViewport,
     DataRestaurantFilter
 )
+from schemas.data import (
+    DataRestaurantResponseModel,
+    DataRestaurantBatchSearchRequestModel,
+    DataRestaurantBatchResultModel,
+    DataRestaurantSuggestionModel,
+    DataStatsModel
+)
 from handlers.ai import AIHandler
+from core.search import DensityTile
+from schemas.errors import ErrorDetailSchema
 from schemas.ai import AIGenerateRequestSchema, AIMessageSchema, AIAvailableModelInfoSchema
-from typing import List
+from typing import List, Tuple, AsyncIterator
 
 class QuerySystem:
     """The centralized backend query system."""
@@ -164,9 +177,44 @@ class QuerySystem:
                                    category: Optional[str] = None,
                                    province: Optional[str] = None,
                                    district: Optional[str] = None,
-                                   limit: Optional[int] = None) -> DataRestaurantSearchResult:
+                                   limit: Optional[int] = None,
+                                   cursor: Optional[str] = None,
+                                   facets: bool = False,
+                                   disconnected: Optional[DataDisconnectCheck] = None,
+                                   rows: bool = False,
+                                   fields: Optional[Tuple[str, ...]] = None) -> DataRestaurantSearchPage:
+        handler = DataHandlers()
+        return await handler.RestaurantSearchPage(
+            focus_latitude=focus_latitude,
+            focus_longitude=focus_longitude,
+            filters=DataRestaurantFilter(
+                Query=query,
+                Radius=radius,
+                MinRating=min_rating,
+                Category=category,
+                Province=province,
+                District=district
+            ),
+            limit=limit,
+            cursor=cursor,
+            facets=facets,
+            disconnected=disconnected,
+            rows=rows,
+            fields=fields
+        )
+        
+    @staticmethod
+    async def DataRestaurantSearchStream(focus_latitude: float,
+                                         focus_longitude: float,
+                                         query: Optional[str] = None,
+                                         radius: Optional[PositiveFloat] = None,
+                                         min_rating: Optional[float] = None,
+                                         category: Optional[str] = None,
+                                         province: Optional[str] = None,
+                                         district: Optional[str] = None,
+                                         limit: Optional[int] = None) -> AsyncIterator[DataRestaurantResponseModel]:
         handler = DataHandlers()
-        return await handler.RestaurantSearch(
+        return await handler.RestaurantSearchStream(
             focus_latitude=focus_latitude,
             focus_longitude=focus_longitude,
             filters=DataRestaurantFilter(
@@ -180,6 +228,103 @@ class QuerySystem:
             limit=limit
         )
         
+    @staticmethod
+    async def DataRestaurantBatchSearch(payload: DataRestaurantBatchSearchRequestModel,
+                                        disconnected: Optional[DataDisconnectCheck] = None) -> List[DataRestaurantBatchResultModel]:
+        handler = DataHandlers()
+        results = await handler.RestaurantBatchSearch(
+            points=[
+                DataRestaurantSearchPoint(
+                    Latitude=point.Latitude,
+                    Longitude=point.Longitude,
+                    Filters=DataRestaurantFilter(
+                        Query=point.Query.strip() if point.Query else None,
+                        Radius=point.Radius,
+                        MinRating=point.MinRating,
+                        Category=point.Category,
+                        Province=point.Province,
+                        District=point.District
+                    ),
+                    Limit=point.Limit
+                )
+                for point in payload.Points
+            ],
+            dedupe=payload.Dedupe,
+            disconnected=disconnected
+        )
+        return [
+            DataRestaurantBatchResultModel(
+                Index=i,
+                Restaurants=r.Restaurants,
+                Error=ErrorDetailSchema(code=r.ErrorCode, detail=r.Error or "") if r.ErrorCode is not None else None
+            )
+            for i, r in enumerate(results)
+        ]
+        
+    @staticmethod
+    async def DataRestaurantViewport(min_latitude: float,
+                                     max_latitude: float,
+                                     min_longitude: float,
+                                     max_longitude: float,
+                                     zoom: int,
+                                     min_rating: Optional[float] = None,
+                                     category: Optional[str] = None,
+                                     province: Optional[str] = None,
+                                     district: Optional[str] = None) -> DataRestaurantViewport:
+        handler = DataHandlers()
+        return await handler.RestaurantViewport(
+            min_latitude=min_latitude,
+            max_latitude=max_latitude,
+            min_longitude=min_longitude,
+            max_longitude=max_longitude,
+            zoom=zoom,
+            filters=DataRestaurantFilter(
+                MinRating=min_rating,
+                Category=category,
+                Province=province,
+                District=district
+            )
+        )
+        
+    @staticmethod
+    async def DataRestaurantTopRated(province: str,
+                                     district: str,
+                                     category: Optional[str] = None,
+                                     min_rating: Optional[float] = None,
+                                     limit: Optional[int] = None) -> DataRestaurantSearchResult:
+        handler = DataHandlers()
+        return await handler.RestaurantTopRated(
+            province=province,
+            district=district,
+            category=category,
+            min_rating=min_rating,
+            limit=limit
+        )
+        
+    @staticmethod
+    def DataRestaurantDensityTileETag(zoom: int, x: int, y: int) -> str:
+        return DataHandlers.RestaurantDensityTileETag(zoom, x, y)
+        
+    @staticmethod
+    async def DataRestaurantDensityTile(zoom: int, x: int, y: int) -> DensityTile:
+        return await DataHandlers.RestaurantDensityTile(zoom, x, y)
+        
+    @staticmethod
+    def DataRestaurantAutocomplete(query: str,
+                                   focus_latitude: Optional[float] = None,
+                                   focus_longitude: Optional[float] = None,
+                                   limit: Optional[int] = None) -> List[DataRestaurantSuggestionModel]:
+        return DataHandlers.RestaurantAutocomplete(
+            query=query,
+            focus_latitude=focus_latitude,
+            focus_longitude=focus_longitude,
+            **({"limit": limit} if limit is not None else {})
+        )
+        
+    @staticmethod
+    def DataStats() -> DataStatsModel:
+        return DataHandlers.Stats()
+        
     @staticmethod
     async def AIGenerate(model_name: str, payload: AIGenerateRequestSchema) -> AIMessageSchema:
         return await AIHandler.Generate(model_name=model_name, payload=payload)
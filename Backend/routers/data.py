@@ -1,12 +1,24 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Request
-from middleware.auth import VerifyAccessToken
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Header
+from fastapi.responses import StreamingResponse, Response
+from middleware.auth import VerifyAccessToken, VerifyAdminAccessToken
 from middleware.rate_limit import limiter
 from query import QuerySystem
-from schemas import CollectionsResponseSchema
-from schemas.errors import ErrorResponseSchema
-from schemas.data import DataRestaurantResponseModel
+from schemas import ObjectResponseSchema, CollectionsResponseSchema
+from schemas.errors import ErrorResponseSchema, ErrorDetailSchema
+from schemas.data import (
+    DataRestaurantResponseModel,
+    DataRestaurantSearchResponseSchema,
+    DataRestaurantViewportResponseSchema,
+    DataRestaurantBatchSearchRequestModel,
+    DataRestaurantBatchResultModel,
+    DataRestaurantSuggestionModel,
+    DataStatsModel
+)
+from core.mongodb import MONGODB_STREAM_MAX_LIMIT, MONGODB_VIEWPORT_MAX_MARKERS, MONGODB_VIEWPORT_MARKER_MIN_ZOOM, MONGODB_SEARCH_FIELDS
+from core.search import DENSITY_TILE_MEDIA_TYPE
+from utils import Logger
 from pydantic import Field, StringConstraints, PositiveFloat, PositiveInt
-from typing import Annotated, Optional
+from typing import Annotated, Optional, AsyncIterator
 
 router = APIRouter(prefix="/data", tags=["Data Informations"])
 
@@ -15,15 +27,27 @@ LongitudeConstraint = Annotated[float, Field(le=180, ge=-180)]
 QueryTextConstraint = Annotated[str, StringConstraints(strip_whitespace=True)]
 RatingConstraint = Annotated[float, Field(ge=0, le=5)]
 LimitConstraint = Annotated[int, Field(ge=1, le=100)]
+StreamLimitConstraint = Annotated[int, Field(ge=1, le=MONGODB_STREAM_MAX_LIMIT)]
+ZoomConstraint = Annotated[int, Field(ge=0, le=22)]
+TileIndexConstraint = Annotated[int, Field(ge=0)]
+AutocompleteLimitConstraint = Annotated[int, Field(ge=1, le=20)]
+_FIELD_NAMES = "|".join(MONGODB_SEARCH_FIELDS)
+FieldsConstraint = Annotated[str, StringConstraints(strip_whitespace=True, pattern=rf"^({_FIELD_NAMES})(,({_FIELD_NAMES}))*$")]
 
 @router.get(
     "/restaurant/search", name="Restaurant Search", status_code=status.HTTP_200_OK,
-    response_model=CollectionsResponseSchema[DataRestaurantResponseModel],
-    description="Performing restaurant search in the database with the given filters and input",
+    response_model=DataRestaurantSearchResponseSchema,
+    description="Performing restaurant search in the database with the given filters and input. "
+                "Pass the returned `next_cursor` as `cursor` (with the same filters) to get the next page. "
+                "With `facets`, the response also has the `total` number of matches and their category, "
+                "district and rating counts. With `fields`, each restaurant only has the listed fields "
+                "(the `location` ones nested in `location`), and only those are fetched from the database.",
     responses={
+        status.HTTP_400_BAD_REQUEST : {"model" : ErrorResponseSchema },
         status.HTTP_401_UNAUTHORIZED : {"model" : ErrorResponseSchema },
         status.HTTP_422_UNPROCESSABLE_ENTITY : { "model" : ErrorResponseSchema },
         status.HTTP_500_INTERNAL_SERVER_ERROR : { "model" : ErrorResponseSchema },
+        status.HTTP_504_GATEWAY_TIMEOUT : { "model" : ErrorResponseSchema },
     }
 )
 @limiter.limit("20/minute")
@@ -37,8 +61,185 @@ async def restaurant_search(request: Request,
                             province: Annotated[Optional[QueryTextConstraint], Field(description="The province text query to filter")] = None,
                             district: Annotated[Optional[QueryTextConstraint], Field(description="The district text query to filter")] = None,
                             limit: Annotated[LimitConstraint, Field(description="The maximum number of result to return")] = 10,
+                            cursor: Annotated[Optional[str], Field(description="The next_cursor of the previous page")] = None,
+                            facets: Annotated[bool, Field(description="Also return the total number of matches and their facet counts")] = False,
+                            fields: Annotated[Optional[FieldsConstraint], Field(description="Only return these comma-separated fields, e.g. `id,name,rating,distance`, "
+                                                                                            f"among: {', '.join(MONGODB_SEARCH_FIELDS)}")] = None,
                             _ = Depends(VerifyAccessToken)):
-    result = await QuerySystem.DataRestaurantSearch(
+    page = await QuerySystem.DataRestaurantSearch(
+        focus_latitude=focus_lat,
+        focus_longitude=focus_lon,
+        query=query,
+        radius=radius,
+        min_rating=min_rating,
+        category=category,
+        province=province,
+        district=district,
+        limit=limit,
+        cursor=cursor,
+        facets=facets,
+        disconnected=request.is_disconnected,
+        rows=True,
+        fields=tuple(dict.fromkeys(fields.split(","))) if fields else None
+    )
+    # The rows are already in the response shape, serialized once (the response model only documents them)
+    return Response(content=DataRestaurantSearchResponseSchema.DumpRows(page.Rows or [], page.NextCursor, page.Total,
+                                                                        page.Facets, page.CorrectedQuery),
+                    media_type="application/json")
+
+@router.get(
+    "/restaurant/autocomplete", name="Restaurant Autocomplete", status_code=status.HTTP_200_OK,
+    response_model=CollectionsResponseSchema[DataRestaurantSuggestionModel],
+    description="Autocomplete a restaurant search from our own restaurants (accents are optional): "
+                "the matching dish keywords first (`kind` 'keyword'), then the restaurant names "
+                "(`kind` 'restaurant'), best rated first and nearest first if a focus point is given.",
+    responses={
+        status.HTTP_401_UNAUTHORIZED : {"model" : ErrorResponseSchema },
+        status.HTTP_422_UNPROCESSABLE_ENTITY : { "model" : ErrorResponseSchema },
+        status.HTTP_503_SERVICE_UNAVAILABLE : { "model" : ErrorResponseSchema },
+    }
+)
+@limiter.limit("120/minute")
+async def restaurant_autocomplete(request: Request,
+                                  query: Annotated[QueryTextConstraint, Field(description="The text typed so far (will strip whitespace)")],
+                                  focus_lat: Annotated[Optional[LatitudeConstraint], Field(description="The focus point latitude (if given, must also provide longitude)")] = None,
+                                  focus_lon: Annotated[Optional[LongitudeConstraint], Field(description="The focus point longitude (if given, must also provide latitude)")] = None,
+                                  limit: Annotated[AutocompleteLimitConstraint, Field(description="The maximum number of suggestions")] = 8,
+                                  _ = Depends(VerifyAccessToken)):
+    result = QuerySystem.DataRestaurantAutocomplete(
+        query=query,
+        focus_latitude=focus_lat,
+        focus_longitude=focus_lon,
+        limit=limit
+    )
+    return CollectionsResponseSchema[DataRestaurantSuggestionModel](data=result)
+
+@router.get(
+    "/restaurant/viewport", name="Restaurant Viewport", status_code=status.HTTP_200_OK,
+    response_model=DataRestaurantViewportResponseSchema,
+    description="Performing restaurant search in a map viewport (bounding box) at a zoom level. "
+                f"Returns the restaurants themselves (`data`, best rated first) at zoom {MONGODB_VIEWPORT_MARKER_MIN_ZOOM}+ "
+                f"or when there are at most {MONGODB_VIEWPORT_MAX_MARKERS} of them, else grid `clusters` "
+                "(count, centroid and best rating, most populated first) with `clustered` set. "
+                "`truncated` is set when some restaurants/clusters were left out.",
+    responses={
+        status.HTTP_401_UNAUTHORIZED : {"model" : ErrorResponseSchema },
+        status.HTTP_422_UNPROCESSABLE_ENTITY : { "model" : ErrorResponseSchema },
+        status.HTTP_500_INTERNAL_SERVER_ERROR : { "model" : ErrorResponseSchema },
+    }
+)
+@limiter.limit("60/minute")
+async def restaurant_viewport(request: Request,
+                              min_lat: Annotated[LatitudeConstraint, Field(description="The south bound of the viewport")],
+                              min_lon: Annotated[LongitudeConstraint, Field(description="The west bound of the viewport")],
+                              max_lat: Annotated[LatitudeConstraint, Field(description="The north bound of the viewport")],
+                              max_lon: Annotated[LongitudeConstraint, Field(description="The east bound of the viewport")],
+                              zoom: Annotated[ZoomConstraint, Field(description="The map zoom level")],
+                              min_rating: Annotated[RatingConstraint, Field(description="The minimum rating score to filter")] = 0,
+                              category: Annotated[Optional[QueryTextConstraint], Field(description="The category text query to filter")] = None,
+                              province: Annotated[Optional[QueryTextConstraint], Field(description="The province text query to filter")] = None,
+                              district: Annotated[Optional[QueryTextConstraint], Field(description="The district text query to filter")] = None,
+                              _ = Depends(VerifyAccessToken)):
+    viewport = await QuerySystem.DataRestaurantViewport(
+        min_latitude=min_lat,
+        max_latitude=max_lat,
+        min_longitude=min_lon,
+        max_longitude=max_lon,
+        zoom=zoom,
+        min_rating=min_rating,
+        category=category,
+        province=province,
+        district=district
+    )
+    return DataRestaurantViewportResponseSchema(data=viewport.Restaurants, total=viewport.Total,
+                                                clustered=viewport.Clustered, truncated=viewport.Truncated,
+                                                clusters=viewport.Clusters)
+
+@router.get(
+    "/restaurant/top-rated", name="Restaurant Top Rated", status_code=status.HTTP_200_OK,
+    response_model=CollectionsResponseSchema[DataRestaurantResponseModel],
+    description="Get the top-rated restaurants of a district (optionally of a category), best rated first. "
+                "Served from a periodically refreshed materialized view, so very recent rating changes "
+                "may take a few minutes to show up.",
+    responses={
+        status.HTTP_401_UNAUTHORIZED : {"model" : ErrorResponseSchema },
+        status.HTTP_422_UNPROCESSABLE_ENTITY : { "model" : ErrorResponseSchema },
+        status.HTTP_500_INTERNAL_SERVER_ERROR : { "model" : ErrorResponseSchema },
+    }
+)
+@limiter.limit("30/minute")
+async def restaurant_top_rated(request: Request,
+                               province: Annotated[QueryTextConstraint, Field(description="The province")],
+                               district: Annotated[QueryTextConstraint, Field(description="The district")],
+                               category: Annotated[Optional[QueryTextConstraint], Field(description="The category to filter")] = None,
+                               min_rating: Annotated[RatingConstraint, Field(description="The minimum rating score to filter")] = 4.0,
+                               limit: Annotated[LimitConstraint, Field(description="The maximum number of result to return")] = 10,
+                               _ = Depends(VerifyAccessToken)):
+    result = await QuerySystem.DataRestaurantTopRated(
+        province=province,
+        district=district,
+        category=category,
+        min_rating=min_rating,
+        limit=limit
+    )
+    return CollectionsResponseSchema(data=result)
+
+@router.post(
+    "/restaurant/search/batch", name="Restaurant Batch Search", status_code=status.HTTP_200_OK,
+    response_model=CollectionsResponseSchema[DataRestaurantBatchResultModel],
+    description="Performing restaurant search around several focus points (e.g. trip waypoints) in one call, "
+                "each point with its own filters. The results are keyed by the point index in the request. "
+                "A point whose search fails (e.g. 504 past the deadline) gets an `error` and no restaurants, "
+                "the other points are still returned.",
+    responses={
+        status.HTTP_401_UNAUTHORIZED : {"model" : ErrorResponseSchema },
+        status.HTTP_422_UNPROCESSABLE_ENTITY : { "model" : ErrorResponseSchema },
+    }
+)
+@limiter.limit("10/minute")
+async def restaurant_batch_search(request: Request,
+                                  body: DataRestaurantBatchSearchRequestModel,
+                                  _ = Depends(VerifyAccessToken)):
+    result = await QuerySystem.DataRestaurantBatchSearch(payload=body, disconnected=request.is_disconnected)
+    return CollectionsResponseSchema(data=result)
+
+async def _ndjson_lines(restaurants: AsyncIterator[DataRestaurantResponseModel]) -> AsyncIterator[str]:
+    """Serialize the restaurants as NDJSON, a failure mid-stream ends it with an error line."""
+    try:
+        async for restaurant in restaurants:
+            yield restaurant.model_dump_json(by_alias=True) + "\n"
+    except Exception as e:
+        Logger.LogException(e, "Restaurant search stream failed")
+        error = ErrorResponseSchema(data=[ErrorDetailSchema(code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                                            detail="The restaurant search stream failed!")])
+        yield error.model_dump_json() + "\n"
+
+@router.get(
+    "/restaurant/search/stream", name="Restaurant Search Stream", status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    description="Same as Restaurant Search, but streams up to thousands of restaurants as newline-delimited JSON "
+                "(`application/x-ndjson`, one restaurant per line). If the search fails mid-stream, "
+                "the last line is an error response.",
+    responses={
+        status.HTTP_200_OK : {"content" : {"application/x-ndjson" : {}}},
+        status.HTTP_401_UNAUTHORIZED : {"model" : ErrorResponseSchema },
+        status.HTTP_422_UNPROCESSABLE_ENTITY : { "model" : ErrorResponseSchema },
+        status.HTTP_500_INTERNAL_SERVER_ERROR : { "model" : ErrorResponseSchema },
+    }
+)
+@limiter.limit("10/minute")
+async def restaurant_search_stream(request: Request,
+                                   focus_lat: Annotated[LatitudeConstraint, Field(description="The focus point latitude to search")],
+                                   focus_lon: Annotated[LongitudeConstraint, Field(description="The focus point longitude to search")],
+                                   query: Annotated[Optional[QueryTextConstraint], Field(description="The text query to filter")] = None,
+                                   radius: Annotated[PositiveFloat, Field(description="The search radius from the focus point, in meters")] = 5000,
+                                   min_rating: Annotated[RatingConstraint, Field(description="The minimum rating score to filter")] = 0,
+                                   category: Annotated[Optional[QueryTextConstraint], Field(description="The category text query to filter")] = None,
+                                   province: Annotated[Optional[QueryTextConstraint], Field(description="The province text query to filter")] = None,
+                                   district: Annotated[Optional[QueryTextConstraint], Field(description="The district text query to filter")] = None,
+                                   limit: Annotated[StreamLimitConstraint, Field(description="The maximum number of result to return")] = 1000,
+                                   _ = Depends(VerifyAccessToken)):
+    restaurants = await QuerySystem.DataRestaurantSearchStream(
         focus_latitude=focus_lat,
         focus_longitude=focus_lon,
         query=query,
@@ -49,4 +250,55 @@ async def restaurant_search(request: Request,
         district=district,
         limit=limit
     )
-    return CollectionsResponseSchema(data=result)
\ No newline at end of file
+    return StreamingResponse(_ndjson_lines(restaurants), media_type="application/x-ndjson")
+
+@router.get(
+    "/restaurant/tiles/{z}/{x}/{y}", name="Restaurant Density Tile", status_code=status.HTTP_200_OK,
+    response_class=Response,
+    description="Get a precomputed z/x/y restaurant density tile for the heatmap layer, as GeoJSON "
+                "(one point per non-empty 16px cell, with the restaurant `count` and `avg_rating`). "
+                "Tiles have a strong `ETag`, send it back as `If-None-Match` to get a 304 if unchanged.",
+    responses={
+        status.HTTP_200_OK : {"content" : {DENSITY_TILE_MEDIA_TYPE : {}}},
+        status.HTTP_304_NOT_MODIFIED : {"description" : "The tile did not change"},
+        status.HTTP_401_UNAUTHORIZED : {"model" : ErrorResponseSchema },
+        status.HTTP_404_NOT_FOUND : {"model" : ErrorResponseSchema },
+        status.HTTP_422_UNPROCESSABLE_ENTITY : { "model" : ErrorResponseSchema },
+        status.HTTP_503_SERVICE_UNAVAILABLE : { "model" : ErrorResponseSchema },
+    }
+)
+@limiter.limit("600/minute")
+async def restaurant_density_tile(request: Request,
+                                  z: Annotated[ZoomConstraint, Field(description="The tile zoom level")],
+                                  x: Annotated[TileIndexConstraint, Field(description="The tile column")],
+                                  y: Annotated[TileIndexConstraint, Field(description="The tile row")],
+                                  if_none_match: Annotated[Optional[str], Header()] = None,
+                                  _ = Depends(VerifyAccessToken)):
+    if x >= 1 << z or y >= 1 << z:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The tile is outside of the map!")
+    # Revalidate on every use, the tiles change when restaurants do
+    headers = {"Cache-Control": "private, no-cache"}
+    etag = QuerySystem.DataRestaurantDensityTileETag(zoom=z, x=x, y=y)
+    if if_none_match is not None and etag in (e.strip() for e in if_none_match.split(",")):
+        headers["ETag"] = etag
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    tile = await QuerySystem.DataRestaurantDensityTile(zoom=z, x=x, y=y)
+    headers["ETag"] = tile.ETag
+    return Response(content=tile.Body, media_type=DENSITY_TILE_MEDIA_TYPE, headers=headers)
+
+@router.get(
+    "/admin/stats", name="Data Statistics", status_code=status.HTTP_200_OK,
+    response_model=ObjectResponseSchema[DataStatsModel],
+    description="Get the search and database counters of the backend worker process answering the request "
+                "(each worker has its own, see `pid`), e.g. to size the search cache. Administrators only: "
+                "the Supabase service role, or users whose `app_metadata.role` is `security.adminRole`.",
+    responses={
+        status.HTTP_401_UNAUTHORIZED : {"model" : ErrorResponseSchema },
+        status.HTTP_403_FORBIDDEN : {"model" : ErrorResponseSchema },
+    }
+)
+@limiter.limit("30/minute")
+async def data_stats(request: Request,
+                     _ = Depends(VerifyAdminAccessToken)):
+    return ObjectResponseSchema[DataStatsModel](data=QuerySystem.DataStats())
@@ -1,6 +1,6 @@
 import enum
 from pydantic import BaseModel
-from typing import Generic, List, TypeVar
+from typing import Generic, List, Optional, TypeVar
 
 _T = TypeVar("_T")
 
@@ -37,6 +37,11 @@ class CollectionsResponseSchema(BaseResponseSchema, Generic[_T]):
     
     data: List[_T]
     
+class PagedCollectionsResponseSchema(CollectionsResponseSchema[_T], Generic[_T]):
+    """The Paged Collections Response Schema, use for one page of a multiple objects response."""
+    
+    next_cursor: Optional[str] = None
+    
 class MessageResponseSchema(BaseResponseSchema, Generic[_T]):
     """The Message Response Schema, use for messages response."""
     
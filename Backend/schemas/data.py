@@ -1,6 +1,48 @@
+import pydantic_core
+from functools import lru_cache
+from operator import attrgetter
 from pydantic import BaseModel, ConfigDict, Field, PositiveFloat
-from typing import Optional, List, Dict, Any
-from core.mongodb import MongoDBRestaurantResponse
+from typing import Optional, List, Dict, Any, Union, Tuple, Callable
+from schemas import CollectionsResponseSchema, PagedCollectionsResponseSchema, ResponseStatusType, ResponseResultType
+from schemas.errors import ErrorDetailSchema
+from core.mongodb import MongoDBRestaurantResponse, MongoDBViewportCluster, MONGODB_SEARCH_FIELDS
+from core.search import AutocompleteSuggestion
+
+DATA_BATCH_SEARCH_MAX_POINTS = 20
+"""The maximum number of focus points of a batch restaurant search."""
+
+DATA_RESTAURANT_ROW_FIELDS: Dict[str, Callable[[MongoDBRestaurantResponse], Any]] = {
+    "id": attrgetter("id"),
+    "score": attrgetter("score"),
+    "name": attrgetter("name"),
+    "category": attrgetter("category"),
+    "rating": attrgetter("rating"),
+    "address": attrgetter("address"),
+    "province": attrgetter("province"),
+    "district": attrgetter("district"),
+    "ward": attrgetter("ward"),
+    "lat": lambda inputs: float(inputs.location["coordinates"][1]),
+    "lon": lambda inputs: float(inputs.location["coordinates"][0]),
+    "distance": attrgetter("distance"),
+    "distance_km": attrgetter("distance_km"),
+    "tags": attrgetter("tags"),
+    "link": attrgetter("link")
+}
+"""How each field of a sparse fieldset (MONGODB_SEARCH_FIELDS) reads a handler restaurant, in the response order."""
+DATA_RESTAURANT_LOCATION_FIELDS = ("address", "province", "district", "ward", "lat", "lon", "distance", "distance_km")
+"""The fields nested in the response row `location`."""
+assert set(DATA_RESTAURANT_ROW_FIELDS) == set(MONGODB_SEARCH_FIELDS)
+
+_RowGetters = Tuple[Tuple[str, Callable[[MongoDBRestaurantResponse], Any]], ...]
+
+@lru_cache(maxsize=64)
+def _row_layout(fields: Tuple[str, ...]) -> Tuple[_RowGetters, _RowGetters, _RowGetters]:
+    """The getters of a fieldset's rows: the fields before `location`, in `location`, and after it."""
+    def getters(names: Tuple[str, ...]) -> _RowGetters:
+        return tuple((name, DATA_RESTAURANT_ROW_FIELDS[name]) for name in names if name in fields)
+    return (getters(("id", "score", "name", "category", "rating")),
+            getters(DATA_RESTAURANT_LOCATION_FIELDS),
+            getters(("tags", "link")))
 
 class DataLocationDetailsModel(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -62,4 +104,226 @@ class DataRestaurantResponseModel(BaseModel):
                 Distance=inputs.distance,
                 DistanceKm=inputs.distance_km
             )
-        )
\ No newline at end of file
+        )
+    
+    @staticmethod
+    def RowFromMongoDB(inputs: MongoDBRestaurantResponse, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        """
+        The serialized form of `FromMongoDB(inputs)` (by alias), built directly: the handler model is
+        already validated, so the response row skips a second model and its validation.
+        With `fields` (a sparse fieldset, MONGODB_SEARCH_FIELDS), the row only holds those fields.
+        """
+        if fields is not None:
+            head, location, tail = _row_layout(fields)
+            row = {name: getter(inputs) for name, getter in head}
+            if location:
+                row["location"] = {name: getter(inputs) for name, getter in location}
+            row.update((name, getter(inputs)) for name, getter in tail)
+            return row
+        longitude, latitude = inputs.location["coordinates"][:2]
+        return {
+            "id": inputs.id,
+            "score": inputs.score,
+            "name": inputs.name,
+            "category": inputs.category,
+            "rating": inputs.rating,
+            "location": {
+                "address": inputs.address,
+                "province": inputs.province,
+                "district": inputs.district,
+                "ward": inputs.ward,
+                "lat": float(latitude),
+                "lon": float(longitude),
+                "distance": inputs.distance,
+                "distance_km": inputs.distance_km
+            },
+            "tags": inputs.tags,
+            "link": inputs.link
+        }
+
+class DataFacetBucketModel(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    Value: Optional[Union[str, float]] = Field(serialization_alias="value",
+                                               description="The facet value (the lower bound for rating buckets)")
+    Count: int = Field(serialization_alias="count",
+                       description="The number of matching restaurants with this value")
+
+class DataRestaurantFacetsModel(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    Category: List[DataFacetBucketModel] = Field(default_factory=list, serialization_alias="category",
+                                                 description="Match counts by category, most frequent first")
+    District: List[DataFacetBucketModel] = Field(default_factory=list, serialization_alias="district",
+                                                 description="Match counts by district, most frequent first")
+    Rating: List[DataFacetBucketModel] = Field(default_factory=list, serialization_alias="rating",
+                                               description="Match counts by rating bucket, lowest first")
+    
+    @staticmethod
+    def FromMongoDB(facets: Dict[str, List[Dict[str, Any]]]) -> "DataRestaurantFacetsModel":
+        def buckets(name: str) -> List[DataFacetBucketModel]:
+            return [DataFacetBucketModel(Value=b["value"], Count=b["count"]) for b in facets.get(name, [])]
+        return DataRestaurantFacetsModel(
+            Category=buckets("category"),
+            District=buckets("district"),
+            Rating=buckets("rating")
+        )
+
+class DataRestaurantSearchResponseSchema(PagedCollectionsResponseSchema[DataRestaurantResponseModel]):
+    """The restaurant search response: one page, plus the total and facets if requested."""
+    
+    total: Optional[int] = None
+    facets: Optional[DataRestaurantFacetsModel] = None
+    corrected_query: Optional[str] = Field(default=None, description="The spelling-corrected query actually searched (if corrected)")
+    
+    @staticmethod
+    def DumpRows(rows: List[Dict[str, Any]], next_cursor: Optional[str] = None, total: Optional[int] = None,
+                 facets: Optional[DataRestaurantFacetsModel] = None, corrected_query: Optional[str] = None) -> bytes:
+        """
+        The JSON of this response for rows already in the serialized shape (`RowFromMongoDB`),
+        serialized once by pydantic-core, without validating the rows again.
+        """
+        return pydantic_core.to_json({
+            "status": ResponseStatusType.OK.value,
+            "result": ResponseResultType.Collections.value,
+            "data": rows,
+            "next_cursor": next_cursor,
+            "total": total,
+            "facets": facets,
+            "corrected_query": corrected_query
+        }, by_alias=True)
+
+class DataRestaurantClusterModel(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    Key: str = Field(serialization_alias="key",
+                     description="The stable id of the cluster ('zoom/x/y' grid cell)")
+    Latitude: float = Field(serialization_alias="lat", le=90, ge=-90,
+                            description="The latitude of the centroid of the restaurants")
+    Longitude: float = Field(serialization_alias="lon", le=180, ge=-180,
+                             description="The longitude of the centroid of the restaurants")
+    Count: int = Field(serialization_alias="count",
+                       description="The number of restaurants in the cluster")
+    BestRating: float = Field(serialization_alias="best_rating",
+                              description="The best rating of the restaurants in the cluster")
+    
+    @staticmethod
+    def FromMongoDB(inputs: MongoDBViewportCluster) -> "DataRestaurantClusterModel":
+        return DataRestaurantClusterModel(
+            Key=inputs.key,
+            Latitude=inputs.latitude,
+            Longitude=inputs.longitude,
+            Count=inputs.count,
+            BestRating=inputs.best_rating
+        )
+
+class DataRestaurantViewportResponseSchema(CollectionsResponseSchema[DataRestaurantResponseModel]):
+    """The restaurant viewport response: the restaurants (`data`) or, if `clustered`, the `clusters`."""
+    
+    total: int = 0
+    clustered: bool = False
+    truncated: bool = False
+    clusters: List[DataRestaurantClusterModel] = Field(default_factory=list)
+
+class DataRestaurantSuggestionModel(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    Kind: str = Field(serialization_alias="kind",
+                      description="'keyword' (a dish or category to search) or 'restaurant'")
+    Text: str = Field(serialization_alias="text",
+                      description="The suggested keyword or restaurant name")
+    Id: Optional[str] = Field(default=None, serialization_alias="id",
+                              description="The restaurant id (restaurant suggestions)")
+    Category: Optional[str] = Field(default=None, serialization_alias="category",
+                                    description="The restaurant category (restaurant suggestions)")
+    Rating: Optional[float] = Field(default=None, serialization_alias="rating",
+                                    description="The restaurant rating (restaurant suggestions)")
+    Distance: Optional[float] = Field(default=None, serialization_alias="distance",
+                                      description="The distance from the focus point, in meters (if given)")
+    Count: Optional[int] = Field(default=None, serialization_alias="count",
+                                 description="The number of restaurants with the keyword (keyword suggestions)")
+    
+    @staticmethod
+    def FromSearch(inputs: AutocompleteSuggestion) -> "DataRestaurantSuggestionModel":
+        return DataRestaurantSuggestionModel(
+            Kind=inputs.kind,
+            Text=inputs.text,
+            Id=inputs.id,
+            Category=inputs.category,
+            Rating=inputs.rating,
+            Distance=inputs.distance,
+            Count=inputs.count
+        )
+
+class DataRestaurantBatchPointModel(BaseModel):
+    """One focus point (and its own filters) of a batch restaurant search."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    
+    Latitude: float = Field(alias="focus_lat", le=90, ge=-90,
+                            description="The focus point latitude to search")
+    Longitude: float = Field(alias="focus_lon", le=180, ge=-180,
+                             description="The focus point longitude to search")
+    Query: Optional[str] = Field(default=None, alias="query",
+                                 description="The text query to filter")
+    Radius: PositiveFloat = Field(default=5000, alias="radius",
+                                  description="The search radius from the focus point, in meters")
+    MinRating: float = Field(default=0, alias="min_rating", ge=0, le=5,
+                             description="The minimum rating score to filter")
+    Category: Optional[str] = Field(default=None, alias="category",
+                                    description="The category to filter")
+    Province: Optional[str] = Field(default=None, alias="province",
+                                    description="The province to filter")
+    District: Optional[str] = Field(default=None, alias="district",
+                                    description="The district to filter")
+    Limit: int = Field(default=10, alias="limit", ge=1, le=100,
+                       description="The maximum number of result to return for this point")
+
+class DataRestaurantBatchSearchRequestModel(BaseModel):
+    """POST body for `POST /data/restaurant/search/batch`."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    
+    Points: List[DataRestaurantBatchPointModel] = Field(alias="points", min_length=1,
+                                                        max_length=DATA_BATCH_SEARCH_MAX_POINTS,
+                                                        description="The focus points to search around")
+    Dedupe: bool = Field(default=False, alias="dedupe",
+                         description="Return each restaurant only once, for the nearest point that found it")
+
+class DataRestaurantBatchResultModel(BaseModel):
+    """The restaurants found around one point of a batch restaurant search."""
+    model_config = ConfigDict(extra="ignore")
+    
+    Index: int = Field(serialization_alias="index",
+                       description="The index of the point in the request")
+    Restaurants: List[DataRestaurantResponseModel] = Field(serialization_alias="restaurants",
+                                                           description="The restaurants found around the point")
+    Error: Optional[ErrorDetailSchema] = Field(default=None, serialization_alias="error",
+                                               description="Why the search of this point failed (no restaurants then), "
+                                                           "None if it succeeded")
+
+class DataStatsModel(BaseModel):
+    """The search and database counters of one backend worker process (each worker has its own)."""
+    model_config = ConfigDict(extra="ignore")
+    
+    Pid: int = Field(serialization_alias="pid",
+                     description="The worker process id")
+    SearchCache: Optional[Dict[str, Any]] = Field(default=None, serialization_alias="search_cache",
+                                                  description="The search cache hits, misses, evictions, expirations, "
+                                                              "invalidations, size and bypasses (None if disabled)")
+    SearchCoalescing: Dict[str, int] = Field(default_factory=dict, serialization_alias="search_coalescing",
+                                             description="The coalesced (single-flight) MongoDB searches: calls, "
+                                                         "executions, coalesced, errors, cancelled and inflight")
+    SearchPlanner: Optional[Dict[str, Any]] = Field(default=None, serialization_alias="search_planner",
+                                                    description="The latency histogram and explain averages of every "
+                                                                "MongoDB search shape (None if the planner is disabled)")
+    SlowSearches: List[Dict[str, Any]] = Field(default_factory=list, serialization_alias="slow_searches",
+                                               description="The slow MongoDB searches, latest first: shape, duration "
+                                                           "and explain counters (the pipeline, holding the user's "
+                                                           "location and query, is left out)")
+    SearchCancellations: Dict[str, Any] = Field(default_factory=dict, serialization_alias="search_cancellations",
+                                                description="The MongoDB searches stopped by their deadline or a client "
+                                                            "disconnect, the work the killed operations had done and "
+                                                            "upper bounds of the work they were spared")
+    ConnectionPool: Optional[Dict[str, Any]] = Field(default=None, serialization_alias="connection_pool",
+                                                     description="The MongoDB connection pool gauges, checkouts and "
+                                                                 "checkout wait times of the async and sync clients "
+                                                                 "(None before initialization)")
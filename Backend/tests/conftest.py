@@ -0,0 +1,6 @@
+"""The tests import the backend modules the way the app does, from the `Backend/` folder."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,74 @@
+"""Tests of the packed bitsets and bitmap filter indexes (`core.search.bitmap`)."""
+
+import numpy as np
+import pytest
+from core.search.bitmap import Bitset, BitmapIndex, RangeBitmapIndex, CombineAll
+
+SIZES = [0, 1, 63, 64, 65, 130]
+
+
+def random_bools(size: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed + size).random(size) < 0.4
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_bools_round_trip(size):
+    bools = random_bools(size)
+    bitset = Bitset.FromBools(bools)
+    assert bitset.size == size
+    assert np.array_equal(bitset.ToBools(), bools)
+    assert bitset.Count() == bools.sum()
+    assert np.array_equal(bitset.Indices(), np.flatnonzero(bools))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_from_indices(size):
+    bools = random_bools(size, seed=1)
+    assert np.array_equal(Bitset.FromIndices(np.flatnonzero(bools), size).ToBools(), bools)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_operators_match_numpy(size):
+    a, b = random_bools(size, seed=2), random_bools(size, seed=3)
+    left, right = Bitset.FromBools(a), Bitset.FromBools(b)
+    assert np.array_equal((left & right).ToBools(), a & b)
+    assert np.array_equal((left | right).ToBools(), a | b)
+    assert np.array_equal((~left).ToBools(), ~a)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_invert_clears_the_tail(size):
+    # The unused bits of the last word must stay cleared, or Count() would include them
+    assert Bitset.Full(size).Count() == size
+    assert (~Bitset.FromBools(np.ones(size, dtype=bool))).Count() == 0
+
+
+def test_getitem_returns_the_bits_of_ids():
+    bools = random_bools(130, seed=4)
+    ids = np.array([0, 63, 64, 65, 129, 7])
+    assert np.array_equal(Bitset.FromBools(bools)[ids], bools[ids])
+
+
+def test_bitmap_index_equal_and_any():
+    codes = np.array([0, 1, -1, 2, 1, 0, -1] * 20, dtype=np.int32)
+    index = BitmapIndex(codes, 3)
+    for code in range(3):
+        assert np.array_equal(index.Equal(code).ToBools(), codes == code)
+    assert np.array_equal(index.Any([0, 2]).ToBools(), (codes == 0) | (codes == 2))
+    assert index.Any([]).Count() == 0
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.05, 3.0, 3.45, 4.5, 4.96, 5.0])
+def test_range_bitmap_index_at_least(threshold):
+    values = np.round(np.random.default_rng(5).uniform(0.0, 5.0, 300), 2).astype(np.float32)
+    values[::17] = np.nan
+    index = RangeBitmapIndex(values, 0.0, 5.0, 0.1)
+    expected = values >= np.float32(threshold)  # NaN is never >= anything
+    assert np.array_equal(index.AtLeast(threshold).ToBools(), expected)
+
+
+def test_combine_all():
+    a, b = random_bools(100, seed=6), random_bools(100, seed=7)
+    combined = CombineAll([Bitset.FromBools(a), None, Bitset.FromBools(b)])
+    assert np.array_equal(combined.ToBools(), a & b)
+    assert CombineAll([None, None]) is None
@@ -0,0 +1,95 @@
+"""Tests of the keyset pagination continuation tokens (`core.mongodb.cursor` and the search helpers)."""
+
+import base64
+import pytest
+from core.mongodb import (
+    MongoDBSearchCursor,
+    MongoDBInvalidCursorError,
+    MongoDBSearchInputSchema,
+    MongoDBRestaurantResponse,
+    DecodeSearchCursor,
+    NextSearchCursor
+)
+from core.mongodb.cursor import SearchFingerprint
+
+
+def restaurant(i: int, distance: float, rating: float = 4.0, score=None) -> MongoDBRestaurantResponse:
+    return MongoDBRestaurantResponse(id=f"{i:024x}", name="n", category="c", rating=rating, address="a",
+                                     province="p", district="d", location={"type": "Point", "coordinates": [106.7, 10.8]},
+                                     distance=distance, score=score)
+
+
+def test_encode_decode_round_trip():
+    cursor = MongoDBSearchCursor(Fingerprint="abc", Engine="hybrid", Distance=123.456789, Rating=4.5,
+                                 Score=0.75, Id="65a1b2c3d4e5f60718293a4b")
+    token = cursor.Encode()
+    assert "=" not in token and "+" not in token and "/" not in token  # URL-safe, unpadded
+    assert MongoDBSearchCursor.Decode(token, "abc") == cursor
+
+
+def test_encode_leaves_out_missing_values():
+    token = MongoDBSearchCursor(Fingerprint="abc", Distance=1.0, Id="x").Encode()
+    decoded = MongoDBSearchCursor.Decode(token, "abc")
+    assert decoded.Rating is None and decoded.Score is None and decoded.Engine == "mongo"
+    assert b'"r"' not in base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+
+
+def test_decode_rejects_another_query():
+    token = MongoDBSearchCursor(Fingerprint="abc", Distance=1.0, Id="x").Encode()
+    with pytest.raises(MongoDBInvalidCursorError, match="another query"):
+        MongoDBSearchCursor.Decode(token, "def")
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "not a token!",
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(b'{"f": "abc"}').decode(),
+    base64.urlsafe_b64encode(b'{"f": "abc", "d": 1.0, "i": "x", "e": "other"}').decode(),
+])
+def test_decode_rejects_malformed_tokens(token):
+    with pytest.raises(MongoDBInvalidCursorError):
+        MongoDBSearchCursor.Decode(token, "abc")
+
+
+def test_invalid_cursor_error_is_a_value_error():
+    assert issubclass(MongoDBInvalidCursorError, ValueError)
+
+
+def test_fingerprint_is_stable_and_query_sensitive():
+    base = ("phở bò", 10.8, 106.7, 5000.0, 4.0, "Quán phở", "Hồ Chí Minh", "Quận 1")
+    assert SearchFingerprint(*base) == SearchFingerprint(*base)
+    assert len(SearchFingerprint(*base)) == 12
+    for i, other in enumerate(["pho bo", 10.81, 106.71, 5001.0, 4.5, "Quán bún", "Hà Nội", "Quận 3"]):
+        changed = list(base)
+        changed[i] = other
+        assert SearchFingerprint(*changed) != SearchFingerprint(*base)
+
+
+def test_fingerprint_ignores_the_page_parameters():
+    inputs = MongoDBSearchInputSchema(Text="phở", Latitude=10.8, Longitude=106.7, Limit=2)
+    token = NextSearchCursor(inputs, [restaurant(1, 10.0), restaurant(2, 20.0)])
+    # Another page size, fieldset or facets still continues the same query
+    other = inputs.model_copy(update={"Cursor": token, "Limit": 50, "Fields": ("id",), "Facets": True})
+    assert DecodeSearchCursor(other).Id == f"{2:024x}"
+    with pytest.raises(MongoDBInvalidCursorError):
+        DecodeSearchCursor(other.model_copy(update={"Radius": 1000.0}))
+
+
+def test_next_cursor_holds_the_sort_key_of_the_last_restaurant():
+    inputs = MongoDBSearchInputSchema(Latitude=10.8, Longitude=106.7, Limit=2)
+    token = NextSearchCursor(inputs, [restaurant(1, 10.0), restaurant(2, 20.5, rating=3.5, score=9.0)], "memory")
+    cursor = DecodeSearchCursor(inputs.model_copy(update={"Cursor": token}))
+    assert (cursor.Distance, cursor.Rating, cursor.Id, cursor.Engine) == (20.5, 3.5, f"{2:024x}", "memory")
+    assert cursor.Score is None  # Only text searches order by score
+
+    text = inputs.model_copy(update={"Text": "phở"})
+    token = NextSearchCursor(text, [restaurant(1, 10.0, score=2.0), restaurant(2, 20.5, score=1.5)])
+    assert DecodeSearchCursor(text.model_copy(update={"Cursor": token})).Score == 1.5
+
+
+def test_next_cursor_is_none_on_the_last_page():
+    inputs = MongoDBSearchInputSchema(Latitude=10.8, Longitude=106.7, Limit=3)
+    assert NextSearchCursor(inputs, [restaurant(1, 10.0), restaurant(2, 20.0)]) is None
+    assert NextSearchCursor(inputs, []) is None
+    assert DecodeSearchCursor(inputs) is None
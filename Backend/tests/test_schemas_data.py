@@ -0,0 +1,57 @@
+"""Tests of the serialized restaurant rows (`DataRestaurantResponseModel.RowFromMongoDB`) and their response."""
+
+import json
+import pytest
+from core.mongodb import MongoDBRestaurantResponse, MONGODB_SEARCH_FIELDS
+from schemas.data import DataRestaurantResponseModel, DataRestaurantSearchResponseSchema
+
+
+def restaurant(**updates) -> MongoDBRestaurantResponse:
+    return MongoDBRestaurantResponse(**{
+        "id": "65a1b2c3d4e5f60718293a4b", "name": "Phở Hòa", "category": "Phở", "rating": 4.5,
+        "address": "260C Pasteur", "province": "Hồ Chí Minh", "district": "Quận 3", "ward": "Phường 8",
+        "tags": ["phở", "bò"], "location": {"type": "Point", "coordinates": [106.6897, 10.7892]},
+        "distance": 1234.5, "distance_km": 1.2345, "link": "https://maps.google.com/?cid=1", "score": 0.8,
+        **updates
+    })
+
+
+@pytest.mark.parametrize("inputs", [restaurant(), restaurant(ward=None, distance=None, distance_km=None,
+                                                              score=None, link=None, tags=[])])
+def test_full_row_matches_the_model_dump(inputs):
+    row = DataRestaurantResponseModel.RowFromMongoDB(inputs)
+    assert row == DataRestaurantResponseModel.FromMongoDB(inputs).model_dump(by_alias=True)
+    assert list(row) == list(DataRestaurantResponseModel.FromMongoDB(inputs).model_dump(by_alias=True))
+
+
+def test_every_field_row_matches_the_full_row():
+    inputs = restaurant()
+    assert DataRestaurantResponseModel.RowFromMongoDB(inputs, tuple(MONGODB_SEARCH_FIELDS)) == \
+        DataRestaurantResponseModel.RowFromMongoDB(inputs)
+
+
+def test_sparse_row_nests_the_location_fields():
+    row = DataRestaurantResponseModel.RowFromMongoDB(restaurant(), ("id", "name", "lat", "lon", "distance"))
+    assert row == {"id": "65a1b2c3d4e5f60718293a4b", "name": "Phở Hòa",
+                   "location": {"lat": 10.7892, "lon": 106.6897, "distance": 1234.5}}
+
+
+def test_sparse_row_without_location_fields_has_no_location():
+    row = DataRestaurantResponseModel.RowFromMongoDB(restaurant(), ("name", "rating", "tags"))
+    assert row == {"name": "Phở Hòa", "rating": 4.5, "tags": ["phở", "bò"]}
+
+
+def test_sparse_row_keeps_the_response_order():
+    # Requested out of order, returned in the order of the full row
+    row = DataRestaurantResponseModel.RowFromMongoDB(restaurant(), ("link", "district", "id", "score", "lon", "address"))
+    assert list(row) == ["id", "score", "location", "link"]
+    assert list(row["location"]) == ["address", "district", "lon"]
+
+
+def test_dump_rows_is_the_response_json():
+    rows = [DataRestaurantResponseModel.RowFromMongoDB(restaurant()),
+            DataRestaurantResponseModel.RowFromMongoDB(restaurant(id="65a1b2c3d4e5f60718293a4c"), ("id", "lat"))]
+    body = json.loads(DataRestaurantSearchResponseSchema.DumpRows(rows, next_cursor="abc", total=2))
+    assert body["data"] == rows
+    assert body["next_cursor"] == "abc" and body["total"] == 2
+    assert body["facets"] is None and body["corrected_query"] is None
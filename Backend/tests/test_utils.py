@@ -0,0 +1,172 @@
+"""Tests of the shared utilities (`utils`)."""
+
+import asyncio
+import pytest
+import utils
+from utils import LRUCache, SingleFlight
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(utils.time, "monotonic", fake)
+    return fake
+
+
+def test_lru_cache_evicts_the_least_recently_used():
+    cache = LRUCache(2)
+    cache.Put("a", 1)
+    cache.Put("b", 2)
+    assert cache.Get("a") == 1  # "b" is now the least recently used
+    cache.Put("c", 3)
+    assert cache.Keys() == ["a", "c"]
+    assert cache.Get("b") is None
+    assert cache.Stats() == {"hits": 1, "misses": 1, "evictions": 1, "expirations": 0, "invalidations": 0, "size": 2}
+
+
+def test_lru_cache_put_replaces_and_refreshes():
+    cache = LRUCache(2)
+    cache.Put("a", 1)
+    cache.Put("b", 2)
+    cache.Put("a", 10)
+    cache.Put("c", 3)
+    assert cache.Keys() == ["a", "c"]
+    assert cache.Get("a") == 10
+
+
+def test_lru_cache_expires_entries_after_their_ttl(clock):
+    cache = LRUCache(10, ttl=60)
+    cache.Put("a", 1)
+    clock.now += 59
+    assert cache.Get("a") == 1
+    clock.now += 2
+    assert cache.Get("a") is None
+    assert len(cache) == 0
+    assert cache.Stats()["expirations"] == 1
+    assert cache.Stats()["misses"] == 1
+
+
+def test_lru_cache_ttl_restarts_on_put(clock):
+    cache = LRUCache(10, ttl=60)
+    cache.Put("a", 1)
+    clock.now += 50
+    cache.Put("a", 2)
+    clock.now += 50
+    assert cache.Get("a") == 2
+
+
+def test_lru_cache_without_ttl_never_expires(clock):
+    cache = LRUCache(10)
+    cache.Put("a", 1)
+    clock.now += 10 ** 9
+    assert cache.Get("a") == 1
+
+
+def test_lru_cache_evict_where_and_clear():
+    cache = LRUCache(10)
+    for i in range(6):
+        cache.Put(i, i * i)
+    assert cache.EvictWhere(lambda key, value: key % 2 == 0 or value == 9) == 4
+    assert cache.Keys() == [1, 5]
+    assert cache.Stats()["invalidations"] == 4
+    assert cache.Pop(1) == 1
+    assert cache.Pop(1) is None
+    cache.Clear()
+    assert len(cache) == 0
+    assert cache.Stats()["invalidations"] == 4  # Clear keeps the counters
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        executions = 0
+
+        async def fetch():
+            nonlocal executions
+            executions += 1
+            await release.wait()
+            return "result"
+
+        callers = [asyncio.ensure_future(flights.Do("key", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*callers) == ["result"] * 3
+        assert executions == 1
+        assert flights.Stats() == {"calls": 3, "executions": 1, "coalesced": 2, "errors": 0, "cancelled": 0, "inflight": 0}
+
+        # Once done, the same key executes again
+        assert await flights.Do("key", fetch) == "result"
+        assert executions == 2
+    asyncio.run(scenario())
+
+
+def test_single_flight_raises_errors_to_every_caller():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def fail():
+            await release.wait()
+            raise ValueError("boom")
+
+        callers = [asyncio.ensure_future(flights.Do("key", fail)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flights.Stats()["errors"] == 1
+    asyncio.run(scenario())
+
+
+def test_single_flight_keeps_running_while_a_caller_waits():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "result"
+
+        first = asyncio.ensure_future(flights.Do("key", fetch))
+        second = asyncio.ensure_future(flights.Do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == "result"
+        assert first.cancelled()
+        assert flights.Stats()["cancelled"] == 0
+    asyncio.run(scenario())
+
+
+def test_single_flight_cancels_the_execution_when_the_last_caller_leaves():
+    async def scenario():
+        flights = SingleFlight()
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def fetch():
+            started.set()
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.ensure_future(flights.Do("key", fetch)) for _ in range(2)]
+        await started.wait()
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        await asyncio.sleep(0)
+        assert flights.Stats()["cancelled"] == 1
+        assert flights.Stats()["inflight"] == 0
+    asyncio.run(scenario())
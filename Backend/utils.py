@@ -5,8 +5,9 @@ For any side, you can 'add' new utility to this module, but please refrain
 to 'modified' or 'remove' utility from this module if possible."""
 
 import logging.handlers
-import dirtyjson, logging, os, sys, datetime, queue, uuid, time
-from typing import Dict, List, cast, Any, Union, Optional
+import dirtyjson, logging, os, sys, datetime, queue, uuid, time, asyncio
+from collections import OrderedDict
+from typing import Dict, List, cast, Any, Union, Optional, Generic, Hashable, Tuple, TypeVar, Callable, Awaitable, Literal
 from pydantic import BaseModel, ConfigDict, Field
 
 def GetWithDefault(d: dict, key, default = None):
@@ -37,6 +38,142 @@ def SaferJsonObjectParse(raw_json: str, bound_check: bool = False) -> Dict[str,
     return cast(Dict[str, object], dict_from_attributed(res))
     
 
+_K = TypeVar("_K", bound=Hashable)
+_V = TypeVar("_V")
+
+class LRUCache(Generic[_K, _V]):
+    """A bounded LRU cache with an optional per-entry TTL and hit/miss/eviction counters.
+
+    Not thread-safe, meant to be used from the event loop.
+    """
+    
+    def __init__(self, max_entries: int, ttl: Optional[float] = None) -> None:
+        """
+        Args:
+            max_entries (int): Maximum number of entries, the least recently used one is evicted beyond it.
+            ttl (Optional[float], optional): Entry time-to-live in seconds, None for no expiration. Defaults to None.
+        """
+        self.__entries: "OrderedDict[_K, Tuple[float, _V]]" = OrderedDict()
+        self.__max_entries = max(1, max_entries)
+        self.__ttl = ttl
+        self.__counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+    
+    def Get(self, key: _K) -> Optional[_V]:
+        """Get the value of a key (and mark it as recently used), or None if missing/expired."""
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.__counters["misses"] += 1
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.__entries[key]
+            self.__counters["expirations"] += 1
+            self.__counters["misses"] += 1
+            return None
+        
+        self.__entries.move_to_end(key)
+        self.__counters["hits"] += 1
+        return value
+    
+    def Put(self, key: _K, value: _V):
+        """Insert or replace the value of a key, evicting the least recently used entries if full."""
+        expires_at = time.monotonic() + self.__ttl if self.__ttl is not None else float("inf")
+        self.__entries[key] = (expires_at, value)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.__max_entries:
+            self.__entries.popitem(last=False)
+            self.__counters["evictions"] += 1
+    
+    def Pop(self, key: _K) -> Optional[_V]:
+        """Remove a key, returning its value (or None if missing)."""
+        entry = self.__entries.pop(key, None)
+        return None if entry is None else entry[1]
+    
+    def Clear(self):
+        """Remove every entry (counters are kept)."""
+        self.__entries.clear()
+    
+    def EvictWhere(self, predicate: Callable[[_K, _V], bool]) -> int:
+        """Remove the entries matching `predicate(key, value)`, returning how many were removed."""
+        keys = [key for key, (_, value) in self.__entries.items() if predicate(key, value)]
+        for key in keys:
+            del self.__entries[key]
+        self.__counters["invalidations"] += len(keys)
+        return len(keys)
+    
+    def Keys(self) -> List[_K]:
+        """The current keys, least recently used first."""
+        return list(self.__entries.keys())
+    
+    def __len__(self) -> int:
+        return len(self.__entries)
+    
+    def Stats(self) -> Dict[str, int]:
+        """The cache counters (hits, misses, evictions, expirations, invalidations) and current size."""
+        return {**self.__counters, "size": len(self.__entries)}
+    
+
+class _Flight:
+    """An in-flight SingleFlight call."""
+    __slots__ = ("Task", "Waiters")
+    
+    def __init__(self, task: "asyncio.Future") -> None:
+        self.Task = task
+        self.Waiters = 0
+
+class SingleFlight(Generic[_K, _V]):
+    """Coalesce concurrent identical async calls: callers with the same key share one execution.
+    
+    - Errors of the execution are raised to every waiting caller.
+    - A cancelled caller only stops waiting, the execution is cancelled when no caller waits anymore.
+    """
+    
+    def __init__(self) -> None:
+        self.__inflight: Dict[_K, _Flight] = {}
+        self.__counters = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0, "cancelled": 0}
+    
+    def __on_done(self, key: _K, flight: _Flight, task: "asyncio.Future"):
+        if self.__inflight.get(key) is flight:
+            del self.__inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.__counters["errors"] += 1
+    
+    async def Do(self, key: _K, fn: Callable[[], Awaitable[_V]]) -> _V:
+        """Run `fn()`, or join the execution already in flight for `key`.
+
+        Args:
+            key (_K): The call identity, calls with equal keys are coalesced.
+            fn (Callable[[], Awaitable[_V]]): The call to execute (only called if nothing is in flight).
+
+        Returns:
+            _V: The result of the (shared) execution.
+        """
+        self.__counters["calls"] += 1
+        flight = self.__inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self.__inflight[key] = flight
+            flight.Task.add_done_callback(lambda t, k=key, f=flight: self.__on_done(k, f, t))
+            self.__counters["executions"] += 1
+        else:
+            self.__counters["coalesced"] += 1
+        
+        flight.Waiters += 1
+        try:
+            return await asyncio.shield(flight.Task)
+        finally:
+            flight.Waiters -= 1
+            if flight.Waiters == 0 and not flight.Task.done():
+                # Last caller gave up, nobody needs the result anymore
+                flight.Task.cancel()
+                self.__counters["cancelled"] += 1
+    
+    def Stats(self) -> Dict[str, int]:
+        """The counters (calls, executions, coalesced, errors, cancelled) and current in-flight count."""
+        return {**self.__counters, "inflight": len(self.__inflight)}
+    
+
 class Logger:
     """The Logger class, use for logging."""
     __logger: Optional[logging.Logger] = None
@@ -140,6 +277,23 @@ class SecurityConfig(BaseModel):
     """Top-level security configuration."""
     model_config = ConfigDict(extra="ignore", populate_by_name=True)
     JWTAlgorithm: str = Field(default="HS256", alias="jwtAlgorithm")
+    AdminRole: str = Field(default="admin", alias="adminRole")
+
+class MongoDBPoolConfig(BaseModel):
+    """MongoDB connection pool configuration (per server, per uvicorn worker)."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    MinSize: int = Field(default=0, ge=0, alias="minSize")
+    MaxSize: int = Field(default=100, ge=1, alias="maxSize")
+    MaxConnecting: int = Field(default=2, ge=1, alias="maxConnecting")
+    MaxIdleTime: Optional[float] = Field(default=None, gt=0, alias="maxIdleTime")
+    WaitQueueTimeout: Optional[float] = Field(default=None, gt=0, alias="waitQueueTimeout")
+
+class MongoDBTimeoutsConfig(BaseModel):
+    """MongoDB client timeouts (milliseconds, null for the driver default)."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    ServerSelection: Optional[float] = Field(default=None, gt=0, alias="serverSelection")
+    Connect: Optional[float] = Field(default=None, gt=0, alias="connect")
+    Socket: Optional[float] = Field(default=None, gt=0, alias="socket")
 
 class MongoDBConfig(BaseModel):
     """MongoDB configuration."""
@@ -150,6 +304,96 @@ class MongoDBConfig(BaseModel):
     Username: Optional[str] = Field(default=None, alias="username")
     Password: Optional[str] = Field(default=None, alias="password")
     ConnectionString: Optional[str] = Field(default=None, alias="connectionString")
+    Pool: MongoDBPoolConfig = Field(default_factory=MongoDBPoolConfig, alias="pool")
+    Compressors: List[Literal["zstd", "snappy", "zlib"]] = Field(default_factory=list, alias="compressors")
+    ZlibLevel: Optional[int] = Field(default=None, ge=-1, le=9, alias="zlibLevel")
+    Timeouts: MongoDBTimeoutsConfig = Field(default_factory=MongoDBTimeoutsConfig, alias="timeouts")
+    ReadPreference: Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"] = \
+        Field(default="primary", alias="readPreference")
+    AdminWorkers: int = Field(default=2, ge=1, alias="adminWorkers")
+
+class DataMemoryStoreConfig(BaseModel):
+    """In-process restaurant store configuration."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    Enabled: bool = Field(default=False, alias="enabled")
+    CellSize: float = Field(default=500.0, gt=0, alias="cellSize")
+
+class DataSearchCacheConfig(BaseModel):
+    """Restaurant search result cache configuration."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    Enabled: bool = Field(default=False, alias="enabled")
+    MaxEntries: int = Field(default=2048, ge=1, alias="maxEntries")
+    TTL: float = Field(default=120.0, gt=0, alias="ttl")
+    CellSize: float = Field(default=100.0, gt=0, alias="cellSize")
+
+class DataDensityTilesConfig(BaseModel):
+    """Restaurant density tiles (heatmap layer) configuration."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    Enabled: bool = Field(default=False, alias="enabled")
+    Folder: str = Field(default=os.path.join('data', 'tiles'), alias="folder")
+    MinZoom: int = Field(default=4, ge=0, le=22, alias="minZoom")
+    MaxZoom: int = Field(default=14, ge=0, le=22, alias="maxZoom")
+    MemoryTiles: int = Field(default=4096, ge=1, alias="memoryTiles")
+    RefreshInterval: float = Field(default=600.0, ge=0, alias="refreshInterval")
+
+class DataTopRatedConfig(BaseModel):
+    """Materialized top-rated restaurants view configuration."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    Enabled: bool = Field(default=False, alias="enabled")
+    Size: int = Field(default=20, ge=1, le=100, alias="size")
+    RefreshInterval: float = Field(default=300.0, ge=0, alias="refreshInterval")
+
+class DataChangeFeedConfig(BaseModel):
+    """Restaurant data change notifications (cache invalidation) configuration."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    Enabled: bool = Field(default=False, alias="enabled")
+    Mode: Literal["auto", "changeStream", "poll"] = Field(default="auto", alias="mode")
+    PollInterval: float = Field(default=30.0, gt=0, alias="pollInterval")
+
+class DataTextRankingConfig(BaseModel):
+    """Restaurant text search ranking configuration."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    Hybrid: bool = Field(default=False, alias="hybrid")
+    DistanceWeight: float = Field(default=0.3, ge=0.0, le=1.0, alias="distanceWeight")
+    MaxCandidates: int = Field(default=2000, ge=1, alias="maxCandidates")
+    BackfillTokens: bool = Field(default=True, alias="backfillTokens")
+
+class DataQueryPlannerConfig(BaseModel):
+    """MongoDB search query planner (latency stats, explain sampling, slow-query log) configuration."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    Enabled: bool = Field(default=False, alias="enabled")
+    SampleRate: float = Field(default=0.01, ge=0.0, le=1.0, alias="sampleRate")
+    SlowThreshold: float = Field(default=200.0, gt=0, alias="slowThreshold")
+    SlowLogSize: int = Field(default=100, ge=1, alias="slowLogSize")
+    Adaptive: bool = Field(default=True, alias="adaptive")
+    GeoFirstRadius: float = Field(default=1000.0, ge=0, alias="geoFirstRadius")
+
+class DataSearchDeadlineConfig(BaseModel):
+    """Restaurant search deadline (MongoDB maxTimeMS) and client disconnect cancellation configuration."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    Enabled: bool = Field(default=False, alias="enabled")
+    SLO: float = Field(default=1500.0, gt=0, alias="slo")
+    MinBudget: float = Field(default=20.0, gt=0, alias="minBudget")
+    DisconnectPollInterval: float = Field(default=0.1, gt=0, alias="disconnectPollInterval")
+
+class DataIndexesConfig(BaseModel):
+    """MongoDB index verification (at startup) configuration."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    Verify: bool = Field(default=False, alias="verify")
+    BuildMissing: bool = Field(default=True, alias="buildMissing")
+
+class DataConfig(BaseModel):
+    """Restaurant data configuration."""
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    MemoryStore: DataMemoryStoreConfig = Field(default_factory=DataMemoryStoreConfig, alias="memoryStore")
+    SearchCache: DataSearchCacheConfig = Field(default_factory=DataSearchCacheConfig, alias="searchCache")
+    DensityTiles: DataDensityTilesConfig = Field(default_factory=DataDensityTilesConfig, alias="densityTiles")
+    TopRated: DataTopRatedConfig = Field(default_factory=DataTopRatedConfig, alias="topRated")
+    ChangeFeed: DataChangeFeedConfig = Field(default_factory=DataChangeFeedConfig, alias="changeFeed")
+    TextRanking: DataTextRankingConfig = Field(default_factory=DataTextRankingConfig, alias="textRanking")
+    QueryPlanner: DataQueryPlannerConfig = Field(default_factory=DataQueryPlannerConfig, alias="queryPlanner")
+    SearchDeadline: DataSearchDeadlineConfig = Field(default_factory=DataSearchDeadlineConfig, alias="searchDeadline")
+    Indexes: DataIndexesConfig = Field(default_factory=DataIndexesConfig, alias="indexes")
 
 class ApplicationConfig(BaseModel):
     """Global application configuration."""
@@ -157,6 +401,7 @@ class ApplicationConfig(BaseModel):
     Logging: LoggingConfig = Field(default_factory=LoggingConfig, alias='logging')
     Security: SecurityConfig = Field(default_factory=SecurityConfig, alias='security')
     MongoDB: MongoDBConfig = Field(default_factory=MongoDBConfig, alias='mongodb')
+    Data: DataConfig = Field(default_factory=DataConfig, alias='data')
 
 class Config:
     """The Config class, contain the static configuration of the application."""
@@ -14,6 +14,22 @@ from datetime import datetime
 from pymongo import MongoClient
 from typing import List, Dict
 import dotenv
+import importlib.util
+from core.mongodb.indexes import MongoDBIndexesOf
+
+
+def load_leaf_module(name: str, path: Path):
+    """Load one module file without running its package `__init__` (core.search loads the whole search stack)."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# The tokenizer only needs NumPy, the same one the backend uses to read `search_tokens`
+RestaurantSearchTokens = load_leaf_module(
+    "restaurant_search_text", backend_path / "core" / "search" / "text.py"
+).RestaurantSearchTokens
 
 # Load environment variables
 dotenv.load_dotenv(backend_path / ".env")
@@ -46,6 +62,10 @@ def transform_csv_row(row: pd.Series) -> Dict:
         "district": str(row['District']).strip() if pd.notna(row['District']) else None,
         "province": str(row['Province']).strip() if pd.notna(row['Province']) else None,
         "full_location": str(row['Full_Location']).strip() if pd.notna(row['Full_Location']) else None,
+        # Diacritic-insensitive tokens of the in-process text index (see core/search/text.py)
+        "search_tokens": RestaurantSearchTokens(
+            str(row['Name']).strip(), str(row['Category']).strip(), str(row['Address']).strip()
+        ),
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
@@ -137,27 +157,10 @@ def load_csv_to_mongodb(
         # Create indexes
         print(f"\n🔧 Creating indexes...")
         
-        # Geospatial index
-        collection.create_index([("location", "2dsphere")])
-        print(f"  ✓ Created geospatial index on 'location'")
-        
-        # Text search index
-        collection.create_index([
-            ("name", "text"),
-            ("category", "text"),
-            ("address", "text")
-        ], name="text_search_index")
-        print(f"  ✓ Created text search index")
-        
-        # Compound indexes
-        collection.create_index([("category", 1), ("rating", -1)], name="category_rating_index")
-        print(f"  ✓ Created compound index on 'category' and 'rating'")
-        
-        collection.create_index([("province", 1), ("district", 1), ("rating", -1)], name="location_rating_index")
-        print(f"  ✓ Created compound index on 'province', 'district', and 'rating'")
-        
-        collection.create_index([("rating", -1)], name="rating_index")
-        print(f"  ✓ Created index on 'rating'")
+        # The declared indexes of the backend (see core/mongodb/indexes.py)
+        for index in MongoDBIndexesOf("restaurants"):
+            collection.create_index(list(index.Keys), name=index.Name, **index.Options)
+            print(f"  ✓ Created index '{index.Name}' ({index.Purpose})")
         
         print(f"\n✅ All indexes created successfully!")
         